@@ -89,21 +89,20 @@ async function sendMessage() {
   showStatus("Suche in Dokumenten...");
 
   try {
-    const response = await fetch(`${API_BASE}/answer`, {
+    const response = await fetch(`${API_BASE}/answer/stream`, {
       method: "POST",
       headers: { "Content-Type": "application/json" },
       body: JSON.stringify({ question: message }),
     });
 
-    const data = await response.json();
-
-    hideStatus();
-
-    if (response.ok) {
-      addBotMessage(data);
-    } else {
+    if (!response.ok || !response.body) {
+      const data = await response.json().catch(() => ({}));
+      hideStatus();
       addMessage(`Fehler: ${data.error || "Unbekannter Fehler"}`, "bot error");
+      return;
     }
+
+    await readAnswerStream(response);
   } catch (error) {
     hideStatus();
     addMessage(
@@ -114,6 +113,89 @@ async function sendMessage() {
   }
 }
 
+// =============================
+// Streaming (Server-Sent Events)
+// =============================
+async function readAnswerStream(response) {
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = "";
+  let botMessage = null;
+
+  while (true) {
+    const { value, done } = await reader.read();
+    if (done) break;
+
+    buffer += decoder.decode(value, { stream: true });
+
+    // Events sind durch eine Leerzeile getrennt
+    let boundary;
+    while ((boundary = buffer.indexOf("\n\n")) !== -1) {
+      const rawEvent = buffer.slice(0, boundary);
+      buffer = buffer.slice(boundary + 2);
+      botMessage = handleStreamEvent(parseSseEvent(rawEvent), botMessage);
+    }
+  }
+
+  hideStatus();
+}
+
+function parseSseEvent(rawEvent) {
+  let event = "message";
+  const dataLines = [];
+
+  for (const line of rawEvent.split("\n")) {
+    if (line.startsWith("event:")) {
+      event = line.slice(6).trim();
+    } else if (line.startsWith("data:")) {
+      dataLines.push(line.slice(5).trimStart());
+    }
+  }
+
+  return {
+    event,
+    data: dataLines.length ? JSON.parse(dataLines.join("\n")) : {},
+  };
+}
+
+function handleStreamEvent({ event, data }, botMessage) {
+  switch (event) {
+    case "meta":
+      // Quellen und Confidence kommen vor dem ersten Token
+      hideStatus();
+      return addBotMessage({
+        answer: "",
+        sources: data.sources,
+        confidence: data.confidence,
+      });
+
+    case "token":
+      if (botMessage) {
+        const answerContent = botMessage.querySelector(".answer-content");
+        answerContent.textContent += data.text;
+        botMessage.scrollIntoView({ block: "end" });
+      }
+      return botMessage;
+
+    case "done":
+      if (botMessage) {
+        botMessage.querySelector(".answer-content").textContent = data.answer;
+      }
+      return botMessage;
+
+    case "error":
+      hideStatus();
+      if (botMessage) {
+        botMessage.querySelector(".answer-content").textContent = data.answer;
+        return botMessage;
+      }
+      return addBotMessage(data);
+
+    default:
+      return botMessage;
+  }
+}
+
 function askExample(question) {
   document.getElementById("userInput").value = question;
   updateCharCounter();
@@ -189,6 +271,7 @@ function addBotMessage(data) {
 
   container.appendChild(messageDiv);
   messageDiv.scrollIntoView({ behavior: "smooth", block: "end" });
+  return messageDiv;
 }
 
 function getConfidenceIcon(confidence) {
@@ -0,0 +1,327 @@
+# answer_cache.py - Antwort-Wiederverwendung für /answer: Caches und Request-Coalescing
+
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from pathlib import Path
+
+import numpy as np
+
+
+class SemanticAnswerCache:
+    """Liefert gespeicherte Antworten für semantisch fast identische Fragen.
+
+    Treffer erfordern denselben Rechtsbereich und eine Kosinus-Ähnlichkeit
+    über threshold. Der Cache ist auf max_entries begrenzt (LRU) und wird
+    komplett verworfen, sobald sich die Korpus-Version ändert.
+    """
+
+    def __init__(self, max_entries=512, threshold=0.95):
+        self.max_entries = max_entries
+        self.threshold = threshold
+
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()   # entry_id -> (legal_area, unit_vector, payload)
+        self._area_index = {}           # legal_area -> (entry_ids, matrix)
+        self._next_id = 0
+        self._corpus_version = None
+
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._invalidations = 0
+
+    @staticmethod
+    def _unit(vector):
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+    def _sync_corpus_version(self, corpus_version):
+        if corpus_version != self._corpus_version:
+            if self._entries:
+                self._invalidations += 1
+            self._entries.clear()
+            self._area_index.clear()
+            self._corpus_version = corpus_version
+
+    def _matrix_for_area(self, legal_area):
+        """Embedding-Matrix pro Bereich, nur nach Änderungen neu aufgebaut"""
+        cached = self._area_index.get(legal_area)
+        if cached is None:
+            ids = [entry_id for entry_id, entry in self._entries.items() if entry[0] == legal_area]
+            matrix = np.stack([self._entries[i][1] for i in ids]) if ids else None
+            cached = (ids, matrix)
+            self._area_index[legal_area] = cached
+        return cached
+
+    def lookup(self, embedding, legal_area, corpus_version):
+        """Gespeicherten Payload zurückgeben oder None"""
+        query = self._unit(embedding)
+
+        with self._lock:
+            self._sync_corpus_version(corpus_version)
+            ids, matrix = self._matrix_for_area(legal_area)
+            if matrix is None:
+                self._misses += 1
+                return None
+
+            similarities = matrix @ query
+            best = int(np.argmax(similarities))
+            if similarities[best] < self.threshold:
+                self._misses += 1
+                return None
+
+            entry_id = ids[best]
+            self._entries.move_to_end(entry_id)
+            self._hits += 1
+            return self._entries[entry_id][2]
+
+    def store(self, embedding, legal_area, corpus_version, payload):
+        with self._lock:
+            self._sync_corpus_version(corpus_version)
+
+            entry_id = self._next_id
+            self._next_id += 1
+            self._entries[entry_id] = (legal_area, self._unit(embedding), payload)
+            self._area_index.pop(legal_area, None)
+
+            while len(self._entries) > self.max_entries:
+                _, (evicted_area, _, _) = self._entries.popitem(last=False)
+                self._area_index.pop(evicted_area, None)
+                self._evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._area_index.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "threshold": self.threshold,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": round(self._hits / lookups, 3) if lookups else 0.0,
+                "evictions": self._evictions,
+                "invalidations": self._invalidations,
+                "corpus_version": self._corpus_version,
+            }
+
+
+class PersistentAnswerStore:
+    """SQLite-Antwortspeicher, der Neustarts und Deployments überlebt.
+
+    Schlüssel ist (normalisierte Frage, Rechtsbereich, Korpus-Fingerprint);
+    Einträge eines alten Korpus werden beim Start entfernt.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = None
+        self._pid = None
+        self._connection()
+
+        self._hits = 0
+        self._misses = 0
+        self._writes = 0
+
+    def _connection(self):
+        """Verbindung pro Prozess öffnen (SQLite-Handles dürfen nicht über fork geteilt werden)"""
+        if self._conn is not None and self._pid == os.getpid():
+            return self._conn
+
+        conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS answers (
+                question_key TEXT NOT NULL,
+                legal_area TEXT NOT NULL,
+                corpus_fingerprint TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                PRIMARY KEY (question_key, legal_area, corpus_fingerprint)
+            )
+        """)
+        conn.commit()
+
+        self._conn = conn
+        self._pid = os.getpid()
+        return conn
+
+    def get(self, question_key, legal_area, corpus_fingerprint):
+        with self._lock:
+            conn = self._connection()
+            row = conn.execute(
+                "SELECT payload FROM answers WHERE question_key=? AND legal_area=? AND corpus_fingerprint=?",
+                (question_key, legal_area, corpus_fingerprint)
+            ).fetchone()
+            if row is None:
+                self._misses += 1
+                return None
+
+            self._hits += 1
+            return json.loads(row[0])
+
+    def contains(self, question_key, legal_area, corpus_fingerprint):
+        with self._lock:
+            conn = self._connection()
+            row = conn.execute(
+                "SELECT 1 FROM answers WHERE question_key=? AND legal_area=? AND corpus_fingerprint=?",
+                (question_key, legal_area, corpus_fingerprint)
+            ).fetchone()
+            return row is not None
+
+    def put(self, question_key, legal_area, corpus_fingerprint, payload):
+        with self._lock:
+            conn = self._connection()
+            conn.execute(
+                "INSERT OR REPLACE INTO answers (question_key, legal_area, corpus_fingerprint, payload, created_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (question_key, legal_area, corpus_fingerprint, json.dumps(payload, ensure_ascii=False), time.time())
+            )
+            conn.commit()
+            self._writes += 1
+
+    def prune_stale(self, corpus_fingerprint):
+        """Antworten zu anderen Korpus-Versionen löschen"""
+        with self._lock:
+            conn = self._connection()
+            deleted = conn.execute(
+                "DELETE FROM answers WHERE corpus_fingerprint != ?", (corpus_fingerprint,)
+            ).rowcount
+            conn.commit()
+            return deleted
+
+    def stats(self):
+        with self._lock:
+            conn = self._connection()
+            entries = conn.execute("SELECT COUNT(*) FROM answers").fetchone()[0]
+            return {
+                "path": str(self.path),
+                "entries": entries,
+                "hits": self._hits,
+                "misses": self._misses,
+                "writes": self._writes,
+            }
+
+
+class SingleFlight:
+    """Gleichzeitige Aufrufe mit demselben Schlüssel teilen sich eine Ausführung.
+
+    Der erste Aufrufer (Leader) führt die Funktion aus, alle weiteren warten
+    auf dessen Ergebnis bzw. erhalten dieselbe Exception.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}  # key -> (Future, Anzahl Wartende)
+
+        self._executions = 0
+        self._coalesced = 0
+        self._max_waiters = 0
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                future, waiters = call
+                self._calls[key] = (future, waiters + 1)
+                self._coalesced += 1
+                self._max_waiters = max(self._max_waiters, waiters + 1)
+                leader = False
+            else:
+                future = Future()
+                self._calls[key] = (future, 0)
+                self._executions += 1
+                leader = True
+
+        if not leader:
+            return future.result()
+
+        try:
+            result = fn()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+    def stats(self):
+        with self._lock:
+            total = self._executions + self._coalesced
+            return {
+                "executions": self._executions,
+                "coalesced": self._coalesced,
+                "coalesced_rate": round(self._coalesced / total, 3) if total else 0.0,
+                "in_flight": len(self._calls),
+                "max_waiters": self._max_waiters,
+            }
+
+
+class AsyncSingleFlight:
+    """Wie SingleFlight, aber für Coroutinen eines Event-Loops.
+
+    Wartende belegen keinen Thread, sondern warten auf das asyncio.Future
+    des Leaders (abgeschirmt, damit ein abgebrochener Wartender die
+    gemeinsame Ausführung nicht abbricht).
+    """
+
+    def __init__(self):
+        self._calls = {}  # key -> [Future, Anzahl Wartende]
+
+        self._executions = 0
+        self._coalesced = 0
+        self._max_waiters = 0
+
+    async def do(self, key, fn):
+        call = self._calls.get(key)
+        if call is not None:
+            call[1] += 1
+            self._coalesced += 1
+            self._max_waiters = max(self._max_waiters, call[1])
+            return await asyncio.shield(call[0])
+
+        future = asyncio.get_running_loop().create_future()
+        self._calls[key] = [future, 0]
+        self._executions += 1
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # als abgerufen markieren, falls niemand wartet
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            del self._calls[key]
+
+    def stats(self):
+        total = self._executions + self._coalesced
+        return {
+            "executions": self._executions,
+            "coalesced": self._coalesced,
+            "coalesced_rate": round(self._coalesced / total, 3) if total else 0.0,
+            "in_flight": len(self._calls),
+            "max_waiters": self._max_waiters,
+        }
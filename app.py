@@ -1,19 +1,29 @@
 # app.py - PERFECT VERSION - ELIMINATES ALL FRAGMENT ISSUES
 
-from flask import Flask, request, jsonify, send_from_directory
+from flask import Flask, Response, request, jsonify, send_from_directory, stream_with_context
 from flask_cors import CORS
-import chromadb
 import os
 import logging
 import sys
 import signal
 import threading
-from sentence_transformers import SentenceTransformer
 from dotenv import load_dotenv
 import requests
 import json
+import math
 import time
 import re
+from concurrent.futures import ThreadPoolExecutor
+from legal_text import SentenceIndex, prepare_sentences
+from legal_area_classifier import LegalAreaClassifier
+from corpus_state import read_corpus_version
+from retrieval import create_retrieval_backend
+from answer_cache import PersistentAnswerStore, SemanticAnswerCache, SingleFlight
+from embedding_backend import EMBEDDING_BACKEND, embedding_model_key, load_embedding_model, require_onnx_parity
+from embedding_service import EmbeddingBatcher, EmbeddingCache, normalize_question
+from ollama_client import OllamaPool, parse_ollama_hosts, stream_ollama_generate
+from generation_scheduler import Deadline, GenerationOverloaded, GenerationScheduler
+from quality_monitor import AnswerQualityMonitor
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -25,199 +35,210 @@ CORS(app)
 # Global shutdown flag
 shutdown_flag = threading.Event()
 
-# Ollama Configuration
+# Ollama Configuration (OLLAMA_HOST: ein Host oder kommagetrennte Liste von Backends)
 OLLAMA_HOST = os.getenv("OLLAMA_HOST", "localhost:11434")
-OLLAMA_BASE_URL = f"http://{OLLAMA_HOST}"
-logger.info(f"🦙 Ollama configured for: {OLLAMA_BASE_URL}")
+OLLAMA_BASE_URLS = parse_ollama_hosts(OLLAMA_HOST)
+OLLAMA_MODEL = os.getenv("OLLAMA_MODEL", "llama3.2:3b")
+OLLAMA_PROBE_INTERVAL = float(os.getenv("OLLAMA_PROBE_INTERVAL", "15"))
+OLLAMA_BREAKER_THRESHOLD = int(os.getenv("OLLAMA_BREAKER_THRESHOLD", "3"))
+OLLAMA_BREAKER_COOLDOWN = float(os.getenv("OLLAMA_BREAKER_COOLDOWN", "30"))
+logger.info(f"🦙 Ollama configured for: {', '.join(OLLAMA_BASE_URLS)}")
 
-# HuggingFace Model laden
-logger.info("🤗 Lade HuggingFace Embedding Model...")
+# Hintergrund-Monitor und Circuit Breaker pro Backend statt Generierungs-Probe pro Anfrage;
+# Generierungen gehen an das Backend mit den wenigsten offenen Requests
+ollama_pool = OllamaPool(
+    OLLAMA_BASE_URLS,
+    OLLAMA_MODEL,
+    interval=OLLAMA_PROBE_INTERVAL,
+    breaker_threshold=OLLAMA_BREAKER_THRESHOLD,
+    breaker_cooldown=OLLAMA_BREAKER_COOLDOWN
+)
+ollama_pool.start()
+
+# Retrieval Configuration ("chroma" = ChromaDB-Server, "numpy" = In-Process-Index)
+RETRIEVAL_BACKEND = os.getenv("RETRIEVAL_BACKEND", "chroma").lower()
+CHROMA_HOST = os.getenv("CHROMA_HOST", "localhost")
+CHROMA_PORT = int(os.getenv("CHROMA_PORT", "8000"))
+CHROMA_POOL_SIZE = int(os.getenv("CHROMA_POOL_SIZE", "16"))
+COLLECTION_NAME = "gesetzestexte"
+EMBEDDINGS_FILE = os.getenv("EMBEDDINGS_FILE", "data/embeddings.npy")
+NUMPY_INDEX_MMAP = os.getenv("NUMPY_INDEX_MMAP", "1") == "1"
+
+retriever = create_retrieval_backend(
+    RETRIEVAL_BACKEND,
+    chroma_host=CHROMA_HOST,
+    chroma_port=CHROMA_PORT,
+    chroma_pool_size=CHROMA_POOL_SIZE,
+    collection_name=COLLECTION_NAME,
+    embeddings_file=EMBEDDINGS_FILE,
+    mmap=NUMPY_INDEX_MMAP,
+)
+logger.info(f"🔎 Retrieval-Backend: {retriever.name}")
+
+def _select_query_embedding_backend(backend, index_model):
+    """Frage-Embeddings aus demselben Model und derselben Variante wie der Index -
+    ONNX nur mit bestandener Paritätsprüfung, sonst PyTorch oder kein Start"""
+    if backend == "onnx":
+        try:
+            require_onnx_parity(backend)
+        except RuntimeError as e:
+            logger.warning(f"⚠️ {e} - Fragen werden mit PyTorch kodiert")
+            backend = "torch"
+    
+    query_model = embedding_model_key(backend)
+    if index_model is None:
+        # Index nicht erreichbar oder vor der Erfassung des Models gebaut (damals immer PyTorch)
+        if backend != "torch":
+            logger.warning("⚠️ Embedding-Model des Index unbekannt - Fragen werden mit PyTorch kodiert")
+            return "torch"
+        logger.warning(f"⚠️ Embedding-Model des Index unbekannt - nehme {query_model} an")
+        return backend
+    if index_model == query_model:
+        return backend
+    if index_model == embedding_model_key("torch"):
+        logger.warning(f"⚠️ Index mit {index_model} gebaut, konfiguriert ist {query_model} - Fragen werden mit PyTorch kodiert")
+        return "torch"
+    raise RuntimeError(f"Index mit {index_model} gebaut, Abfragen würden mit {query_model} kodiert - "
+                       f"EMBEDDING_BACKEND/EMBEDDING_ONNX_QUANTIZED an den Index anpassen oder Index neu aufbauen")
+
+QUERY_EMBEDDING_BACKEND = _select_query_embedding_backend(EMBEDDING_BACKEND, retriever.embedding_model())
+
+# HuggingFace Model laden (QUERY_EMBEDDING_BACKEND: torch oder onnx, passend zum Index)
+logger.info(f"🤗 Lade HuggingFace Embedding Model (Backend: {QUERY_EMBEDDING_BACKEND})...")
 try:
-    embedding_model = SentenceTransformer('sentence-transformers/all-MiniLM-L6-v2')
+    embedding_model = load_embedding_model(QUERY_EMBEDDING_BACKEND)
     logger.info("✅ HuggingFace Model geladen!")
 except Exception as e:
     logger.error(f"❌ Fehler beim Laden des HuggingFace Models: {e}")
     embedding_model = None
 
+# Micro-Batching: parallele Anfragen teilen sich einen encode()-Aufruf
+EMBED_BATCH_MAX_SIZE = int(os.getenv("EMBED_BATCH_MAX_SIZE", "16"))
+EMBED_BATCH_MAX_WAIT_MS = float(os.getenv("EMBED_BATCH_MAX_WAIT_MS", "5"))
+embedding_batcher = (
+    EmbeddingBatcher(embedding_model, max_batch_size=EMBED_BATCH_MAX_SIZE, max_wait_ms=EMBED_BATCH_MAX_WAIT_MS)
+    if embedding_model is not None else None
+)
+
+# Wiederholte Fragen (normalisiert) werden nicht erneut kodiert
+EMBED_CACHE_SIZE = int(os.getenv("EMBED_CACHE_SIZE", "1024"))
+EMBED_CACHE_TTL = float(os.getenv("EMBED_CACHE_TTL", "3600"))
+embedding_cache = EmbeddingCache(max_entries=EMBED_CACHE_SIZE, ttl_seconds=EMBED_CACHE_TTL)
+
 def get_embedding(text):
-    """Embedding mit HuggingFace all-MiniLM-L6-v2"""
+    """Embedding mit HuggingFace all-MiniLM-L6-v2 als float32-Array (gecacht)"""
     try:
-        if embedding_model is None:
+        if embedding_batcher is None:
             logger.error("❌ HuggingFace Model nicht verfügbar!")
             return None
         
-        embedding = embedding_model.encode([text], convert_to_numpy=True)
-        return embedding[0].tolist()
+        cache_key = normalize_question(text)
+        embedding = embedding_cache.get(cache_key)
+        if embedding is not None:
+            return embedding
+        
+        return embedding_cache.put(cache_key, embedding_batcher.encode(text))
         
     except Exception as e:
         logger.error(f"❌ HuggingFace Embedding-Fehler: {e}")
         return None
 
-def get_chromadb_client():
-    """ChromaDB-Client mit Docker-optimierter Fallback-Strategie"""
-    
-    try:
-        client = chromadb.HttpClient(host="localhost", port=8000)
-        client.heartbeat()
-        logger.info("✅ ChromaDB HTTP-Verbindung OK")
-        return client
-    except Exception as e:
-        logger.warning(f"⚠️ HTTP ChromaDB fehlgeschlagen: {e}")
-    
-    try:
-        client = chromadb.PersistentClient(path="./chroma_data")
-        logger.info("✅ ChromaDB lokale Verbindung OK")
-        return client
-    except Exception as e:
-        logger.error(f"❌ Alle ChromaDB-Verbindungen fehlgeschlagen: {e}")
-        return None
+# Semantischer Antwort-Cache (wird bei neuem Korpus verworfen)
+ANSWER_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE", "512"))
+ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.95"))
+answer_cache = SemanticAnswerCache(max_entries=ANSWER_CACHE_SIZE, threshold=ANSWER_CACHE_THRESHOLD)
 
-def _test_ollama_connection():
-    """Schneller Ollama-Test"""
-    try:
-        response = requests.post(
-            f"{OLLAMA_BASE_URL}/api/generate",
-            json={
-                "model": "llama3.2:3b",
-                "prompt": "Antworte nur: OK",
-                "stream": False,
-                "options": {"num_predict": 5}
-            },
-            timeout=10
-        )
-        return response.status_code == 200
-    except Exception as e:
-        logger.warning(f"🦙 Ollama nicht erreichbar: {e}")
-        return False
+# Request-Coalescing für identische Fragen, die gleichzeitig eintreffen
+answer_flights = SingleFlight()
+
+# Begrenzte Ollama-Generierung (pro Prozess): Slots, Warteschlange, Downgrade auf die
+# extraktive Antwort und 429 ab einer harten Grenze gleichzeitig bearbeiteter Anfragen
+# Ohne Angabe 2 Slots pro Backend; ein leerer Wert (z.B. aus docker-compose) zählt als nicht gesetzt
+GENERATION_SLOTS = int(os.getenv("GENERATION_SLOTS") or 2 * len(OLLAMA_BASE_URLS))
+GENERATION_QUEUE_DOWNGRADE = int(os.getenv("GENERATION_QUEUE_DOWNGRADE", "8"))
+GENERATION_MAX_PENDING = int(os.getenv("GENERATION_MAX_PENDING", "64"))
+GENERATION_QUEUE_TIMEOUT = float(os.getenv("GENERATION_QUEUE_TIMEOUT", "30"))
+GENERATION_RETRY_AFTER = int(os.getenv("GENERATION_RETRY_AFTER", "5"))
+generation_scheduler = GenerationScheduler(
+    slots=GENERATION_SLOTS,
+    downgrade_depth=GENERATION_QUEUE_DOWNGRADE,
+    max_pending=GENERATION_MAX_PENDING,
+    queue_timeout=GENERATION_QUEUE_TIMEOUT,
+    retry_after=GENERATION_RETRY_AFTER,
+)
+
+# Antwortbudget pro Anfrage (Sekunden, 0 = unbegrenzt); per "deadline_ms" im JSON überschreibbar
+ANSWER_DEADLINE = float(os.getenv("ANSWER_DEADLINE", "20"))
+ANSWER_DEADLINE_MAX = float(os.getenv("ANSWER_DEADLINE_MAX", "60"))
+# Extraktive Antwort parallel zur Ollama-Generierung vorbereiten
+fallback_executor = ThreadPoolExecutor(max_workers=int(os.getenv("FALLBACK_WORKERS", "4")), thread_name_prefix="extractive")
+
+# Persistenter Antwortspeicher (überlebt Neustarts; leerer Pfad deaktiviert ihn)
+ANSWER_STORE_PATH = os.getenv("ANSWER_STORE_PATH", "data/answer_cache.sqlite3")
+ANSWER_WARMUP_COUNT = int(os.getenv("ANSWER_WARMUP_COUNT", "20"))
+ANSWER_WARMUP_WAIT = float(os.getenv("ANSWER_WARMUP_WAIT", "300"))
+# Beantwortete Fragen in logs/answer_quality.jsonl - daraus wählt das Warm-up die häufigsten Fragen.
+# Ab ANSWER_QUALITY_LOG_MAX_MB wird die Datei nach answer_quality.jsonl.1 rotiert.
+ANSWER_QUALITY_LOG = os.getenv("ANSWER_QUALITY_LOG", "1") == "1"
+ANSWER_QUALITY_LOG_MAX_MB = float(os.getenv("ANSWER_QUALITY_LOG_MAX_MB", "20"))
+quality_monitor = AnswerQualityMonitor(max_bytes=int(ANSWER_QUALITY_LOG_MAX_MB * 1024 * 1024))
+try:
+    answer_store = PersistentAnswerStore(ANSWER_STORE_PATH) if ANSWER_STORE_PATH else None
+except Exception as e:
+    logger.error(f"❌ Persistenter Antwortspeicher nicht verfügbar: {e}")
+    answer_store = None
+
+# Rechtsbereich-Keywords aus config/legal_areas.json, einmal beim Start kompiliert
+legal_area_classifier = LegalAreaClassifier.from_config()
 
 def _detect_legal_area_precise(question):
     """PERFEKTE Rechtsbereicherkennung"""
-    question_lower = question.lower()
-    
-    # Sehr spezifische Keywords mit hoher Präzision
-    area_keywords = {
-        'arbeitsrecht': {
-            'primary': ['ruhezeit', 'arbeitszeit', 'nachtarbeit', 'überstunden', 'arbeitsvertrag', 'kündigung.*arbeit', 'kündigungsfrist.*arbeit', 'probezeit', 'ferien', 'urlaub', 'lohn', 'gehalt'],
-            'secondary': ['arbeitgeber', 'arbeitnehmer', 'anstellung']
-        },
-        'krankenversicherung': {
-            'primary': ['krankenkasse', 'krankenversicherung', 'kv.*kündigung', 'kassenwechsel', 'prämie', 'franchise', 'grundversicherung'],
-            'secondary': ['kasse.*wechsel', 'versicherung.*kündigung']
-        },
-        'strafrecht': {
-            'primary': ['strafgesetz', 'strafrecht', 'strafe', 'strafbar', 'mord', 'diebstahl', 'raub', 'betrug', 'delikt', 'verbrechen', 'gefängnis', 'busse', 'strafmündig'],
-            'secondary': ['bestrafung', 'tat', 'täter']
-        },
-        'zivilrecht': {
-            'primary': ['vertrag.*entsteht', 'vertragsrecht', 'obligation', 'haftung', 'schadenersatz', 'kaufvertrag', 'angebot.*annahme'],
-            'secondary': ['berechtigt', 'verpflichtet', 'anspruch']
-        },
-        'familienrecht': {
-            'primary': ['ehescheidung', 'scheidung', 'ehe.*voraussetzung', 'sorgerecht', 'unterhalt', 'vormundschaft'],
-            'secondary': ['familie', 'kind.*recht', 'heirat']
-        },
-        'verkehrsrecht': {
-            'primary': ['führerschein', 'fahrausweis', 'verkehrsrecht', 'geschwindigkeit', 'verkehr.*unfall', 'führerschein.*entzug'],
-            'secondary': ['fahren', 'auto', 'strasse']
-        },
-        'datenschutz': {
-            'primary': ['datenschutz', 'daten.*gespeicher', 'e-mail.*lesen', 'email.*lesen', 'überwachung', 'personendaten'],
-            'secondary': ['privatsphäre', 'daten.*schutz']
-        }
-    }
-    
-    scores = {}
-    for area, keywords in area_keywords.items():
-        score = 0
-        
-        # Primary keywords: 10 points (sehr gewichtet)
-        for kw in keywords['primary']:
-            if re.search(rf'\b{kw}\b', question_lower):
-                score += 10
-        
-        # Secondary keywords: 3 points  
-        for kw in keywords['secondary']:
-            if re.search(rf'\b{kw}\b', question_lower):
-                score += 3
-        
-        if score > 0:
-            scores[area] = score
-    
-    # Return best match with minimum threshold
-    if scores and max(scores.values()) >= 7:
-        return max(scores, key=scores.get)
-    else:
-        return 'allgemein'
+    return legal_area_classifier.classify(question)
+
+# Relevante Keywords je Bereich
+AREA_RELEVANCE = {
+    'arbeitsrecht': ['ruhezeit', 'arbeitszeit', 'pause', 'nacht', 'überstunden', 'kündigung', 'frist', 'arbeitsvertrag', 'probezeit'],
+    'krankenversicherung': ['krankenversicherung', 'versicherung', 'wechsel', 'kündigung', 'prämie', 'leistung'],
+    'strafrecht': ['strafe', 'strafbar', 'verbrechen', 'delikt', 'bestrafung', 'gefängnis'],
+    'zivilrecht': ['vertrag', 'zustimmung', 'berechtigt', 'verpflichtet', 'angebot', 'annahme', 'haftung'],
+    'familienrecht': ['ehe', 'scheidung', 'familie', 'unterhalt', 'sorgerecht'],
+    'verkehrsrecht': ['verkehr', 'fahren', 'führerschein', 'entzug', 'geschwindigkeit'],
+    'datenschutz': ['daten', 'speicher', 'einwilligung', 'schutz', 'personendaten', 'email'],
+    'allgemein': ['recht', 'gesetz', 'bestimmung', 'regel']
+}
+
+# Vollständige Rechtsbestimmungen erkennen
+NORMATIVE_VERBS = frozenset(['darf', 'muss', 'kann', 'soll', 'berechtigt', 'verpflichtet'])
+
+# Bei der Ingestion vorbereitete Sätze pro Chunk-ID
+sentence_index = SentenceIndex()
 
-def _extract_clean_legal_content(docs, question, legal_area):
-    """BULLETPROOF Content-Extraktion - eliminiert alle Artikel-Fragmente"""
+def _extract_clean_legal_content(docs, question, legal_area, doc_ids=None):
+    """BULLETPROOF Content-Extraktion - eliminiert alle Artikel-Fragmente.
+    
+    Bereinigung, Satztrennung und Fragment-Filter stammen aus dem Satz-Index
+    der Ingestion; nur Chunks ohne Index-Eintrag werden hier aufbereitet.
+    """
     
     question_lower = question.lower()
-    question_words = set(re.findall(r'\b\w{3,}\b', question_lower))
-    
-    # STRENGE Anti-Fragment Filter
-    fragment_patterns = [
-        r'^\d+[a-z]*\s+\d+\s+[A-Z]',      # "17d 46 Der..."
-        r'^[A-Z][a-z]+.*\d+\s+[A-Z]',     # "Artikel 123 Der..."
-        r'aus gesundheitlichen Grün-',      # Abgeschnittene Wörter
-        r'hat der Arbeitneh-',             # Abgeschnittene Wörter
-        r'Zahlungsort.*bestimmt',          # Wechselrecht-Fragmente
-        r'gezogene.*[Ww]echsel',           # Wechselrecht
-        r'Bürg.*schaft.*je a',             # Bürgschaftsrecht-Fragment
-        r'Amtsdauer.*kann der',            # Bürgschaftsrecht
-        r'von dem am.*Zahltag',            # Lohn-Fragment
-        r'§\s*\d+.*BGB',                   # Deutsche Rechtsbegriffe
-    ]
-    
-    # Relevante Keywords je Bereich
-    area_relevance = {
-        'arbeitsrecht': ['ruhezeit', 'arbeitszeit', 'pause', 'nacht', 'überstunden', 'kündigung', 'frist', 'arbeitsvertrag', 'probezeit'],
-        'krankenversicherung': ['krankenversicherung', 'versicherung', 'wechsel', 'kündigung', 'prämie', 'leistung'],
-        'strafrecht': ['strafe', 'strafbar', 'verbrechen', 'delikt', 'bestrafung', 'gefängnis'],
-        'zivilrecht': ['vertrag', 'zustimmung', 'berechtigt', 'verpflichtet', 'angebot', 'annahme', 'haftung'],
-        'familienrecht': ['ehe', 'scheidung', 'familie', 'unterhalt', 'sorgerecht'],
-        'verkehrsrecht': ['verkehr', 'fahren', 'führerschein', 'entzug', 'geschwindigkeit'],
-        'datenschutz': ['daten', 'speicher', 'einwilligung', 'schutz', 'personendaten', 'email'],
-        'allgemein': ['recht', 'gesetz', 'bestimmung', 'regel']
-    }
+    question_words = [word for word in set(re.findall(r'\b\w{3,}\b', question_lower)) if len(word) > 3]
+    relevant_keywords = AREA_RELEVANCE.get(legal_area, AREA_RELEVANCE['allgemein'])
     
-    relevant_keywords = area_relevance.get(legal_area, area_relevance['allgemein'])
+    docs = docs[:6]
+    indexed = sentence_index.get_many(doc_ids[:6]) if doc_ids else [None] * len(docs)
     clean_content = []
     
-    for doc in docs[:6]:
-        cleaned_doc = doc.strip()
-        
-        # Aggressive Bereinigung
-        cleaned_doc = re.sub(r'BBl \d{4}.*?(?=\n|$)', '', cleaned_doc)
-        cleaned_doc = re.sub(r'AS \d{4}.*?(?=\n|$)', '', cleaned_doc)
-        cleaned_doc = re.sub(r'---.*?---', ' ', cleaned_doc)
-        cleaned_doc = re.sub(r'\n+', ' ', cleaned_doc)
-        cleaned_doc = re.sub(r'\s+', ' ', cleaned_doc)
-        
-        # Teile in Sätze auf
-        sentences = re.split(r'[.!?]+', cleaned_doc)
+    for doc, prepared in zip(docs, indexed):
+        if prepared is None:
+            prepared = prepare_sentences(doc)
         
-        for sentence in sentences:
-            sentence = sentence.strip()
-            if len(sentence) < 50:
-                continue
-            
-            # STRENGER Fragment-Filter
-            is_fragment = False
-            for pattern in fragment_patterns:
-                if re.search(pattern, sentence):
-                    is_fragment = True
-                    break
-            
-            if is_fragment:
-                continue
-            
-            sentence_lower = sentence.lower()
+        for sentence in prepared:
+            sentence_lower = sentence.lower
             score = 0
             
             # Score für Frage-Keywords
             for word in question_words:
-                if len(word) > 3 and word in sentence_lower:
+                if word in sentence_lower:
                     score += 5
             
             # Score für bereichs-relevante Keywords
@@ -226,21 +247,21 @@ def _extract_clean_legal_content(docs, question, legal_area):
                     score += 4
             
             # Bonus für vollständige Rechtsbestimmungen
-            if re.search(r'\b(darf|muss|kann|soll|berechtigt|verpflichtet)\b', sentence_lower):
+            if not NORMATIVE_VERBS.isdisjoint(sentence.tokens):
                 score += 2
             
             # Nur hochwertige Sätze sammeln
             if score >= 10:
-                clean_content.append((sentence, score))
+                clean_content.append((sentence.text, score))
     
     # Sortiere nach Score und nimm die besten
     clean_content.sort(key=lambda x: x[1], reverse=True)
     return [content[0] for content in clean_content[:3]]
 
-def _generate_perfect_answer(question, docs, metas, legal_area):
+def _generate_perfect_answer(question, docs, metas, legal_area, doc_ids=None):
     """Perfekte Antwort-Generierung ohne Artikel-Fragmente"""
     
-    clean_content = _extract_clean_legal_content(docs, question, legal_area)
+    clean_content = _extract_clean_legal_content(docs, question, legal_area, doc_ids)
     sources_text = ", ".join(set(meta.get("quelle", "Unbekannt") for meta in metas[:3]))
     
     if not clean_content:
@@ -338,22 +359,21 @@ def _generate_area_specific_fallback(question, legal_area, sources_text):
     
     return answer
 
-def _generate_ollama_answer(question, docs, metas, legal_area):
-    """VERBESSERTE Ollama-Antwort mit perfektem Content"""
-    
-    logger.info(f"🧠 Generiere {legal_area}-Antwort mit Ollama...")
-    
-    clean_content = _extract_clean_legal_content(docs, question, legal_area)
-    sources_text = ", ".join(set(meta.get("quelle", "Unbekannt") for meta in metas[:3]))
-    
-    if not clean_content:
-        return _generate_area_specific_fallback(question, legal_area, sources_text)
-    
-    # Kompakter, sauberer Kontext
+# Ollama-Generierungsparameter (gemeinsam für Batch- und Streaming-Aufrufe)
+OLLAMA_OPTIONS = {
+    "temperature": 0.1,
+    "top_p": 0.9,
+    "num_predict": 400,
+    "num_ctx": 4000,
+    "repeat_penalty": 1.05,
+    "stop": ["\n\nFRAGE:", "RELEVANTE GESETZESTEXTE:", "\n\nQuellen:", "Quellen:", "\n---"]
+}
+
+def _build_ollama_prompt(question, clean_content):
+    """OPTIMIERTER Prompt mit kompaktem, sauberem Kontext"""
     context = "\n\n".join(clean_content[:2])[:800]
     
-    # OPTIMIERTER Prompt
-    prompt = f"""Du bist ein Schweizer Rechtsexperte. Beantworte die Frage direkt und präzise basierend auf den Schweizer Gesetzestexten.
+    return f"""Du bist ein Schweizer Rechtsexperte. Beantworte die Frage direkt und präzise basierend auf den Schweizer Gesetzestexten.
 
 FRAGE: {question}
 
@@ -364,252 +384,639 @@ Gib eine direkte, vollständige Antwort. Erkläre konkrete Bestimmungen aus den
 
 ANTWORT:"""
 
-    try:
-        response = requests.post(
-            f"{OLLAMA_BASE_URL}/api/generate",
-            json={
-                "model": "llama3.2:3b",
-                "prompt": prompt,
-                "stream": False,
-                "options": {
-                    "temperature": 0.1,
-                    "top_p": 0.9,
-                    "num_predict": 400,
-                    "num_ctx": 4000,
-                    "repeat_penalty": 1.05,
-                    "stop": ["\n\nFRAGE:", "RELEVANTE GESETZESTEXTE:", "\n\nQuellen:", "Quellen:", "\n---"]
-                }
-            },
-            timeout=60
-        )
-        
-        if response.status_code == 200:
-            result = response.json()
-            answer = result.get("response", "").strip()
-            
-            # Gründliche Bereinigung
-            answer = re.sub(r'^(ANTWORT:?|Antwort:?)\s*', '', answer, flags=re.IGNORECASE).strip()
-            answer = re.sub(r'^(Entschuldigung,?\s*(aber\s*)?.*?\.?\s*)', '', answer, flags=re.IGNORECASE).strip()
-            answer = re.sub(r'\n\s*\n', '\n', answer)
-            
-            # Schweizer Rechtsbegriffe
-            answer = answer.replace('§', 'Art.')
-            answer = re.sub(r'\bBGB\b', 'Schweizer Recht', answer)
-            answer = re.sub(r'\bABGB\b', 'Schweizer Recht', answer)
-            
-            if len(answer) > 50:
-                logger.info("✅ Vollständige Ollama-Antwort erhalten!")
-                return f"{answer}\n\nQuellen: {sources_text}"
-        
-        logger.warning("⚠️ Ollama unvollständig, verwende Fallback")
-        return _generate_perfect_answer(question, docs, metas, legal_area)
-        
-    except Exception as e:
-        logger.error(f"❌ Ollama Fehler: {e}")
-        return _generate_perfect_answer(question, docs, metas, legal_area)
+def _strip_answer_prefix(answer):
+    """Einleitungen wie 'ANTWORT:' oder Entschuldigungen entfernen"""
+    answer = re.sub(r'^(ANTWORT:?|Antwort:?)\s*', '', answer, flags=re.IGNORECASE).strip()
+    answer = re.sub(r'^(Entschuldigung,?\s*(aber\s*)?.*?\.?\s*)', '', answer, flags=re.IGNORECASE).strip()
+    return answer
 
-@app.route("/")
-def serve_frontend():
-    return send_from_directory("frontend", "index.html")
+def _apply_swiss_terms(text):
+    """Leerzeilen zusammenfassen und deutsche Rechtsbegriffe auf Schweizer Recht abbilden"""
+    text = re.sub(r'\n\s*\n', '\n', text)
+    text = text.replace('§', 'Art.')
+    text = re.sub(r'\bBGB\b', 'Schweizer Recht', text)
+    text = re.sub(r'\bABGB\b', 'Schweizer Recht', text)
+    return text
 
-@app.route("/<path:filename>")
-def serve_static(filename):
-    return send_from_directory("frontend", filename)
+def _clean_ollama_answer(answer):
+    """Gründliche Bereinigung einer vollständigen Ollama-Antwort"""
+    return _apply_swiss_terms(_strip_answer_prefix(answer.strip()))
 
-@app.route("/answer", methods=["POST"])
-def answer():
-    data = request.get_json()
-    question = data.get("question", "")
+class StreamingAnswerCleaner:
+    """Wendet die Ollama-Nachbearbeitung inkrementell auf gestreamte Tokens an.
     
-    logger.info(f"📝 Neue Frage: {question}")
+    Der Anfang wird gepuffert, bis Präfix-Entfernung und Mindestlänge entschieden
+    werden können. Danach wird ein angebrochenes Wort bzw. ein offener
+    Whitespace-Lauf am Ende zurückgehalten, damit BGB-Ersetzung und
+    Leerzeilen-Regel exakt wie auf dem Gesamttext greifen.
+    """
     
-    if not question:
-        return jsonify({"error": "Keine Frage erhalten."}), 400
+    PREFIX_BUFFER = 60
+    _pending_tail = re.compile(r'(\s+|\w+)$')
     
-    try:
-        # 1. PRÄZISE Rechtsbereich-Erkennung
-        legal_area = _detect_legal_area_precise(question)
-        logger.info(f"🏛️ Rechtsbereich: {legal_area}")
+    def __init__(self):
+        self._buffer = ""
+        self._started = False
+        self.emitted = []
+    
+    def feed(self, token):
+        """Neuen Token aufnehmen und den sicher ausgebbaren Text zurückgeben"""
+        self._buffer += token
         
-        # 2. Embedding erstellen
-        question_embedding = get_embedding(question)
-        if not question_embedding:
-            return jsonify({
-                "answer": "Entschuldigung, es gab ein technisches Problem. Bitte versuchen Sie es erneut.", 
-                "sources": [], 
-                "confidence": "error"
-            })
+        if not self._started:
+            if len(self._buffer.lstrip()) < self.PREFIX_BUFFER:
+                return ""
+            head = self._buffer.lstrip()
+            trailing_ws = head[len(head.rstrip()):]
+            self._buffer = _strip_answer_prefix(head) + trailing_ws
+            self._started = True
         
-        # 3. ChromaDB-Verbindung
-        client = get_chromadb_client()
-        if not client:
-            return jsonify({
-                "answer": "Die Datenbank ist momentan nicht verfügbar. Bitte versuchen Sie es später erneut.",
-                "sources": [],
-                "confidence": "error"
-            })
+        match = self._pending_tail.search(self._buffer)
+        cut = match.start() if match else len(self._buffer)
+        ready, self._buffer = self._buffer[:cut], self._buffer[cut:]
+        return self._emit(ready)
+    
+    def finish(self):
+        """Restpuffer ausgeben (abschliessender Whitespace entfällt wie bei strip())"""
+        rest = self._buffer.rstrip()
+        if not self._started:
+            rest = _strip_answer_prefix(rest)
+            self._started = True
+        self._buffer = ""
+        return self._emit(rest)
+    
+    def _emit(self, text):
+        text = _apply_swiss_terms(text)
+        if text:
+            self.emitted.append(text)
+        return text
+    
+    @property
+    def started(self):
+        return self._started
+    
+    @property
+    def text(self):
+        return "".join(self.emitted)
+
+def _prepare_ollama_request(question, docs, metas, legal_area, doc_ids=None):
+    """Prompt und Quellenangabe für Ollama (Prompt None, wenn kein sauberer Inhalt übrig bleibt)"""
+    clean_content = _extract_clean_legal_content(docs, question, legal_area, doc_ids)
+    sources_text = ", ".join(set(meta.get("quelle", "Unbekannt") for meta in metas[:3]))
+    prompt = _build_ollama_prompt(question, clean_content) if clean_content else None
+    return prompt, sources_text
+
+def _ollama_generate_request(prompt):
+    """JSON-Body für /api/generate ohne Streaming"""
+    return {
+        "model": OLLAMA_MODEL,
+        "prompt": prompt,
+        "stream": False,
+        "options": OLLAMA_OPTIONS
+    }
+
+def _finish_ollama_answer(raw_answer, sources_text):
+    """Ollama-Rohantwort bereinigen (None wenn sie unbrauchbar ist)"""
+    answer = _clean_ollama_answer(raw_answer)
+    
+    if len(answer) > 50:
+        logger.info("✅ Vollständige Ollama-Antwort erhalten!")
+        return f"{answer}\n\nQuellen: {sources_text}"
+    
+    logger.warning("⚠️ Ollama unvollständig, verwende Fallback")
+    return None
+
+def _generate_ollama_answer(question, docs, metas, legal_area, doc_ids=None, deadline=None):
+    """VERBESSERTE Ollama-Antwort mit perfektem Content (None wenn Ollama nichts Brauchbares liefert
+    oder das Antwortbudget der Anfrage abläuft). Fehlgeschlagene Generierungen werden einmal auf
+    einem anderen Backend wiederholt."""
+    
+    logger.info(f"🧠 Generiere {legal_area}-Antwort mit Ollama...")
+    
+    prompt, sources_text = _prepare_ollama_request(question, docs, metas, legal_area, doc_ids)
+    if prompt is None:
+        return None
+    
+    tried = []
+    for attempt in range(2):
+        backend = ollama_pool.acquire(exclude=tried)
+        if backend is None:
+            logger.warning("⚠️ Kein weiteres Ollama-Backend verfügbar")
+            return None
+        tried.append(backend)
         
-        # 4. Collection prüfen
-        try:
-            collection = client.get_collection("gesetzestexte")
-            doc_count = collection.count()
-            logger.info(f"📊 Collection: {doc_count} Dokumente")
-            
-            if doc_count == 0:
-                return jsonify({
-                    "answer": "Die Datenbank ist leer. Bitte wenden Sie sich an den Administrator.",
-                    "sources": [],
-                    "confidence": "error"
-                })
-                
-        except Exception as e:
-            logger.error(f"❌ Collection-Fehler: {e}")
-            return jsonify({
-                "answer": "Datenbankfehler. Bitte versuchen Sie es später erneut.",
-                "sources": [],
-                "confidence": "error"
-            })
+        timeout = 60 if deadline is None else deadline.timeout(60)
+        budget_limited = timeout < 60
+        if timeout <= 0:
+            ollama_pool.finish(backend, None)
+            generation_scheduler.record_deadline_exceeded()
+            logger.warning("⏱️ Antwortbudget erschöpft, verwende extraktive Antwort")
+            return None
         
-        # 5. ERWEITERTE Similarity Search
+        started = time.monotonic()
         try:
-            result = collection.query(
-                query_embeddings=[question_embedding],
-                n_results=15,  # Mehr Ergebnisse für bessere Auswahl
-                include=["documents", "metadatas", "distances"]
+            response = requests.post(
+                f"{backend.base_url}/api/generate",
+                json=_ollama_generate_request(prompt),
+                timeout=timeout
             )
             
-            logger.info(f"🔍 Suche: {len(result['documents'][0])} Ergebnisse")
+            if response.status_code != 200:
+                ollama_pool.finish(backend, False)
+                logger.warning(f"⚠️ Ollama {backend.base_url} HTTP {response.status_code}")
+                continue
             
-            if result["distances"][0]:
-                best_distance = min(result["distances"][0])
-                logger.info(f"📏 Beste Distanz: {best_distance:.4f}")
+            raw_answer = response.json().get("response", "")
+            ollama_pool.finish(backend, True, (time.monotonic() - started) * 1000)
+            return _finish_ollama_answer(raw_answer, sources_text)
+        
+        except requests.Timeout as e:
+            if budget_limited:
+                # Unser Budget, kein Ollama-Fehler - der Circuit Breaker bleibt unberührt
+                ollama_pool.finish(backend, None)
+                generation_scheduler.record_deadline_exceeded()
+                logger.warning("⏱️ Antwortbudget erschöpft, verwende extraktive Antwort")
+                return None
+            ollama_pool.finish(backend, False)
+            logger.error(f"❌ Ollama Fehler ({backend.base_url}): {e}")
             
         except Exception as e:
-            logger.error(f"❌ Suche fehlgeschlagen: {e}")
-            return jsonify({
-                "answer": "Suchfehler. Bitte versuchen Sie es erneut.",
-                "sources": [],
-                "confidence": "error"
-            })
-        
-        # 6. INTELLIGENTE Relevanz-Prüfung
-        if not result["documents"][0]:
-            return jsonify({
-                "answer": "Zu Ihrer Frage wurden keine relevanten Dokumente gefunden.",
-                "sources": [],
-                "confidence": "honest"
-            })
-        
-        best_distance = min(result["distances"][0])
-        
-        # Lockere Relevanz-Prüfung für Rechtsfragen
-        question_lower = question.lower()
-        legal_indicators = ['recht', 'gesetz', 'legal', 'strafe', 'arbeit', 'vertrag', 'ehe', 'eigentum', 'haftung', 'erlaubt', 'verboten', 'darf', 'muss', 'wie', 'was', 'welche', 'wann', 'kasse', 'versicherung', 'kündigung', 'frist']
-        has_legal_context = any(ind in question_lower for ind in legal_indicators)
-        
-        if not has_legal_context and best_distance > 3.5:
-            return jsonify({
-                "answer": "Entschuldigung, ich kann nur Fragen zum Schweizer Recht beantworten. Könnten Sie eine rechtliche Frage stellen?",
-                "sources": [],
-                "confidence": "honest"
-            })
-        
-        # 7. QUALITÄTS-BASIERTE Dokument-Filterung
-        relevant_docs = []
-        relevant_metas = []
-        relevant_distances = []
-        
-        # Bereichs-spezifische Quellen-Präferenz
-        area_source_mapping = {
-            'arbeitsrecht': ['arbeitsgesetz', 'obligationenrecht'],
-            'krankenversicherung': ['krankenversicherungsgesetz'],
-            'strafrecht': ['strafgesetz'],
-            'zivilrecht': ['obligationenrecht', 'zivilgesetzbuch'],
-            'familienrecht': ['zivilgesetzbuch'],
-            'verkehrsrecht': ['strassenverkehrsgesetz'],
-            'datenschutz': ['datenschutzgesetz']
-        }
-        
-        preferred_sources = area_source_mapping.get(legal_area, [])
-        
-        # Dynamische Schwellwerte
-        base_threshold = 2.0 if best_distance < 1.2 else 2.8
-        if legal_area in ['arbeitsrecht', 'krankenversicherung', 'datenschutz']:
-            base_threshold += 0.3  # Lockerer für wichtige Bereiche
+            ollama_pool.finish(backend, False)
+            logger.error(f"❌ Ollama Fehler ({backend.base_url}): {e}")
+    
+    logger.warning("⚠️ Ollama fehlgeschlagen, verwende Fallback")
+    return None
+
+def _stream_ollama_answer(question, docs, metas, legal_area, outcome, doc_ids=None):
+    """Ollama-Antwort als Folge bereinigter Textstücke (Fallback als ein Stück).
+    
+    outcome["generated_by"] wird auf "llm" oder "extractive" gesetzt.
+    """
+    
+    logger.info(f"🧠 Streame {legal_area}-Antwort mit Ollama...")
+    outcome["generated_by"] = "extractive"
+    
+    clean_content = _extract_clean_legal_content(docs, question, legal_area, doc_ids)
+    sources_text = ", ".join(set(meta.get("quelle", "Unbekannt") for meta in metas[:3]))
+    
+    if not clean_content:
+        yield _generate_area_specific_fallback(question, legal_area, sources_text)
+        return
+    
+    prompt = _build_ollama_prompt(question, clean_content)
+    failed = False
+    tried = []
+    while True:
+        backend = ollama_pool.acquire(exclude=tried)
+        if backend is None:
+            logger.warning("⚠️ Kein weiteres Ollama-Backend verfügbar, verwende Fallback")
+            yield _generate_perfect_answer(question, docs, metas, legal_area, doc_ids)
+            return
+        tried.append(backend)
         
-        for doc, meta, dist in zip(result["documents"][0], result["metadatas"][0], result["distances"][0]):
-            source_name = meta.get("quelle", "").lower()
-            
-            threshold = base_threshold
-            # Bonus für passende Quellen
-            if preferred_sources and any(pref in source_name for pref in preferred_sources):
-                threshold += 0.5
+        # Neuer Cleaner pro Versuch: gepufferter Text eines fehlgeschlagenen Backends darf nicht in die Antwort
+        cleaner = StreamingAnswerCleaner()
+        started = time.monotonic()
+        try:
+            for token in stream_ollama_generate(backend.base_url, OLLAMA_MODEL, prompt, OLLAMA_OPTIONS, timeout=60):
+                piece = cleaner.feed(token)
+                if piece:
+                    yield piece
             
-            if dist < threshold:
-                relevant_docs.append(doc)
-                relevant_metas.append(meta)
-                relevant_distances.append(dist)
+            ollama_pool.finish(backend, True, (time.monotonic() - started) * 1000)
+            streamed_before_finish = bool(cleaner.emitted)
+            last_piece = cleaner.finish()
+            break
         
-        if not relevant_docs:
-            return jsonify({
-                "answer": f"Zu Ihrer Frage im Bereich {legal_area.title()} konnte ich keine ausreichend relevanten Informationen finden. Versuchen Sie eine andere Formulierung.",
-                "sources": [],
-                "confidence": "honest"
-            })
+        except GeneratorExit:
+            # Client hat den Stream abgebrochen
+            ollama_pool.finish(backend, None)
+            raise
         
-        logger.info(f"✅ {len(relevant_docs)} relevante Dokumente (Beste Distanz: {min(relevant_distances):.3f})")
+        except Exception as e:
+            ollama_pool.finish(backend, False)
+            logger.error(f"❌ Ollama Stream-Fehler ({backend.base_url}): {e}")
+            # Vor dem ersten Token einmal auf einem anderen Backend wiederholen
+            if not cleaner.emitted and len(tried) < 2:
+                continue
+            failed = True
+            break
+    
+    if failed:
+        if cleaner.emitted:
+            # Bereits gesendeten Text nicht zurücknehmen, nur Quellen anhängen
+            outcome["generated_by"] = "llm"
+            yield f"\n\nQuellen: {sources_text}"
+            return
+        yield _generate_perfect_answer(question, docs, metas, legal_area, doc_ids)
+        return
+    
+    # Gleiche Regel wie ohne Streaming: zu kurze Antworten werden ersetzt
+    if len(cleaner.text) > 50 or streamed_before_finish:
+        logger.info("✅ Vollständige Ollama-Antwort gestreamt!")
+        outcome["generated_by"] = "llm"
+        if last_piece:
+            yield last_piece
+        yield f"\n\nQuellen: {sources_text}"
+        return
+    
+    logger.warning("⚠️ Ollama unvollständig, verwende Fallback")
+    yield _generate_perfect_answer(question, docs, metas, legal_area, doc_ids)
+
+@app.route("/")
+def serve_frontend():
+    return send_from_directory("frontend", "index.html")
+
+@app.route("/<path:filename>")
+def serve_static(filename):
+    return send_from_directory("frontend", filename)
+
+def _error_payload(answer_text, confidence="error"):
+    return {"answer": answer_text, "sources": [], "confidence": confidence}
+
+class AnswerLookup:
+    """Zwischenergebnis der Schritte 1-2 inkl. Cache-Abfragen"""
+    
+    def __init__(self, question):
+        self.question = question
+        self.question_key = normalize_question(question)
+        self.corpus_version = read_corpus_version()
+        self.legal_area = None
+        self.question_embedding = None
+        self.payload = None
+
+def _lookup_answer(question, legal_area=None):
+    """Schritte 1-2: Rechtsbereich, persistenter Speicher, Embedding und semantischer Cache"""
+    lookup = AnswerLookup(question)
+    
+    # 1. PRÄZISE Rechtsbereich-Erkennung
+    lookup.legal_area = legal_area or _detect_legal_area_precise(question)
+    logger.info(f"🏛️ Rechtsbereich: {lookup.legal_area}")
+    
+    # Persistenter Speicher: exakt gleiche (normalisierte) Frage zum selben Korpus
+    if answer_store is not None and lookup.corpus_version:
+        lookup.payload = answer_store.get(lookup.question_key, lookup.legal_area, lookup.corpus_version)
+        if lookup.payload is not None:
+            logger.info("💾 Antwort aus persistentem Speicher")
+            return lookup
+    
+    # 2. Embedding erstellen
+    lookup.question_embedding = get_embedding(question)
+    if lookup.question_embedding is None:
+        lookup.payload = _error_payload("Entschuldigung, es gab ein technisches Problem. Bitte versuchen Sie es erneut.")
+        return lookup
+    
+    # Semantischer Cache: fast identische Frage im selben Rechtsbereich
+    lookup.payload = answer_cache.lookup(lookup.question_embedding, lookup.legal_area, lookup.corpus_version)
+    if lookup.payload is not None:
+        logger.info("⚡ Antwort aus semantischem Cache")
+    return lookup
+
+def _remember_answer(lookup, payload, generated_by):
+    """Nur inhaltliche Antworten cachen - technische Fehler und Fallbacks bei
+    Ollama-Ausfall sollen später erneut versucht werden"""
+    if payload.get("confidence") == "error" or generated_by == "extractive":
+        return
+    
+    answer_cache.store(lookup.question_embedding, lookup.legal_area, lookup.corpus_version, payload)
+    if answer_store is not None and lookup.corpus_version:
+        answer_store.put(lookup.question_key, lookup.legal_area, lookup.corpus_version, payload)
+
+def _retrieve_relevant_context(question, legal_area, question_embedding):
+    """Schritte 3-6 der Pipeline: Suche und Filterung.
+    
+    Gibt (payload, None) zurück, wenn die Anfrage ohne Generierung beantwortet
+    wird, sonst (None, context) mit legal_area, ids, docs, metas und distances.
+    """
+    
+    # 3. Collection prüfen (Handle und Dokumentanzahl sind prozessweit gecacht)
+    try:
+        doc_count = retriever.document_count()
+    except Exception as e:
+        logger.error(f"❌ Collection-Fehler: {e}")
+        return _error_payload("Datenbankfehler. Bitte versuchen Sie es später erneut."), None
+
+    if doc_count is None:
+        return _error_payload("Die Datenbank ist momentan nicht verfügbar. Bitte versuchen Sie es später erneut."), None
+
+    if doc_count == 0:
+        return _error_payload("Die Datenbank ist leer. Bitte wenden Sie sich an den Administrator."), None
+    
+    # 4. ERWEITERTE Similarity Search
+    try:
+        result = retriever.query(question_embedding, n_results=15)  # Mehr Ergebnisse für bessere Auswahl
         
-        # 8. PERFEKTE Antwort-Generierung
-        ollama_available = _test_ollama_connection()
+        logger.info(f"🔍 Suche: {len(result['documents'][0])} Ergebnisse")
         
-        if ollama_available:
-            logger.info("🦙 Verwende Ollama")
-            answer_text = _generate_ollama_answer(question, relevant_docs, relevant_metas, legal_area)
-        else:
-            logger.info("🔄 Verwende intelligenten Fallback")
-            answer_text = _generate_perfect_answer(question, relevant_docs, relevant_metas, legal_area)
+        if result["distances"][0]:
+            best_distance = min(result["distances"][0])
+            logger.info(f"📏 Beste Distanz: {best_distance:.4f}")
         
-        # 9. REALISTISCHE Quellen und Confidence
-        sources = []
-        for meta, distance in zip(relevant_metas[:4], relevant_distances[:4]):
-            # Bessere Relevanz-Berechnung
-            if distance < 1.0:
-                relevance_score = 90 + (1.0 - distance) * 5  # 90-95%
-            elif distance < 1.5:
-                relevance_score = 80 + (1.5 - distance) * 20  # 80-90%
-            elif distance < 2.0:
-                relevance_score = 70 + (2.0 - distance) * 20  # 70-80%
-            else:
-                relevance_score = max(65, 70 - (distance - 2.0) * 10)  # 65-70%
-            
-            relevance_score = min(95, max(65, relevance_score))
-            
-            sources.append({
-                "quelle": meta.get("quelle", "Unbekannt"),
-                "chunk_id": meta.get("chunk_id", "N/A"),
-                "relevanz": f"{relevance_score:.1f}%"
-            })
+    except Exception as e:
+        logger.error(f"❌ Suche fehlgeschlagen: {e}")
+        return _error_payload("Suchfehler. Bitte versuchen Sie es erneut."), None
+    
+    # 5. INTELLIGENTE Relevanz-Prüfung
+    if not result["documents"][0]:
+        return _error_payload("Zu Ihrer Frage wurden keine relevanten Dokumente gefunden.", "honest"), None
+    
+    best_distance = min(result["distances"][0])
+    
+    # Lockere Relevanz-Prüfung für Rechtsfragen
+    question_lower = question.lower()
+    legal_indicators = ['recht', 'gesetz', 'legal', 'strafe', 'arbeit', 'vertrag', 'ehe', 'eigentum', 'haftung', 'erlaubt', 'verboten', 'darf', 'muss', 'wie', 'was', 'welche', 'wann', 'kasse', 'versicherung', 'kündigung', 'frist']
+    has_legal_context = any(ind in question_lower for ind in legal_indicators)
+    
+    if not has_legal_context and best_distance > 3.5:
+        return _error_payload("Entschuldigung, ich kann nur Fragen zum Schweizer Recht beantworten. Könnten Sie eine rechtliche Frage stellen?", "honest"), None
+    
+    # 6. QUALITÄTS-BASIERTE Dokument-Filterung
+    relevant_ids = []
+    relevant_docs = []
+    relevant_metas = []
+    relevant_distances = []
+    
+    # Bereichs-spezifische Quellen-Präferenz
+    area_source_mapping = {
+        'arbeitsrecht': ['arbeitsgesetz', 'obligationenrecht'],
+        'krankenversicherung': ['krankenversicherungsgesetz'],
+        'strafrecht': ['strafgesetz'],
+        'zivilrecht': ['obligationenrecht', 'zivilgesetzbuch'],
+        'familienrecht': ['zivilgesetzbuch'],
+        'verkehrsrecht': ['strassenverkehrsgesetz'],
+        'datenschutz': ['datenschutzgesetz']
+    }
+    
+    preferred_sources = area_source_mapping.get(legal_area, [])
+    
+    # Dynamische Schwellwerte
+    base_threshold = 2.0 if best_distance < 1.2 else 2.8
+    if legal_area in ['arbeitsrecht', 'krankenversicherung', 'datenschutz']:
+        base_threshold += 0.3  # Lockerer für wichtige Bereiche
+    
+    for doc_id, doc, meta, dist in zip(result["ids"][0], result["documents"][0], result["metadatas"][0], result["distances"][0]):
+        source_name = meta.get("quelle", "").lower()
         
-        # REALISTISCHE Confidence-Berechnung
-        avg_relevance = sum(float(s["relevanz"].replace('%', '')) for s in sources[:3]) / min(3, len(sources))
-        best_distance = min(relevant_distances)
+        threshold = base_threshold
+        # Bonus für passende Quellen
+        if preferred_sources and any(pref in source_name for pref in preferred_sources):
+            threshold += 0.5
         
-        if avg_relevance >= 88 and best_distance < 1.0:
-            confidence = "high"
-        elif avg_relevance >= 82 and best_distance < 1.3:
-            confidence = "high"
-        elif avg_relevance >= 75 and best_distance < 1.8:
-            confidence = "medium"
-        elif avg_relevance >= 70 and best_distance < 2.2:
-            confidence = "medium"
+        if dist < threshold:
+            relevant_ids.append(doc_id)
+            relevant_docs.append(doc)
+            relevant_metas.append(meta)
+            relevant_distances.append(dist)
+    
+    if not relevant_docs:
+        return _error_payload(f"Zu Ihrer Frage im Bereich {legal_area.title()} konnte ich keine ausreichend relevanten Informationen finden. Versuchen Sie eine andere Formulierung.", "honest"), None
+    
+    logger.info(f"✅ {len(relevant_docs)} relevante Dokumente (Beste Distanz: {min(relevant_distances):.3f})")
+    
+    return None, {
+        "legal_area": legal_area,
+        "ids": relevant_ids,
+        "docs": relevant_docs,
+        "metas": relevant_metas,
+        "distances": relevant_distances
+    }
+
+def _build_sources_and_confidence(relevant_metas, relevant_distances):
+    """REALISTISCHE Quellen und Confidence"""
+    sources = []
+    for meta, distance in zip(relevant_metas[:4], relevant_distances[:4]):
+        # Bessere Relevanz-Berechnung
+        if distance < 1.0:
+            relevance_score = 90 + (1.0 - distance) * 5  # 90-95%
+        elif distance < 1.5:
+            relevance_score = 80 + (1.5 - distance) * 20  # 80-90%
+        elif distance < 2.0:
+            relevance_score = 70 + (2.0 - distance) * 20  # 70-80%
         else:
-            confidence = "low"
+            relevance_score = max(65, 70 - (distance - 2.0) * 10)  # 65-70%
         
-        return jsonify({
-            "answer": answer_text,
-            "sources": sources,
-            "confidence": confidence
+        relevance_score = min(95, max(65, relevance_score))
+        
+        sources.append({
+            "quelle": meta.get("quelle", "Unbekannt"),
+            "chunk_id": meta.get("chunk_id", "N/A"),
+            "relevanz": f"{relevance_score:.1f}%"
         })
+    
+    # REALISTISCHE Confidence-Berechnung
+    avg_relevance = sum(float(s["relevanz"].replace('%', '')) for s in sources[:3]) / min(3, len(sources))
+    best_distance = min(relevant_distances)
+    
+    if avg_relevance >= 88 and best_distance < 1.0:
+        confidence = "high"
+    elif avg_relevance >= 82 and best_distance < 1.3:
+        confidence = "high"
+    elif avg_relevance >= 75 and best_distance < 1.8:
+        confidence = "medium"
+    elif avg_relevance >= 70 and best_distance < 2.2:
+        confidence = "medium"
+    else:
+        confidence = "low"
+    
+    return sources, confidence
+
+def _retrieval_data(context):
+    """Gefundene Dokumente und Distanzen für das Qualitäts-Log (ohne Kontext: keine relevanten Dokumente)"""
+    if context is None:
+        return {"documents": [], "distances": []}
+    return {"documents": context["docs"], "distances": context["distances"]}
+
+def _log_answered_question(question, payload, retrieval_data):
+    """Beantwortete Frage protokollieren (jede Anfrage, auch Cache-Treffer); darf die Antwort nie verhindern.
+    retrieval_data None = Antwort aus einem Cache, ohne Suche"""
+    if not ANSWER_QUALITY_LOG or payload.get("confidence") == "error":
+        return
+    try:
+        quality_monitor.log_answer_quality(question, payload, retrieval_data, cached=retrieval_data is None)
+    except Exception as e:
+        logger.warning(f"⚠️ Qualitäts-Log fehlgeschlagen: {e}")
+
+def _request_deadline(data):
+    """Antwortbudget: deadline_ms aus dem JSON, sonst ANSWER_DEADLINE (höchstens ANSWER_DEADLINE_MAX).
+
+    Unbegrenzt nur über die Server-Einstellung ANSWER_DEADLINE=0 - nicht endliche
+    oder nicht positive Werte von deadline_ms werden ignoriert.
+    """
+    budget = ANSWER_DEADLINE if ANSWER_DEADLINE > 0 else None
+    if data.get("deadline_ms") is not None:
+        try:
+            requested = float(data["deadline_ms"]) / 1000 if not isinstance(data["deadline_ms"], bool) else None
+        except (TypeError, ValueError):
+            requested = None
+        if requested is not None and math.isfinite(requested) and requested > 0:
+            budget = requested
+        else:
+            logger.warning(f"⚠️ Ungültiges deadline_ms ignoriert: {data['deadline_ms']!r}")
+    if budget is None:
+        return Deadline()
+    return Deadline(min(budget, ANSWER_DEADLINE_MAX) if ANSWER_DEADLINE_MAX > 0 else budget)
+
+def _answer_question(question, deadline=None):
+    """Komplette Pipeline ohne Flask-Kontext - liefert (JSON-Payload von /answer, Suchdaten).
+    
+    Identische gleichzeitige Fragen (normalisiert, gleicher Rechtsbereich,
+    gleiches Budget) teilen sich eine Ausführung. Die Suchdaten (Dokumente,
+    Distanzen) sind None, wenn die Antwort aus einem Cache stammt.
+    """
+    deadline = deadline or Deadline()
+    legal_area = _detect_legal_area_precise(question)
+    flight_key = (normalize_question(question), legal_area, deadline.budget)
+    return answer_flights.do(flight_key, lambda: _run_answer_pipeline(question, legal_area, deadline))
+
+def _run_answer_pipeline(question, legal_area, deadline):
+    """Caches, Suche und Generierung für eine (bereits klassifizierte) Frage"""
+    lookup = _lookup_answer(question, legal_area)
+    if lookup.payload is not None:
+        return lookup.payload, None
+    
+    legal_area = lookup.legal_area
+    payload, context = _retrieve_relevant_context(question, legal_area, lookup.question_embedding)
+    if payload is not None:
+        _remember_answer(lookup, payload, None)
+        return payload, _retrieval_data(None)
+    
+    # 7. PERFEKTE Antwort-Generierung (Ollama-Status kommt aus dem Hintergrund-Monitor)
+    answer_text = None
+    fallback = None
+    if ollama_pool.is_available():
+        # Extraktive Antwort parallel vorbereiten - sie steht sofort bereit, wenn Ollama das Budget überschreitet
+        fallback = fallback_executor.submit(_generate_perfect_answer, question, context["docs"], context["metas"], legal_area, context["ids"])
+        with generation_scheduler.slot(timeout=deadline.remaining()) as granted:
+            if granted:
+                logger.info("🦙 Verwende Ollama")
+                answer_text = _generate_ollama_answer(question, context["docs"], context["metas"], legal_area, context["ids"], deadline)
+            else:
+                logger.warning("⏳ Kein Generierungs-Slot frei, verwende Fallback")
+    
+    fallback_text = fallback.result() if fallback is not None and answer_text is None else None
+    return _finalize_answer(lookup, context, answer_text, fallback_text), _retrieval_data(context)
+
+def _finalize_answer(lookup, context, answer_text, fallback_text=None):
+    """Schritte 7-8 nach der Generierung: Fallback, Quellen, Confidence und Caches.
+    generated_by im Payload zeigt, welcher Pfad die Antwort erzeugt hat."""
+    legal_area = context["legal_area"]
+    generated_by = "llm"
+    if answer_text is None:
+        logger.info("🔄 Verwende intelligenten Fallback")
+        answer_text = fallback_text or _generate_perfect_answer(lookup.question, context["docs"], context["metas"], legal_area, context["ids"])
+        generated_by = "extractive"
+    
+    # 8. REALISTISCHE Quellen und Confidence
+    sources, confidence = _build_sources_and_confidence(context["metas"], context["distances"])
+    
+    payload = {
+        "answer": answer_text,
+        "sources": sources,
+        "confidence": confidence,
+        "generated_by": generated_by
+    }
+    _remember_answer(lookup, payload, generated_by)
+    return payload
+
+def _warm_up_answer_store(limit, max_wait):
+    """Häufigste Fragen aus logs/answer_quality.jsonl vorab beantworten und speichern"""
+    corpus_version = read_corpus_version()
+    if not corpus_version:
+        logger.info("🔥 Warm-up übersprungen: kein Korpus-Fingerprint vorhanden")
+        return
+    
+    removed = answer_store.prune_stale(corpus_version)
+    if removed:
+        logger.info(f"🧹 {removed} gespeicherte Antworten eines alten Korpus entfernt")
+    
+    questions = quality_monitor.most_frequent_questions(limit)
+    if not questions:
+        return
+    
+    # Ohne Ollama entstünden nur Fallback-Antworten, die nicht gespeichert werden
+    deadline = time.monotonic() + max_wait
+    while not ollama_pool.reachable:
+        if shutdown_flag.is_set() or time.monotonic() > deadline:
+            logger.warning("🔥 Warm-up abgebrochen: Ollama nicht erreichbar")
+            return
+        time.sleep(2)
+    
+    warmed = 0
+    for question in questions:
+        if shutdown_flag.is_set():
+            break
+        legal_area = _detect_legal_area_precise(question)
+        if answer_store.contains(normalize_question(question), legal_area, corpus_version):
+            continue
+        try:
+            _answer_question(question)
+            warmed += 1
+        except Exception as e:
+            logger.warning(f"🔥 Warm-up für '{question}' fehlgeschlagen: {e}")
+    
+    logger.info(f"🔥 Warm-up abgeschlossen: {warmed} von {len(questions)} häufigen Fragen neu generiert")
+
+def start_answer_store_warmup():
+    """Warm-up im Hintergrund starten, damit der Server sofort Anfragen annimmt"""
+    if answer_store is None or ANSWER_WARMUP_COUNT <= 0:
+        return
+    threading.Thread(
+        target=_warm_up_answer_store,
+        args=(ANSWER_WARMUP_COUNT, ANSWER_WARMUP_WAIT),
+        name="answer-warmup",
+        daemon=True
+    ).start()
+
+def preload_shared_state():
+    """Im gunicorn-Master vor dem fork: Index laden, damit alle Worker die Seiten copy-on-write teilen"""
+    doc_count = retriever.document_count()
+    logger.info(f"📦 Vorgeladen: Embedding-Model ({QUERY_EMBEDDING_BACKEND}), {retriever.name} mit {doc_count} Dokumenten")
+
+def init_worker_process(torch_threads=0, start_warmup=False):
+    """In jedem gunicorn-Worker nach dem fork: prozesslokale Ressourcen neu aufbauen"""
+    global embedding_model
+    
+    if embedding_model is not None and QUERY_EMBEDDING_BACKEND == "onnx":
+        # ONNX-Runtime-Sessions (Thread-Pools) überstehen keinen fork - pro Worker neu laden
+        embedding_model = load_embedding_model(QUERY_EMBEDDING_BACKEND, threads=torch_threads)
+        embedding_batcher.model = embedding_model
+    elif torch_threads:
+        import torch
+        torch.set_num_threads(torch_threads)
+    
+    # Threads und Verbindungen des Masters existieren im Worker nicht
+    retriever.reset()
+    ollama_pool.start()
+    if start_warmup:
+        start_answer_store_warmup()
+    logger.info(f"👷 Worker {os.getpid()} bereit ({torch_threads or 'Standard'} Threads für Embeddings)")
+
+def _overloaded_response(error):
+    """Schnelle Ablehnung bei Überlast: 429 mit Retry-After"""
+    logger.warning(f"🚦 Anfrage abgelehnt: {error}")
+    response = jsonify({"error": "Der Server ist ausgelastet. Bitte versuchen Sie es in Kürze erneut."})
+    response.status_code = 429
+    response.headers["Retry-After"] = str(error.retry_after)
+    return response
+
+@app.route("/answer", methods=["POST"])
+def answer():
+    data = request.get_json()
+    question = data.get("question", "")
+    
+    logger.info(f"📝 Neue Frage: {question}")
+    
+    if not question:
+        return jsonify({"error": "Keine Frage erhalten."}), 400
+    
+    try:
+        with generation_scheduler.admission():
+            payload, retrieval_data = _answer_question(question, _request_deadline(data))
+        _log_answered_question(question, payload, retrieval_data)
+        return jsonify(payload)
+    
+    except GenerationOverloaded as e:
+        return _overloaded_response(e)
         
     except Exception as e:
         logger.error(f"❌ Unerwarteter Fehler: {e}")
@@ -619,29 +1026,119 @@ def answer():
             "confidence": "error"
         })
 
+def _sse_event(event, data):
+    """Ein Server-Sent Event im text/event-stream Format"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+def _sse_complete_answer(payload):
+    """Bereits fertige Antwort (Cache, Fehler, ehrliche Absage) als Event-Folge"""
+    yield _sse_event("meta", {"sources": payload["sources"], "confidence": payload["confidence"]})
+    yield _sse_event("token", {"text": payload["answer"]})
+    yield _sse_event("done", payload)
+
+@app.route("/answer/stream", methods=["POST"])
+def answer_stream():
+    """Wie /answer, aber als Server-Sent Events: erst Quellen, dann Tokens"""
+    data = request.get_json()
+    question = data.get("question", "")
+    
+    logger.info(f"📝 Neue Frage (Stream): {question}")
+    
+    if not question:
+        return jsonify({"error": "Keine Frage erhalten."}), 400
+    
+    try:
+        generation_scheduler.admit()
+    except GenerationOverloaded as e:
+        return _overloaded_response(e)
+    
+    def generate():
+        try:
+            lookup = _lookup_answer(question)
+            if lookup.payload is not None:
+                _log_answered_question(question, lookup.payload, None)
+                yield from _sse_complete_answer(lookup.payload)
+                return
+            
+            legal_area = lookup.legal_area
+            payload, context = _retrieve_relevant_context(question, legal_area, lookup.question_embedding)
+            if payload is not None:
+                _remember_answer(lookup, payload, None)
+                _log_answered_question(question, payload, _retrieval_data(None))
+                yield from _sse_complete_answer(payload)
+                return
+            
+            sources, confidence = _build_sources_and_confidence(context["metas"], context["distances"])
+            yield _sse_event("meta", {"sources": sources, "confidence": confidence, "legal_area": legal_area})
+            
+            outcome = {"generated_by": "extractive"}
+            answer_parts = []
+            with generation_scheduler.slot(enabled=ollama_pool.is_available()) as granted:
+                if granted:
+                    logger.info("🦙 Verwende Ollama (Stream)")
+                    pieces = _stream_ollama_answer(question, context["docs"], context["metas"], legal_area, outcome, context["ids"])
+                else:
+                    logger.info("🔄 Verwende intelligenten Fallback")
+                    pieces = [_generate_perfect_answer(question, context["docs"], context["metas"], legal_area, context["ids"])]
+                
+                for piece in pieces:
+                    answer_parts.append(piece)
+                    yield _sse_event("token", {"text": piece})
+            
+            payload = {
+                "answer": "".join(answer_parts),
+                "sources": sources,
+                "confidence": confidence,
+                "generated_by": outcome["generated_by"]
+            }
+            _remember_answer(lookup, payload, outcome["generated_by"])
+            _log_answered_question(question, payload, _retrieval_data(context))
+            yield _sse_event("done", payload)
+        
+        except Exception as e:
+            logger.error(f"❌ Unerwarteter Stream-Fehler: {e}")
+            yield _sse_event("error", _error_payload("Es ist ein unerwarteter Fehler aufgetreten. Bitte versuchen Sie es erneut."))
+    
+    response = Response(
+        stream_with_context(generate()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+    # Zulassung erst freigeben, wenn der Stream beendet oder abgebrochen ist
+    response.call_on_close(generation_scheduler.leave)
+    return response
+
 @app.route("/health")
 def health_check():
     """Gesundheitscheck"""
     try:
-        client = get_chromadb_client()
-        if not client:
+        doc_count = retriever.document_count()
+        if doc_count is None:
             return jsonify({
                 "status": "unhealthy",
-                "error": "ChromaDB nicht erreichbar"
+                "error": f"Retrieval-Backend '{retriever.name}' nicht erreichbar"
             }), 500
         
-        collection = client.get_collection("gesetzestexte")
-        doc_count = collection.count()
         model_status = "loaded" if embedding_model is not None else "not_loaded"
-        ollama_status = _test_ollama_connection()
         
         return jsonify({
             "status": "healthy",
             "chromadb": "connected",
+            "retrieval_backend": retriever.name,
             "documents": doc_count,
             "embedding_model": model_status,
-            "ollama": "connected" if ollama_status else "disconnected",
-            "ollama_host": OLLAMA_BASE_URL
+            "embedding_backend": QUERY_EMBEDDING_BACKEND,
+            "ollama": "connected" if ollama_pool.reachable else "disconnected",
+            "ollama_circuit": ollama_pool.state,
+            "ollama_host": ", ".join(OLLAMA_BASE_URLS),
+            "ollama_backends": {
+                backend.base_url: {
+                    "reachable": backend.monitor.reachable,
+                    "circuit": backend.breaker.state,
+                    "outstanding": backend.outstanding
+                }
+                for backend in ollama_pool.backends
+            }
         }), 200
         
     except Exception as e:
@@ -654,25 +1151,30 @@ def health_check():
 def get_available_sources():
     """Verfügbare Quellen anzeigen"""
     try:
-        client = get_chromadb_client()
-        if not client:
-            return jsonify({"sources": []})
-        
-        collection = client.get_collection("gesetzestexte")
-        result = collection.get(include=["metadatas"])
-        sources = set()
-        for meta in result["metadatas"]:
-            sources.add(meta.get("quelle", "Unbekannt"))
-        
-        return jsonify({"sources": sorted(list(sources))})
+        return jsonify({"sources": retriever.sources()})
     except Exception as e:
         logger.error(f"Fehler beim Laden der Quellen: {e}")
         return jsonify({"sources": []})
 
+@app.route("/metrics")
+def metrics():
+    """Laufzeit-Metriken der Pipeline-Komponenten"""
+    return jsonify({
+        "embedding_batcher": embedding_batcher.stats() if embedding_batcher else None,
+        "embedding_cache": embedding_cache.stats(),
+        "answer_cache": answer_cache.stats(),
+        "answer_store": answer_store.stats() if answer_store else None,
+        "request_coalescing": answer_flights.stats(),
+        "generation": generation_scheduler.stats(),
+        "retrieval": retriever.stats(),
+        "ollama": ollama_pool.stats()
+    })
+
 def signal_handler(sig, frame):
     """Graceful shutdown"""
     logger.info("🛑 Shutting down gracefully...")
     shutdown_flag.set()
+    ollama_pool.stop()
     sys.exit(0)
 
 signal.signal(signal.SIGINT, signal_handler)
@@ -687,14 +1189,14 @@ if __name__ == "__main__":
     else:
         logger.error("❌ HuggingFace Model: Fehler")
     
-    client = get_chromadb_client()
-    if client:
-        try:
-            collection = client.get_collection("gesetzestexte")
-            doc_count = collection.count()
-            logger.info(f"📊 ChromaDB bereit: {doc_count} Dokumente")
-        except:
-            logger.warning("⚠️ ChromaDB Collection nicht gefunden")
+    try:
+        doc_count = retriever.document_count()
+        if doc_count is not None:
+            logger.info(f"📊 {retriever.name} bereit: {doc_count} Dokumente")
+    except:
+        logger.warning(f"⚠️ Keine Dokumente im Retrieval-Backend '{retriever.name}' gefunden")
+    
+    start_answer_store_warmup()
     
     logger.info("🌐 Perfect Legal Server startet auf http://0.0.0.0:5000")
     
@@ -0,0 +1,202 @@
+# asgi.py - asyncio-Variante von /answer: wartende Generierungen kosten Coroutinen statt Threads
+#
+#   uvicorn asgi:application --host 0.0.0.0 --port 5000
+#   gunicorn -c gunicorn.conf.py -k uvicorn.workers.UvicornWorker asgi:application
+#
+# POST /answer läuft im Event-Loop: Embedding, Cache-Abfragen, Suche und
+# Textaufbereitung in einem kleinen Thread-Pool, die Ollama-Generierung über
+# einen gepoolten, nicht-blockierenden HTTP-Client. Alle übrigen Routen
+# (Frontend, /answer/stream, /health, /metrics, ...) liefert die Flask-App
+# unverändert über WSGI. Das JSON von /answer ist identisch zur Flask-Route.
+
+import asyncio
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from a2wsgi import WSGIMiddleware
+from starlette.applications import Starlette
+from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import Response
+from starlette.routing import Mount, Route, request_response
+
+import app as chatbot
+from answer_cache import AsyncSingleFlight
+from embedding_service import normalize_question
+from generation_scheduler import GenerationOverloaded
+from ollama_client import AsyncOllamaClient
+
+logger = logging.getLogger(__name__)
+logging.getLogger("httpx").setLevel(logging.WARNING)  # keine Logzeile pro Ollama-Request
+
+# Threads für die blockierenden Schritte (Embedding, Suche, Textaufbereitung)
+ASYNC_EXECUTOR_WORKERS = int(os.getenv("ASYNC_EXECUTOR_WORKERS", "8"))
+# Gleichzeitige Verbindungen zu Ollama (alle Backends) - weitere Generierungen warten als Coroutine im Pool
+OLLAMA_MAX_CONNECTIONS = int(os.getenv("OLLAMA_MAX_CONNECTIONS", "32"))
+# Threads für die übrigen (WSGI-)Routen
+WSGI_THREADS = int(os.getenv("WSGI_THREADS", "8"))
+
+pipeline_executor = ThreadPoolExecutor(max_workers=ASYNC_EXECUTOR_WORKERS, thread_name_prefix="answer-pipeline")
+ollama_client = AsyncOllamaClient(chatbot.OLLAMA_MODEL, timeout=60.0, max_connections=OLLAMA_MAX_CONNECTIONS)
+answer_flights = AsyncSingleFlight()
+
+
+async def _in_executor(fn, *args):
+    return await asyncio.get_running_loop().run_in_executor(pipeline_executor, partial(fn, *args))
+
+
+def _json_response(payload, status=200):
+    """Gleiche Bytes wie jsonify() der Flask-App (Schlüsselreihenfolge, Escaping, Zeilenende)"""
+    flask_response = chatbot.app.json.response(payload)
+    return Response(flask_response.get_data(), status_code=status, media_type=flask_response.mimetype)
+
+
+async def _generate_ollama_answer(question, context):
+    """Wie app._generate_ollama_answer (inkl. einer Wiederholung auf einem anderen Backend),
+    aber der Request blockiert keinen Thread"""
+    legal_area = context["legal_area"]
+    logger.info(f"🧠 Generiere {legal_area}-Antwort mit Ollama (async)...")
+
+    prompt, sources_text = await _in_executor(
+        chatbot._prepare_ollama_request, question, context["docs"], context["metas"], legal_area, context["ids"]
+    )
+    if prompt is None:
+        return None
+
+    tried = []
+    for attempt in range(2):
+        backend = chatbot.ollama_pool.acquire(exclude=tried)
+        if backend is None:
+            logger.warning("⚠️ Kein weiteres Ollama-Backend verfügbar")
+            return None
+        tried.append(backend)
+
+        started = time.monotonic()
+        try:
+            raw_answer = await ollama_client.generate(backend.base_url, prompt, chatbot.OLLAMA_OPTIONS)
+        except asyncio.CancelledError:
+            # Antwortbudget abgelaufen - kein Ollama-Fehler
+            chatbot.ollama_pool.finish(backend, None)
+            raise
+        except Exception as e:
+            chatbot.ollama_pool.finish(backend, False)
+            logger.error(f"❌ Ollama Fehler ({backend.base_url}): {e}")
+            continue
+
+        chatbot.ollama_pool.finish(backend, True, (time.monotonic() - started) * 1000)
+        return chatbot._finish_ollama_answer(raw_answer, sources_text)
+
+    logger.warning("⚠️ Ollama fehlgeschlagen, verwende Fallback")
+    return None
+
+
+async def _run_answer_pipeline(question, legal_area, deadline):
+    """Async-Gegenstück zu app._run_answer_pipeline - gleiche Schritte, gleiche Caches"""
+    lookup = await _in_executor(chatbot._lookup_answer, question, legal_area)
+    if lookup.payload is not None:
+        return lookup.payload, None
+
+    payload, context = await _in_executor(
+        chatbot._retrieve_relevant_context, question, lookup.legal_area, lookup.question_embedding
+    )
+    if payload is not None:
+        await _in_executor(chatbot._remember_answer, lookup, payload, None)
+        return payload, chatbot._retrieval_data(None)
+
+    answer_text = None
+    fallback_text = None
+    if chatbot.ollama_pool.is_available():
+        # Extraktive Antwort parallel zur Generierung - fertig, falls Ollama das Budget überschreitet
+        fallback = asyncio.ensure_future(_in_executor(
+            chatbot._generate_perfect_answer, question, context["docs"], context["metas"], context["legal_area"], context["ids"]
+        ))
+        async with chatbot.generation_scheduler.slot_async(timeout=deadline.remaining()) as granted:
+            if granted:
+                logger.info("🦙 Verwende Ollama")
+                try:
+                    # Abbruch schliesst die Verbindung, Ollama beendet die Generierung
+                    answer_text = await asyncio.wait_for(_generate_ollama_answer(question, context), deadline.remaining())
+                except asyncio.TimeoutError:
+                    chatbot.generation_scheduler.record_deadline_exceeded()
+                    logger.warning("⏱️ Antwortbudget erschöpft, verwende extraktive Antwort")
+            else:
+                logger.warning("⏳ Kein Generierungs-Slot frei, verwende Fallback")
+        fallback_text = await fallback
+
+    payload = await _in_executor(chatbot._finalize_answer, lookup, context, answer_text, fallback_text)
+    return payload, chatbot._retrieval_data(context)
+
+
+async def answer_question(question, deadline):
+    """Identische gleichzeitige Fragen teilen sich eine Ausführung (wie app._answer_question).
+    Liefert (Payload, Suchdaten); Suchdaten None bei einem Cache-Treffer"""
+    legal_area = await _in_executor(chatbot._detect_legal_area_precise, question)
+    flight_key = (normalize_question(question), legal_area, deadline.budget)
+    return await answer_flights.do(flight_key, lambda: _run_answer_pipeline(question, legal_area, deadline))
+
+
+async def answer(request):
+    try:
+        data = await request.json()
+    except ValueError:
+        data = None
+    question = data.get("question", "") if isinstance(data, dict) else ""
+
+    logger.info(f"📝 Neue Frage: {question}")
+
+    if not question:
+        return _json_response({"error": "Keine Frage erhalten."}, 400)
+
+    try:
+        with chatbot.generation_scheduler.admission():
+            payload, retrieval_data = await answer_question(question, chatbot._request_deadline(data))
+        # Protokoll für das Warm-up im Hintergrund schreiben, die Antwort wartet nicht darauf
+        pipeline_executor.submit(chatbot._log_answered_question, question, payload, retrieval_data)
+        return _json_response(payload)
+
+    except GenerationOverloaded as e:
+        with chatbot.app.app_context():
+            flask_response = chatbot._overloaded_response(e)
+        return Response(flask_response.get_data(), status_code=flask_response.status_code,
+                        headers={"Retry-After": flask_response.headers["Retry-After"]},
+                        media_type=flask_response.mimetype)
+
+    except Exception as e:
+        logger.error(f"❌ Unerwarteter Fehler: {e}")
+        return _json_response({
+            "answer": "Es ist ein unerwarteter Fehler aufgetreten. Bitte versuchen Sie es erneut.",
+            "sources": [],
+            "confidence": "error"
+        })
+
+
+async def async_metrics(request):
+    """Metriken der asyncio-Pipeline (die übrigen liefert /metrics der Flask-App)"""
+    return _json_response({
+        "request_coalescing": answer_flights.stats(),
+        "ollama_client": ollama_client.stats(),
+        "generation": chatbot.generation_scheduler.stats(),
+        "executor_workers": ASYNC_EXECUTOR_WORKERS,
+    })
+
+
+async def _shutdown():
+    await ollama_client.aclose()
+    pipeline_executor.shutdown(wait=False)
+
+
+# CORS wie flask_cors.CORS(app) für die Routen, die nicht über Flask laufen
+def _with_cors(endpoint):
+    return CORSMiddleware(request_response(endpoint), allow_origins=["*"], allow_methods=["*"], allow_headers=["*"])
+
+
+application = Starlette(
+    routes=[
+        Route("/answer", _with_cors(answer), methods=["POST", "OPTIONS"]),
+        Route("/metrics/async", _with_cors(async_metrics), methods=["GET", "OPTIONS"]),
+        Mount("/", WSGIMiddleware(chatbot.app, workers=WSGI_THREADS)),
+    ],
+    on_shutdown=[_shutdown],
+)
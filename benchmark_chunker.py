@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Regression check + micro-benchmark: streaming iter_smart_chunks vs. the
+previous split_text_smartly of process_pdfs.create_smart_chunks.
+
+Uses data/text/*.txt when present, otherwise extracts the bundled PDFs in
+data/. Fails if any chunk boundary differs, then reports the time per
+document for both implementations.
+"""
+
+import argparse
+import os
+import re
+import sys
+import time
+from pathlib import Path
+
+from process_pdfs import clean_text_for_chunking, iter_smart_chunks
+
+
+def legacy_split_text_smartly(text, target_size=350, overlap=60):
+    """Previous chunker (reference) - re-splits the accumulated chunk for every part"""
+
+    chunks = []
+    text = clean_text_for_chunking(text)
+
+    # Try to split by articles first
+    article_pattern = r'(Art\.\s*\d+[a-z]*[.\s]*)'
+    parts = re.split(article_pattern, text, flags=re.IGNORECASE)
+
+    current_chunk = ""
+
+    for part in parts:
+        part = part.strip()
+        if not part:
+            continue
+
+        # Check if adding this part would exceed target size
+        potential_chunk = current_chunk + " " + part
+        word_count = len(potential_chunk.split())
+
+        if word_count <= target_size:
+            current_chunk = potential_chunk
+        else:
+            # Save current chunk if it's substantial
+            if len(current_chunk.split()) > 50:
+                chunks.append(current_chunk.strip())
+
+            # Start new chunk
+            if len(part.split()) > target_size:
+                # Split large parts into smaller chunks
+                words = part.split()
+                for i in range(0, len(words), target_size - overlap):
+                    chunk_words = words[i:i + target_size]
+                    chunk_text = " ".join(chunk_words)
+                    if len(chunk_text) > 100:  # Minimum length
+                        chunks.append(chunk_text)
+                current_chunk = ""
+            else:
+                current_chunk = part
+
+    # Add the last chunk
+    if current_chunk.strip() and len(current_chunk.split()) > 20:
+        chunks.append(current_chunk.strip())
+
+    # Filter out chunks that are too short or mostly references
+    good_chunks = []
+    for chunk in chunks:
+        if (len(chunk) > 80 and
+            len(chunk.split()) > 15 and
+            not chunk.strip().startswith(('---', 'Seite', 'BBl', 'AS'))):
+            good_chunks.append(chunk)
+
+    return good_chunks
+
+
+def load_documents(text_dir, pdf_dir):
+    """{name: text} aus data/text, sonst direkt aus den PDFs"""
+    documents = {path.stem: path.read_text(encoding="utf-8") for path in sorted(text_dir.glob("*.txt"))}
+    if documents:
+        return documents
+
+    import fitz  # PyMuPDF
+
+    for pdf_path in sorted(pdf_dir.glob("*.pdf")):
+        parts = []
+        with fitz.open(pdf_path) as doc:
+            for page_num, page in enumerate(doc, start=1):
+                parts.append(f"\n--- Seite {page_num} ---\n")
+                parts.append(page.get_text())
+        documents[pdf_path.stem] = "".join(parts)
+    return documents
+
+
+def best_of(fn, text, rounds):
+    timings = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        fn(text)
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--target-size", type=int, default=350)
+    parser.add_argument("--overlap", type=int, default=60)
+    parser.add_argument("--text-dir", type=Path, default=Path("data/text"))
+    parser.add_argument("--pdf-dir", type=Path, default=Path("data"))
+    args = parser.parse_args()
+
+    documents = load_documents(args.text_dir, args.pdf_dir)
+    if not documents:
+        print("❌ No documents found")
+        return 1
+
+    legacy = lambda text: legacy_split_text_smartly(text, args.target_size, args.overlap)
+    streaming = lambda text: list(iter_smart_chunks(text, args.target_size, args.overlap))
+
+    failed = False
+    total_legacy = total_streaming = 0.0
+    for name, text in documents.items():
+        expected, actual = legacy(text), streaming(text)
+        if expected != actual:
+            first = next((i for i, (a, b) in enumerate(zip(expected, actual)) if a != b), min(len(expected), len(actual)))
+            print(f"❌ {name}: {len(expected)} vs {len(actual)} chunks, first difference at chunk {first}")
+            failed = True
+            continue
+
+        legacy_seconds = best_of(legacy, text, args.rounds)
+        streaming_seconds = best_of(streaming, text, args.rounds)
+        total_legacy += legacy_seconds
+        total_streaming += streaming_seconds
+        print(f"✅ {name:<28} {len(actual):>4} chunks  legacy {legacy_seconds * 1000:8.1f} ms  "
+              f"streaming {streaming_seconds * 1000:8.1f} ms  ({legacy_seconds / streaming_seconds:.2f}x)")
+
+    if failed:
+        return 1
+
+    print(f"🚀 total: legacy {total_legacy * 1000:.1f} ms, streaming {total_streaming * 1000:.1f} ms "
+          f"({total_legacy / total_streaming:.2f}x)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
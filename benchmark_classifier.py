@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark: compiled LegalAreaClassifier vs. the previous
+per-keyword re.search implementation of _detect_legal_area_precise.
+
+Checks that both return identical area scores for every question, and
+that the literal prefilter matches plain re.search for config keywords with
+regex operators (optional characters, quantifiers, alternation). Then it
+reports the time per question. Uses the questions from
+logs/answer_quality.jsonl when available, plus a built-in corpus.
+"""
+
+import argparse
+import json
+import re
+import sys
+import time
+from pathlib import Path
+
+from legal_area_classifier import LegalAreaClassifier
+
+BUILTIN_QUESTIONS = [
+    "Welche Ruhezeiten gelten bei Nachtarbeit?",
+    "Was regelt das Arbeitsgesetz bei Nachtarbeit?",
+    "Wie lange ist die Kündigungsfrist beim Arbeitsvertrag?",
+    "Kann mir der Arbeitgeber während der Probezeit kündigen?",
+    "Wie viele Ferien stehen mir pro Jahr zu?",
+    "Muss der Arbeitgeber Überstunden mit Lohn ausgleichen?",
+    "Wie kann ich meine Krankenkasse kündigen?",
+    "Wann ist ein Kassenwechsel der Grundversicherung möglich?",
+    "Wie hoch darf die Franchise bei der Krankenversicherung sein?",
+    "Ab wann ist man in der Schweiz strafmündig?",
+    "Welche Strafe droht bei Diebstahl?",
+    "Ist Betrug ein Verbrechen oder ein Vergehen?",
+    "Wie entsteht ein Vertrag nach Schweizer Recht?",
+    "Wann besteht ein Anspruch auf Schadenersatz aus Haftung?",
+    "Ist ein Kaufvertrag nach Angebot und Annahme verbindlich?",
+    "Welche Voraussetzungen gelten für eine Ehescheidung?",
+    "Wer erhält das Sorgerecht nach der Scheidung?",
+    "Wie wird der Unterhalt für die Familie berechnet?",
+    "Wann wird der Führerschein entzogen?",
+    "Was passiert bei einem Verkehrsunfall mit zu hoher Geschwindigkeit?",
+    "Darf mein Arbeitgeber meine E-Mail lesen?",
+    "Wie lange dürfen Daten gespeichert werden?",
+    "Ist Überwachung am Arbeitsplatz mit dem Datenschutz vereinbar?",
+    "Was steht im ZGB zur Handlungsfähigkeit?",
+    "Wie ist das Wetter morgen?",
+]
+
+# Config keywords whose literal prefix is not simply the text before the first operator
+REGEX_KEYWORD_CASES = [
+    ({"a": {"primary": ["kündigungs?frist"]}}, "wie lange ist die kündigungfrist"),
+    ({"a": {"primary": ["kündigungs?frist"]}}, "wie lange ist die kündigungsfrist"),
+    ({"a": {"primary": ["überstunden*zuschlag"]}}, "gibt es einen überstundezuschlag"),
+    ({"a": {"primary": ["fahrausweise{0,1}"]}}, "wann wird der fahrausweis entzogen"),
+    ({"a": {"primary": ["urlaubs+"]}}, "wie viele urlaubstage"),
+    ({"a": {"primary": ["scheidung|trennung"]}}, "was gilt bei einer trennung"),
+    ({"a": {"primary": ["(ehe)?vertrag"]}, "b": {"secondary": ["e-?mail"]}}, "darf er meine email zum vertrag lesen"),
+]
+
+
+def reference_scores(areas, question, weights=None):
+    """One re.search per keyword, without prefilter (reference for REGEX_KEYWORD_CASES)"""
+    weights = weights or {"primary": 10, "secondary": 3}
+    scores = {}
+    for area, keywords in areas.items():
+        score = sum(weights[tier] for tier in ("primary", "secondary") for kw in keywords.get(tier, [])
+                    if re.search(rf'\b{kw}\b', question.lower()))
+        if score > 0:
+            scores[area] = score
+    return scores
+
+
+def legacy_scores(question):
+    """Scoring loop of the previous _detect_legal_area_precise (reference)"""
+    question_lower = question.lower()
+
+    area_keywords = {
+        'arbeitsrecht': {
+            'primary': ['ruhezeit', 'arbeitszeit', 'nachtarbeit', 'überstunden', 'arbeitsvertrag', 'kündigung.*arbeit', 'kündigungsfrist.*arbeit', 'probezeit', 'ferien', 'urlaub', 'lohn', 'gehalt'],
+            'secondary': ['arbeitgeber', 'arbeitnehmer', 'anstellung']
+        },
+        'krankenversicherung': {
+            'primary': ['krankenkasse', 'krankenversicherung', 'kv.*kündigung', 'kassenwechsel', 'prämie', 'franchise', 'grundversicherung'],
+            'secondary': ['kasse.*wechsel', 'versicherung.*kündigung']
+        },
+        'strafrecht': {
+            'primary': ['strafgesetz', 'strafrecht', 'strafe', 'strafbar', 'mord', 'diebstahl', 'raub', 'betrug', 'delikt', 'verbrechen', 'gefängnis', 'busse', 'strafmündig'],
+            'secondary': ['bestrafung', 'tat', 'täter']
+        },
+        'zivilrecht': {
+            'primary': ['vertrag.*entsteht', 'vertragsrecht', 'obligation', 'haftung', 'schadenersatz', 'kaufvertrag', 'angebot.*annahme'],
+            'secondary': ['berechtigt', 'verpflichtet', 'anspruch']
+        },
+        'familienrecht': {
+            'primary': ['ehescheidung', 'scheidung', 'ehe.*voraussetzung', 'sorgerecht', 'unterhalt', 'vormundschaft'],
+            'secondary': ['familie', 'kind.*recht', 'heirat']
+        },
+        'verkehrsrecht': {
+            'primary': ['führerschein', 'fahrausweis', 'verkehrsrecht', 'geschwindigkeit', 'verkehr.*unfall', 'führerschein.*entzug'],
+            'secondary': ['fahren', 'auto', 'strasse']
+        },
+        'datenschutz': {
+            'primary': ['datenschutz', 'daten.*gespeicher', 'e-mail.*lesen', 'email.*lesen', 'überwachung', 'personendaten'],
+            'secondary': ['privatsphäre', 'daten.*schutz']
+        }
+    }
+
+    scores = {}
+    for area, keywords in area_keywords.items():
+        score = 0
+        for kw in keywords['primary']:
+            if re.search(rf'\b{kw}\b', question_lower):
+                score += 10
+        for kw in keywords['secondary']:
+            if re.search(rf'\b{kw}\b', question_lower):
+                score += 3
+        if score > 0:
+            scores[area] = score
+    return scores
+
+
+def load_questions(log_file):
+    questions = list(BUILTIN_QUESTIONS)
+    if log_file.exists():
+        with open(log_file, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    question = json.loads(line).get("question")
+                except ValueError:
+                    continue
+                if question:
+                    questions.append(question)
+    return questions
+
+
+def time_per_call(fn, questions, rounds):
+    started = time.perf_counter()
+    for _ in range(rounds):
+        for question in questions:
+            fn(question)
+    return (time.perf_counter() - started) / (rounds * len(questions))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rounds", type=int, default=200)
+    parser.add_argument("--log-file", type=Path, default=Path("logs/answer_quality.jsonl"))
+    args = parser.parse_args()
+
+    classifier = LegalAreaClassifier.from_config()
+    questions = load_questions(args.log_file)
+
+    mismatches = [q for q in questions if legacy_scores(q) != classifier.scores(q)]
+    if mismatches:
+        print(f"❌ {len(mismatches)} questions score differently:")
+        for question in mismatches[:10]:
+            print(f"   {question!r}: {legacy_scores(question)} vs {classifier.scores(question)}")
+        return 1
+    print(f"✅ Identical area scores for {len(questions)} questions")
+
+    regex_mismatches = [(areas, q) for areas, q in REGEX_KEYWORD_CASES
+                        if reference_scores(areas, q) != LegalAreaClassifier(areas).scores(q)]
+    if regex_mismatches:
+        print(f"❌ {len(regex_mismatches)} regex keyword cases score differently:")
+        for areas, question in regex_mismatches:
+            print(f"   {areas} / {question!r}: {reference_scores(areas, question)} vs "
+                  f"{LegalAreaClassifier(areas).scores(question)}")
+        return 1
+    print(f"✅ Identical scores for {len(REGEX_KEYWORD_CASES)} regex keyword cases")
+
+    # Warm the re module cache for the legacy path, as a long-running server would
+    time_per_call(legacy_scores, questions, 1)
+
+    legacy = time_per_call(legacy_scores, questions, args.rounds)
+    compiled = time_per_call(classifier.scores, questions, args.rounds)
+    print(f"⏱️ legacy:   {legacy * 1e6:8.1f} µs/question")
+    print(f"⏱️ compiled: {compiled * 1e6:8.1f} µs/question")
+    print(f"🚀 speedup:  {legacy / compiled:8.2f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""
+Parity check + latency benchmark: PyTorch vs. ONNX (fp32 / int8) embeddings.
+
+Encodes the corpus chunks (embedding artifact, otherwise chunk store) and
+a set of questions with every backend. Against the PyTorch vectors it
+reports the cosine similarity per chunk and per question, plus the top-k
+overlap of the retrieved chunks:
+  - own index:   backend query against a backend-built index
+  - torch index: backend query against the existing PyTorch-built index
+    (what the app sees when only the query side is switched)
+Then it reports the single-query latency (p50/p95) and bulk throughput.
+The parity result of every ONNX variant is recorded in parity.json next to
+the ONNX model; ingestion with EMBEDDING_BACKEND=onnx requires a passed one.
+
+    python embedding_backend.py export
+    python benchmark_embedding.py --top-k 5
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+from chunk_store import ChunkStore
+from embedding_backend import EMBEDDING_ONNX_DIR, ONNX_PARITY_FILE, load_embedding_model, read_onnx_parity
+from embedding_store import EmbeddingArtifact
+
+QUESTIONS = [
+    "Was regelt das Arbeitsgesetz bei Nachtarbeit?",
+    "Welche Ruhezeiten gelten laut Gesetz?",
+    "Was steht im ZGB zur Handlungsfähigkeit?",
+    "Wie lange darf die wöchentliche Höchstarbeitszeit sein?",
+    "Darf mein Arbeitgeber Sonntagsarbeit anordnen?",
+    "Wann ist eine Person urteilsfähig?",
+    "Welche Voraussetzungen gelten für eine Ehescheidung?",
+    "Was passiert bei Fahren in angetrunkenem Zustand?",
+    "Welche Strafe droht bei Diebstahl?",
+    "Wann verjährt eine Straftat?",
+    "Welche Leistungen übernimmt die obligatorische Krankenpflegeversicherung?",
+    "Wie hoch ist die Franchise in der Krankenversicherung?",
+    "Welche Rechte habe ich bezüglich meiner Personendaten?",
+    "Wann dürfen Personendaten ins Ausland bekanntgegeben werden?",
+    "Wer haftet bei einem Verkehrsunfall mit einem Motorfahrzeug?",
+    "Wann wird der Führerausweis entzogen?",
+    "Wie wird ein Testament gültig errichtet?",
+    "Was ist der Pflichtteil der Erben?",
+    "Welche Pflichten hat der Arbeitgeber beim Gesundheitsschutz?",
+    "Dürfen Jugendliche nachts arbeiten?",
+]
+
+BACKENDS = {
+    "torch": {"backend": "torch"},
+    "onnx-fp32": {"backend": "onnx", "quantized": False},
+    "onnx-int8": {"backend": "onnx", "quantized": True},
+}
+
+
+def load_corpus(limit):
+    artifact = EmbeddingArtifact()
+    if artifact.exists():
+        texts = [record["text"] for record in artifact.iter_records(0, limit)]
+    else:
+        texts = [chunk["text"] for chunk in ChunkStore().iter_chunks()][:limit]
+    return texts
+
+
+def top_k(index, queries, k):
+    scores = queries @ index.T
+    return np.argsort(-scores, axis=1)[:, :k]
+
+
+def overlap(a, b):
+    return float(np.mean([len(set(x) & set(y)) / len(x) for x, y in zip(a, b)]))
+
+
+def measure(model, corpus, questions, batch_size, rounds):
+    """Vectors plus single-query latencies (ms) and bulk throughput (chunks/s)"""
+    model.encode(questions[:2], batch_size=2)  # warm-up
+
+    latencies = []
+    for _ in range(rounds):
+        for question in questions:
+            started = time.perf_counter()
+            model.encode([question], batch_size=1)
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    corpus_vectors = np.asarray(model.encode(corpus, batch_size=batch_size), dtype=np.float32)
+    throughput = len(corpus) / (time.perf_counter() - started)
+
+    query_vectors = np.asarray(model.encode(questions, batch_size=len(questions)), dtype=np.float32)
+    return corpus_vectors, query_vectors, np.asarray(latencies), throughput
+
+
+def record_parity(parity, model_dir=EMBEDDING_ONNX_DIR):
+    """Merge the parity results into parity.json (read by the ingestion gate)"""
+    recorded = {**read_onnx_parity(model_dir), **parity}
+    path = Path(model_dir) / ONNX_PARITY_FILE
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+        json.dump(recorded, f, indent=2)
+    os.replace(f"{path}.tmp", path)
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backends", default="torch,onnx-fp32,onnx-int8")
+    parser.add_argument("--questions", type=Path, help="file with one question per line")
+    parser.add_argument("--limit", type=int, help="only the first N chunks")
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--threads", type=int, default=0)
+    parser.add_argument("--min-cosine", type=float, default=0.99)
+    parser.add_argument("--min-overlap", type=float, default=0.9)
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.limit)
+    if not corpus:
+        print("❌ No chunks found - run the ingestion first")
+        return 1
+    questions = QUESTIONS
+    if args.questions:
+        questions = [line.strip() for line in args.questions.read_text(encoding="utf-8").splitlines() if line.strip()]
+
+    names = [name.strip() for name in args.backends.split(",")]
+    if names[0] != "torch":
+        names.insert(0, "torch")
+    print(f"📚 {len(corpus)} chunks, {len(questions)} questions, top-{args.top_k}")
+
+    results = {}
+    for name in names:
+        try:
+            model = load_embedding_model(threads=args.threads, **BACKENDS[name])
+        except Exception as e:
+            print(f"⚠️ {name}: not available ({e})")
+            continue
+        results[name] = measure(model, corpus, questions, args.batch_size, args.rounds)
+        del model
+
+    if "torch" not in results:
+        print("❌ PyTorch reference not available")
+        return 1
+
+    ref_corpus, ref_queries, ref_latencies, ref_throughput = results["torch"]
+    ref_top = top_k(ref_corpus, ref_queries, args.top_k)
+
+    failed = False
+    parity = {}
+    print(f"\n{'backend':<10} {'cos chunks (min/mean)':>22} {'cos queries (min/mean)':>23} "
+          f"{'top-k own':>10} {'top-k torch idx':>16} {'p50 ms':>8} {'p95 ms':>8} {'chunks/s':>9}")
+    for name, (corpus_vectors, query_vectors, latencies, throughput) in results.items():
+        chunk_cos = np.sum(corpus_vectors * ref_corpus, axis=1)
+        query_cos = np.sum(query_vectors * ref_queries, axis=1)
+        own = overlap(top_k(corpus_vectors, query_vectors, args.top_k), ref_top)
+        mixed = overlap(top_k(ref_corpus, query_vectors, args.top_k), ref_top)
+
+        print(f"{name:<10} {chunk_cos.min():>10.4f} / {chunk_cos.mean():.4f} {query_cos.min():>11.4f} / "
+              f"{query_cos.mean():.4f} {own:>10.2f} {mixed:>16.2f} {np.percentile(latencies, 50):>8.2f} "
+              f"{np.percentile(latencies, 95):>8.2f} {throughput:>9.1f}")
+
+        if name != "torch":
+            passed = bool(chunk_cos.min() >= args.min_cosine and min(own, mixed) >= args.min_overlap)
+            failed = failed or not passed
+            parity[name] = {
+                "passed": passed,
+                "chunks": len(corpus),
+                "questions": len(questions),
+                "top_k": args.top_k,
+                "min_chunk_cosine": round(float(chunk_cos.min()), 5),
+                "min_query_cosine": round(float(query_cos.min()), 5),
+                "top_k_overlap_own_index": round(own, 4),
+                "top_k_overlap_torch_index": round(mixed, 4),
+                "thresholds": {"min_cosine": args.min_cosine, "min_overlap": args.min_overlap},
+                "measured_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            }
+
+    for name, (_, _, latencies, throughput) in results.items():
+        if name != "torch":
+            print(f"🚀 {name}: {np.percentile(ref_latencies, 50) / np.percentile(latencies, 50):.2f}x query latency, "
+                  f"{throughput / ref_throughput:.2f}x bulk throughput vs. torch")
+
+    if parity:
+        print(f"📝 Parity recorded in {record_parity(parity)}")
+
+    if failed:
+        print(f"❌ Parity below cos {args.min_cosine} / top-k overlap {args.min_overlap}")
+        return 1
+    print("✅ Parity OK")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
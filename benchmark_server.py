@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Load test: throughput and latency of /answer at increasing concurrency,
+plus the memory of the server processes (RSS and PSS, i.e. shared pages
+counted once per sharing process).
+
+Compare the Flask development server with the gunicorn entry point in the
+same container (4 GB limit in docker-compose.yml):
+
+    SERVER_MODE=flask    docker compose up -d chatbot   # python app.py
+    SERVER_MODE=gunicorn docker compose up -d chatbot   # gunicorn -c gunicorn.conf.py app:app
+    docker compose exec chatbot python benchmark_server.py --concurrency 1,4,8,16
+
+To measure the CPU-bound part (embedding, retrieval, text cleanup, JSON)
+rather than LLM generation, run the server with caches disabled
+(ANSWER_CACHE_SIZE=0 EMBED_CACHE_SIZE=0 ANSWER_STORE_PATH=) and, for the
+extractive path only, without a reachable Ollama. Requests shed by the
+generation scheduler (429 Retry-After) are counted separately from errors;
+downgrades to the extractive answer show up in /metrics under "generation".
+"""
+
+import argparse
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import requests
+
+from benchmark_embedding import QUESTIONS
+
+SERVER_PATTERNS = ("gunicorn", "app.py")
+
+
+def server_memory(patterns=SERVER_PATTERNS):
+    """(processes, RSS MB, PSS MB) of all processes whose command line matches"""
+    count = rss = pss = 0
+    for proc in Path("/proc").iterdir():
+        if not proc.name.isdigit():
+            continue
+        try:
+            cmdline = (proc / "cmdline").read_bytes().replace(b"\0", b" ").decode(errors="replace")
+            if not any(pattern in cmdline for pattern in patterns) or "benchmark_server" in cmdline:
+                continue
+            for line in (proc / "smaps_rollup").read_text().splitlines():
+                if line.startswith("Rss:"):
+                    rss += int(line.split()[1])
+                elif line.startswith("Pss:"):
+                    pss += int(line.split()[1])
+            count += 1
+        except OSError:
+            continue
+    return count, rss / 1024, pss / 1024
+
+
+def run_level(url, questions, concurrency, total, timeout):
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_maxsize=concurrency)
+    session.mount("http://", adapter)
+
+    def one(i):
+        question = questions[i % len(questions)]
+        started = time.perf_counter()
+        try:
+            response = session.post(url, json={"question": question}, timeout=timeout)
+            status = response.status_code
+        except requests.RequestException:
+            status = None
+        return status, time.perf_counter() - started
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(one, range(total)))
+    elapsed = time.perf_counter() - started
+
+    latencies = sorted(seconds * 1000 for status, seconds in results if status == 200)
+    rejected = sum(1 for status, _ in results if status == 429)
+    errors = len(results) - len(latencies) - rejected
+    percentile = lambda p: latencies[min(len(latencies) - 1, int(p * len(latencies)))] if latencies else 0.0
+    return {
+        "rps": len(latencies) / elapsed,
+        "p50": statistics.median(latencies) if latencies else 0.0,
+        "p95": percentile(0.95),
+        "p99": percentile(0.99),
+        "rejected": rejected,
+        "errors": errors,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:5000/answer")
+    parser.add_argument("--concurrency", default="1,4,8,16")
+    parser.add_argument("--requests", type=int, default=100, help="requests per concurrency level")
+    parser.add_argument("--timeout", type=float, default=120)
+    parser.add_argument("--questions", type=Path, help="file with one question per line")
+    args = parser.parse_args()
+
+    questions = QUESTIONS
+    if args.questions:
+        questions = [line.strip() for line in args.questions.read_text(encoding="utf-8").splitlines() if line.strip()]
+
+    # Warm-up: model, index and connections of every worker
+    run_level(args.url, questions, 4, 8, args.timeout)
+
+    processes, rss, pss = server_memory()
+    print(f"🧠 server: {processes} processes, RSS {rss:.0f} MB, PSS {pss:.0f} MB")
+    print(f"{'concurrency':>11} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'429':>6} {'errors':>7}")
+
+    for concurrency in (int(level) for level in args.concurrency.split(",")):
+        result = run_level(args.url, questions, concurrency, args.requests, args.timeout)
+        print(f"{concurrency:>11} {result['rps']:>8.2f} {result['p50']:>9.1f} {result['p95']:>9.1f} "
+              f"{result['p99']:>9.1f} {result['rejected']:>6} {result['errors']:>7}")
+
+    processes, rss, pss = server_memory()
+    print(f"🧠 server after load: {processes} processes, RSS {rss:.0f} MB, PSS {pss:.0f} MB")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+"""
+Chunk-Store: alle Chunks mit strukturierten Metadaten in einer SQLite-Datei
+
+Ersetzt die einzelnen data/chunks/{quelle}_chunk_{nnn}.txt Dateien. Pro
+Chunk werden Quelle, laufende Nummer, Text, Artikel, Seitenbereich und
+Wort-Offset im extrahierten Text gespeichert. Chunking ersetzt jeweils
+die Chunks eines Dokuments, Embedding und Import lesen per Stream.
+
+    python chunk_store.py import-dir [data/chunks]   # bestehende Chunk-Dateien übernehmen
+"""
+
+import argparse
+import bisect
+import os
+import re
+import sqlite3
+import sys
+import threading
+from collections import defaultdict
+from pathlib import Path
+
+CHUNK_STORE_FILE = Path(os.getenv("CHUNK_STORE_FILE", "data/chunks.sqlite3"))
+
+# Zusätzliche Metadaten (nur gesetzte Werte landen in ChromaDB - None ist dort nicht erlaubt)
+CHUNK_METADATA_FIELDS = ("article", "page_start", "page_end", "offset")
+
+_PAGE_MARKER = re.compile(r'\n--- Seite (\d+) ---\n')
+_ARTICLE = re.compile(r'Art\.\s*(\d+[a-z]*)', re.IGNORECASE)
+_EDGE_SKIPS = (0, 1, 2, 3)
+
+
+def chunk_filename(source, chunk_id):
+    """Früherer Dateiname eines Chunks (bleibt als Metadatum erhalten)"""
+    return f"{source}_chunk_{chunk_id}.txt"
+
+
+def chunk_metadata(record):
+    """Metadaten eines Chunks für ChromaDB bzw. den NumPy-Index"""
+    metadata = {
+        "filename": record["filename"],
+        "chunk_id": record["chunk_id"],
+        "quelle": record["quelle"]
+    }
+    for field in CHUNK_METADATA_FIELDS:
+        if record.get(field) is not None:
+            metadata[field] = record[field]
+    return metadata
+
+
+class _PageLocator:
+    """Findet Chunks (Wortfolgen) im extrahierten Text und liefert Wortposition und Seite"""
+
+    def __init__(self, raw_text):
+        pieces = _PAGE_MARKER.split(raw_text)
+        pages = [(None, pieces[0])] + [(int(pieces[i]), pieces[i + 1]) for i in range(1, len(pieces), 2)]
+
+        words = []
+        self.word_pages = []
+        for page, text in pages:
+            page_words = text.split()
+            words.extend(page_words)
+            self.word_pages.extend([page] * len(page_words))
+
+        self.text = " ".join(words)
+        self.word_starts = []
+        position = 0
+        for word in words:
+            self.word_starts.append(position)
+            position += len(word) + 1
+
+    def find(self, words, start_word=0):
+        """Index des ersten Wortes der Folge ab start_word, sonst None"""
+        if not words or start_word >= len(self.word_starts):
+            return None
+        needle = " ".join(words)
+        position = self.text.find(needle, self.word_starts[start_word])
+        while position != -1:
+            index = bisect.bisect_left(self.word_starts, position)
+            if index < len(self.word_starts) and self.word_starts[index] == position:
+                return index
+            position = self.text.find(needle, position + 1)
+        return None
+
+    def locate(self, words, start_word=0):
+        """(erstes Wort, letztes Wort) eines Chunks, sonst (None, None).
+
+        Bereinigung kann Lücken erzeugen, daher kürzere Folgen als Fallback; an
+        Artikel-Überschriften können die ersten bzw. letzten Wörter Wortreste sein
+        ("Art. 3a15" → "Art. 3a 15 ..."), dann wird einige Wörter weiter innen gesucht.
+        """
+        first = None
+        for skip in _EDGE_SKIPS:
+            for size in (8, 4):
+                found = self.find(words[skip:skip + size], start_word)
+                if found is not None:
+                    first = max(found - skip, 0)
+                    break
+            if first is not None:
+                break
+        if first is None:
+            return None, None
+
+        for skip in _EDGE_SKIPS:
+            for size in (8, 4):
+                tail = words[max(len(words) - size - skip, 0):len(words) - skip]
+                last = self.find(tail, first)
+                if last is not None:
+                    return first, min(last + len(tail) - 1 + skip, len(self.word_pages) - 1)
+        return first, first
+
+
+def annotate_chunks(raw_text, chunks):
+    """Artikel, Seitenbereich und Wort-Offset für die Chunks eines Dokuments (in Reihenfolge)"""
+    locator = _PageLocator(raw_text)
+    annotated = []
+    cursor = 0
+    carried_article = None
+
+    for text in chunks:
+        first, last = locator.locate(text.split(), cursor)
+        if first is not None:
+            cursor = first
+
+        # Artikel, in dem der Chunk beginnt: eigene Überschrift oder Fortsetzung des vorherigen
+        heading = _ARTICLE.match(text)
+        article = heading.group(1) if heading else carried_article
+        matches = _ARTICLE.findall(text)
+        carried_article = matches[-1] if matches else article
+
+        annotated.append({
+            "text": text,
+            "article": article,
+            "page_start": locator.word_pages[first] if first is not None else None,
+            "page_end": locator.word_pages[last] if last is not None else None,
+            "offset": first,
+        })
+    return annotated
+
+
+class ChunkStore:
+    """SQLite-Tabelle chunks(source, seq, text, article, page_start, page_end, word_offset)"""
+
+    def __init__(self, path=CHUNK_STORE_FILE):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._conn = None
+        self._pid = None
+
+    def _connection(self):
+        """Verbindung pro Prozess öffnen (SQLite-Handles dürfen nicht über fork geteilt werden)"""
+        if self._conn is not None and self._pid == os.getpid():
+            return self._conn
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS chunks (
+                source TEXT NOT NULL,
+                seq INTEGER NOT NULL,
+                text TEXT NOT NULL,
+                article TEXT,
+                page_start INTEGER,
+                page_end INTEGER,
+                word_offset INTEGER,
+                PRIMARY KEY (source, seq)
+            )
+        """)
+        conn.commit()
+
+        self._conn = conn
+        self._pid = os.getpid()
+        return conn
+
+    def replace_document(self, source, chunks):
+        """Alle Chunks einer Quelle in einer Transaktion ersetzen (chunks: Dicts aus annotate_chunks)"""
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                conn.execute("DELETE FROM chunks WHERE source=?", (source,))
+                conn.executemany(
+                    "INSERT INTO chunks (source, seq, text, article, page_start, page_end, word_offset) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    [(source, seq, chunk["text"], chunk.get("article"), chunk.get("page_start"),
+                      chunk.get("page_end"), chunk.get("offset"))
+                     for seq, chunk in enumerate(chunks, start=1)]
+                )
+            return len(chunks)
+
+    def delete_document(self, source):
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                return conn.execute("DELETE FROM chunks WHERE source=?", (source,)).rowcount
+
+    def sources(self):
+        with self._lock:
+            rows = self._connection().execute("SELECT DISTINCT source FROM chunks ORDER BY source").fetchall()
+            return [row[0] for row in rows]
+
+    def count(self, source=None):
+        with self._lock:
+            conn = self._connection()
+            if source is None:
+                return conn.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+            return conn.execute("SELECT COUNT(*) FROM chunks WHERE source=?", (source,)).fetchone()[0]
+
+    def iter_chunks(self, source=None):
+        """Chunks sortiert nach Quelle und Nummer streamen - Felder wie die früheren Chunk-Dateien plus Metadaten"""
+        with self._lock:
+            conn = self._connection()
+            query = "SELECT source, seq, text, article, page_start, page_end, word_offset FROM chunks"
+            params = ()
+            if source is not None:
+                query += " WHERE source=?"
+                params = (source,)
+            rows = conn.execute(query + " ORDER BY source, seq", params)
+
+        for source_name, seq, text, article, page_start, page_end, offset in rows:
+            chunk_id = f"{seq:03d}"
+            yield {
+                "quelle": source_name,
+                "chunk_id": chunk_id,
+                "filename": chunk_filename(source_name, chunk_id),
+                "text": text,
+                "article": article,
+                "page_start": page_start,
+                "page_end": page_end,
+                "offset": offset,
+            }
+
+
+def import_chunk_directory(chunks_dir, store, text_dir=Path("data/text")):
+    """Bestehende {quelle}_chunk_{nnn}.txt Dateien in den Store übernehmen"""
+    documents = defaultdict(list)
+    for chunk_path in sorted(Path(chunks_dir).glob("*_chunk_*.txt")):
+        source, number = chunk_path.stem.rsplit("_chunk_", 1)
+        documents[source].append((int(number), chunk_path.read_text(encoding="utf-8").strip()))
+
+    for source, numbered in documents.items():
+        texts = [text for _, text in sorted(numbered)]
+        text_path = Path(text_dir) / f"{source}.txt"
+        raw_text = text_path.read_text(encoding="utf-8") if text_path.exists() else ""
+        store.replace_document(source, annotate_chunks(raw_text, texts))
+        print(f"✅ {source}: {len(texts)} chunks")
+
+    return sum(len(numbered) for numbered in documents.values())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["import-dir"])
+    parser.add_argument("chunks_dir", nargs="?", type=Path, default=Path("data/chunks"))
+    args = parser.parse_args()
+
+    store = ChunkStore()
+    count = import_chunk_directory(args.chunks_dir, store)
+    print(f"💾 {count} chunks in {store.path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
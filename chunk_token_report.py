@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Token report: how much of each chunk the embedding model never sees.
+
+all-MiniLM-L6-v2 truncates its input at 256 word-pieces (incl. [CLS]/[SEP]).
+For every document this counts the word-pieces of each chunk with the
+model's tokenizer and reports the tokens cut off by truncation - for the
+word-based chunker (process_pdfs defaults, or the chunks currently in the
+chunk store with --from-store) and for the token-budget chunker.
+
+    python chunk_token_report.py
+    python chunk_token_report.py --from-store
+    python chunk_token_report.py --max-tokens 256 --token-overlap 32
+"""
+
+import argparse
+import sys
+from collections import defaultdict
+from pathlib import Path
+
+from benchmark_chunker import load_documents
+from chunk_store import ChunkStore
+from embedding_backend import EMBEDDING_MODEL
+from embedding_runner import TokenCounter, load_tokenizer
+from process_pdfs import CHUNK_MAX_TOKENS, CHUNK_TOKEN_OVERLAP, iter_smart_chunks, iter_token_chunks
+
+
+def truncation_stats(chunks, tokenizer, max_tokens):
+    """chunks, truncated chunks, word-pieces seen by the model, word-pieces discarded"""
+    lengths = [len(ids) for ids in tokenizer(chunks)["input_ids"]] if chunks else []
+    discarded = sum(max(length - max_tokens, 0) for length in lengths)
+    return {
+        "chunks": len(lengths),
+        "truncated": sum(1 for length in lengths if length > max_tokens),
+        "tokens": sum(lengths),
+        "discarded": discarded,
+        "max": max(lengths, default=0),
+    }
+
+
+def format_stats(stats):
+    share = stats["discarded"] / stats["tokens"] * 100 if stats["tokens"] else 0.0
+    return (f"{stats['chunks']:>5} chunks  {stats['truncated']:>5} truncated  "
+            f"{stats['tokens']:>8} tokens  {stats['discarded']:>7} discarded ({share:5.1f}%)  max {stats['max']}")
+
+
+def add_stats(total, stats):
+    for key, value in stats.items():
+        total[key] = max(total[key], value) if key == "max" else total[key] + value
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default=EMBEDDING_MODEL)
+    parser.add_argument("--max-tokens", type=int, default=CHUNK_MAX_TOKENS)
+    parser.add_argument("--token-overlap", type=int, default=CHUNK_TOKEN_OVERLAP)
+    parser.add_argument("--target-size", type=int, default=350)
+    parser.add_argument("--overlap", type=int, default=60)
+    parser.add_argument("--from-store", action="store_true", help="measure the chunks in the chunk store")
+    parser.add_argument("--text-dir", type=Path, default=Path("data/text"))
+    parser.add_argument("--pdf-dir", type=Path, default=Path("data"))
+    args = parser.parse_args()
+
+    documents = load_documents(args.text_dir, args.pdf_dir)
+    if not documents:
+        print("❌ No documents found")
+        return 1
+
+    tokenizer = load_tokenizer(args.model)
+    counter = TokenCounter(tokenizer)
+
+    if args.from_store:
+        current = defaultdict(list)
+        for chunk in ChunkStore().iter_chunks():
+            current[chunk["quelle"]].append(chunk["text"])
+        current_label = "chunk store"
+    else:
+        current = {name: list(iter_smart_chunks(text, args.target_size, args.overlap))
+                   for name, text in documents.items()}
+        current_label = f"words {args.target_size}/{args.overlap}"
+
+    print(f"📏 {args.model}: max {args.max_tokens} word-pieces per sequence")
+    totals = {"current": defaultdict(int), "tokens": defaultdict(int)}
+    for name, text in documents.items():
+        word_stats = truncation_stats(current.get(name, []), tokenizer, args.max_tokens)
+        token_chunks = list(iter_token_chunks(text, counter, args.max_tokens, args.token_overlap))
+        token_stats = truncation_stats(token_chunks, tokenizer, args.max_tokens)
+        add_stats(totals["current"], word_stats)
+        add_stats(totals["tokens"], token_stats)
+
+        print(f"\n📄 {name}")
+        print(f"   {current_label:<22} {format_stats(word_stats)}")
+        print(f"   {'tokens ' + str(args.max_tokens) + '/' + str(args.token_overlap):<22} {format_stats(token_stats)}")
+
+    print("\n📊 Corpus")
+    print(f"   {current_label:<22} {format_stats(totals['current'])}")
+    print(f"   {'tokens ' + str(args.max_tokens) + '/' + str(args.token_overlap):<22} {format_stats(totals['tokens'])}")
+
+    # The token-budget chunker must never exceed the sequence length
+    return 1 if totals["tokens"]["truncated"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,81 @@
+# corpus_state.py - Gemeinsamer Korpus-Zustand zwischen Ingestion und App
+
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+CORPUS_STATE_FILE = Path(os.getenv("CORPUS_STATE_FILE", "data/corpus_state.json"))
+
+_cache_lock = threading.Lock()
+_cached_mtime = None
+_cached_state = None
+
+
+def compute_fingerprint(keys):
+    """Stabiler Fingerprint über den Inhalt der Collection (Reihenfolge egal)"""
+    digest = hashlib.sha256()
+    for key in sorted(keys):
+        digest.update(key.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()[:16]
+
+
+def document_key(source, text):
+    """Inhaltsschlüssel eines Dokuments - identischer Korpus ergibt identischen Fingerprint"""
+    return f"{source}\n{text}"
+
+
+def corpus_fingerprint(keys, embedding_model=None):
+    """Fingerprint über Inhalt und Embedding-Model - ein Wechsel von Model oder
+    Backend-Variante invalidiert die Antwort-Caches wie ein neuer Korpus"""
+    keys = list(keys)
+    if embedding_model:
+        keys.append(f"\0embedding_model\n{embedding_model}")
+    return compute_fingerprint(keys)
+
+
+def mark_corpus_changed(keys, document_count=None, embedding_model=None):
+    """Nach jedem Import aufrufen - invalidiert Caches in laufenden App-Prozessen"""
+    keys = list(keys)
+    state = {
+        "fingerprint": corpus_fingerprint(keys, embedding_model),
+        "document_count": document_count if document_count is not None else len(keys),
+        "embedding_model": embedding_model,
+        "updated_at": time.time(),
+    }
+
+    CORPUS_STATE_FILE.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = CORPUS_STATE_FILE.with_suffix(".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f)
+    os.replace(tmp_path, CORPUS_STATE_FILE)
+    return state
+
+
+def read_corpus_state():
+    """Aktuellen Korpus-Zustand lesen (nur bei geänderter mtime neu parsen)"""
+    global _cached_mtime, _cached_state
+
+    try:
+        mtime = CORPUS_STATE_FILE.stat().st_mtime_ns
+    except OSError:
+        return None
+
+    with _cache_lock:
+        if mtime != _cached_mtime:
+            try:
+                with open(CORPUS_STATE_FILE, "r", encoding="utf-8") as f:
+                    _cached_state = json.load(f)
+            except (OSError, ValueError):
+                _cached_state = None
+            _cached_mtime = mtime
+        return _cached_state
+
+
+def read_corpus_version():
+    """Nur den Fingerprint des aktuellen Korpus"""
+    state = read_corpus_state()
+    return state.get("fingerprint") if state else None
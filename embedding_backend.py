@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+Embedding-Backend: PyTorch (SentenceTransformer) oder ONNX Runtime, optional int8
+
+Beide Backends bieten dieselbe Schnittstelle wie SentenceTransformer
+(encode, tokenizer, max_seq_length), App und Ingestion wählen per
+EMBEDDING_BACKEND. Das ONNX-Backend bildet die Pipeline von
+all-MiniLM-L6-v2 nach: Transformer → Mean-Pooling → L2-Normalisierung.
+
+    python embedding_backend.py export              # ONNX-Modell (fp32 + int8) nach models/
+    EMBEDDING_BACKEND=onnx python app.py             # int8-Modell verwenden
+    EMBEDDING_ONNX_QUANTIZED=0 EMBEDDING_BACKEND=onnx ...   # fp32-Modell
+
+Für Ingestion und Abfragen ist ONNX erst freigegeben, wenn benchmark_embedding.py
+die Parität der gewählten Variante bestätigt hat (Ergebnis in parity.json neben
+dem Modell).
+"""
+
+import argparse
+import json
+import os
+import sys
+from pathlib import Path
+
+import numpy as np
+
+EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch").lower()
+EMBEDDING_ONNX_DIR = Path(os.getenv("EMBEDDING_ONNX_DIR", "models/all-MiniLM-L6-v2-onnx"))
+EMBEDDING_ONNX_QUANTIZED = os.getenv("EMBEDDING_ONNX_QUANTIZED", "1") == "1"
+EMBEDDING_THREADS = int(os.getenv("EMBEDDING_THREADS", "0"))  # 0 = Standard der Laufzeit
+EMBEDDING_MAX_SEQ_LENGTH = 256
+
+ONNX_FP32_FILE = "model.onnx"
+ONNX_INT8_FILE = "model-int8.onnx"
+ONNX_PARITY_FILE = "parity.json"
+
+
+def embedding_variant(backend=EMBEDDING_BACKEND, quantized=EMBEDDING_ONNX_QUANTIZED):
+    """Name der Variante wie in benchmark_embedding.py: torch, onnx-fp32 oder onnx-int8"""
+    if backend == "onnx":
+        return "onnx-int8" if quantized else "onnx-fp32"
+    return backend
+
+
+def embedding_model_key(backend=EMBEDDING_BACKEND, model_name=EMBEDDING_MODEL, quantized=EMBEDDING_ONNX_QUANTIZED):
+    """Herkunft von Embeddings (Model und Variante) - Vektoren verschiedener Schlüssel nicht mischen"""
+    return f"{model_name}:{embedding_variant(backend, quantized)}"
+
+
+def read_onnx_parity(model_dir=EMBEDDING_ONNX_DIR):
+    """Von benchmark_embedding.py festgehaltene Paritätsergebnisse pro Variante (leer, wenn nie gemessen)"""
+    try:
+        with open(Path(model_dir) / ONNX_PARITY_FILE, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def require_onnx_parity(backend=EMBEDDING_BACKEND, quantized=EMBEDDING_ONNX_QUANTIZED, model_dir=EMBEDDING_ONNX_DIR):
+    """ONNX-Embeddings erst verwenden (Index und Abfragen), wenn die Parität zu PyTorch gemessen und bestanden ist"""
+    if backend != "onnx":
+        return
+    variant = embedding_variant(backend, quantized)
+    result = read_onnx_parity(model_dir).get(variant)
+    if not result or not result.get("passed"):
+        raise RuntimeError(f"Keine bestandene Paritätsprüfung für {variant} - zuerst 'python benchmark_embedding.py' "
+                           f"ausführen (Ergebnis in {Path(model_dir) / ONNX_PARITY_FILE})")
+
+
+class OnnxEmbedder:
+    """all-MiniLM-L6-v2 mit ONNX Runtime - encode() liefert normalisierte float32-Vektoren wie SentenceTransformer"""
+
+    name = "onnx"
+
+    def __init__(self, model_dir=EMBEDDING_ONNX_DIR, quantized=EMBEDDING_ONNX_QUANTIZED, threads=EMBEDDING_THREADS,
+                 max_seq_length=EMBEDDING_MAX_SEQ_LENGTH):
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+
+        self.model_dir = Path(model_dir)
+        self.model_path = self.model_dir / (ONNX_INT8_FILE if quantized else ONNX_FP32_FILE)
+        if not self.model_path.exists():
+            raise FileNotFoundError(f"{self.model_path} fehlt - zuerst 'python embedding_backend.py export' ausführen")
+
+        options = ort.SessionOptions()
+        if threads:
+            options.intra_op_num_threads = threads
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+
+        self.session = ort.InferenceSession(str(self.model_path), options, providers=["CPUExecutionProvider"])
+        self.input_names = {node.name for node in self.session.get_inputs()}
+        self.tokenizer = AutoTokenizer.from_pretrained(str(self.model_dir))
+        self.max_seq_length = max_seq_length
+        self.quantized = quantized
+
+    def _encode_batch(self, texts):
+        features = self.tokenizer(texts, padding=True, truncation=True, max_length=self.max_seq_length,
+                                  return_tensors="np")
+        inputs = {name: features[name].astype(np.int64) for name in self.input_names}
+        token_embeddings = self.session.run(None, inputs)[0]
+
+        # Mean-Pooling über echte Tokens, dann L2-Normalisierung (wie die Module des SentenceTransformers)
+        mask = features["attention_mask"][..., None].astype(np.float32)
+        pooled = (token_embeddings * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        return pooled / np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+
+    def encode(self, sentences, batch_size=32, show_progress_bar=False, convert_to_numpy=True):
+        """Signatur wie SentenceTransformer.encode; Texte werden nach Länge sortiert gebatcht"""
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        if not texts:
+            return np.empty((0, 0), dtype=np.float32)
+
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]), reverse=True)
+        vectors = np.empty((len(texts), 0), dtype=np.float32)
+        for start in range(0, len(order), batch_size):
+            rows = order[start:start + batch_size]
+            batch = self._encode_batch([texts[i] for i in rows]).astype(np.float32)
+            if vectors.shape[1] == 0:
+                vectors = np.empty((len(texts), batch.shape[1]), dtype=np.float32)
+            vectors[rows] = batch
+
+        return vectors[0] if single else vectors
+
+
+def load_embedding_model(backend=EMBEDDING_BACKEND, model_name=EMBEDDING_MODEL, threads=EMBEDDING_THREADS, **options):
+    """Embedding-Model des gewählten Backends ("torch" oder "onnx")"""
+    if backend == "onnx":
+        return OnnxEmbedder(threads=threads, **options)
+    if backend != "torch":
+        raise ValueError(f"Unbekanntes Embedding-Backend: {backend}")
+
+    from sentence_transformers import SentenceTransformer
+
+    if threads:
+        import torch
+        torch.set_num_threads(threads)
+    return SentenceTransformer(model_name)
+
+
+def export_onnx(model_name=EMBEDDING_MODEL, output_dir=EMBEDDING_ONNX_DIR, quantize=True):
+    """Transformer des Models nach ONNX exportieren (dynamische Batch-/Sequenzlänge), optional int8-Kopie"""
+    import torch
+    from transformers import AutoModel, AutoTokenizer
+
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    model = AutoModel.from_pretrained(model_name).eval()
+    tokenizer.save_pretrained(str(output_dir))
+
+    sample = tokenizer(["Art. 1 Zweck"], return_tensors="pt")
+    input_names = ["input_ids", "attention_mask", "token_type_ids"]
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+    dynamic_axes["last_hidden_state"] = {0: "batch", 1: "sequence"}
+
+    fp32_path = output_dir / ONNX_FP32_FILE
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            tuple(sample[name] for name in input_names),
+            str(fp32_path),
+            input_names=input_names,
+            output_names=["last_hidden_state"],
+            dynamic_axes=dynamic_axes,
+            opset_version=14,
+        )
+    paths = [fp32_path]
+
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        int8_path = output_dir / ONNX_INT8_FILE
+        quantize_dynamic(str(fp32_path), str(int8_path), weight_type=QuantType.QInt8)
+        paths.append(int8_path)
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["export"])
+    parser.add_argument("--model", default=EMBEDDING_MODEL)
+    parser.add_argument("--output-dir", type=Path, default=EMBEDDING_ONNX_DIR)
+    parser.add_argument("--no-quantize", action="store_true")
+    args = parser.parse_args()
+
+    for path in export_onnx(args.model, args.output_dir, quantize=not args.no_quantize):
+        print(f"💾 {path} ({path.stat().st_size / 1e6:.1f} MB)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""
+Embedding-Runner: längensortiert, in Shards mit Checkpoint, optional mit mehreren Prozessen
+
+Zu kodierende Texte werden nach Token-Länge sortiert und in Shards zerlegt,
+damit Batches aus ähnlich langen Texten bestehen (wenig Padding). Jeder
+fertige Shard wird sofort unter EMBED_CHECKPOINT_DIR gespeichert; ein
+abgebrochener Lauf setzt beim nächsten Start mit den fehlenden Shards fort,
+sofern Model und Variante (torch, onnx-fp32, onnx-int8) gleich geblieben sind.
+Nach dem Schreiben des Embedding-Artefakts wird der Checkpoint gelöscht.
+
+    EMBED_WORKERS=2 python process_pdfs.py   # zwei Prozesse mit je halb so vielen Threads
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+import numpy as np
+
+from embedding_backend import EMBEDDING_BACKEND, EMBEDDING_MODEL, EMBEDDING_ONNX_QUANTIZED, embedding_model_key, load_embedding_model, require_onnx_parity
+from ingest_state import text_sha256
+
+EMBED_CHECKPOINT_DIR = Path(os.getenv("EMBED_CHECKPOINT_DIR", "data/embedding_checkpoint"))
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "32"))
+EMBED_SHARD_SIZE = int(os.getenv("EMBED_SHARD_SIZE", "256"))
+EMBED_WORKERS = int(os.getenv("EMBED_WORKERS", "1"))
+
+_worker_model = None
+
+
+def load_tokenizer(model_name=EMBEDDING_MODEL):
+    """Tokenizer des Embedding-Models (ohne die Gewichte zu laden)"""
+    from transformers import AutoTokenizer
+    return AutoTokenizer.from_pretrained(model_name)
+
+
+class TokenCounter:
+    """Word-Piece-Anzahl pro Wort, über Dokumente hinweg gecacht.
+
+    Der BERT-Tokenizer trennt vor den Word-Pieces an Leerzeichen, die
+    Token-Anzahl eines Textes ist also die Summe über seine Wörter. In
+    Gesetzestexten wiederholen sich die meisten Wörter, der Cache bleibt
+    klein und pro Dokument genügt ein Tokenizer-Aufruf für neue Wörter.
+    """
+
+    def __init__(self, tokenizer):
+        self.tokenizer = tokenizer
+        self.special_tokens = tokenizer.num_special_tokens_to_add()
+        self._counts = {}
+
+    def count_words(self, words):
+        unseen = list({word for word in words if word not in self._counts})
+        if unseen:
+            ids = self.tokenizer(unseen, add_special_tokens=False)["input_ids"]
+            self._counts.update(zip(unseen, map(len, ids)))
+        return [self._counts[word] for word in words]
+
+    def count_text(self, text):
+        """Exakte Sequenzlänge, die das Model für text sieht (vor dem Abschneiden)"""
+        return len(self.tokenizer(text)["input_ids"])
+
+
+def _init_worker(backend, model_name, quantized, threads):
+    """Pro Worker-Prozess: Threads begrenzen und Model einmal laden"""
+    global _worker_model
+    options = {"quantized": quantized} if backend == "onnx" else {}
+    _worker_model = load_embedding_model(backend, model_name, threads=threads, **options)
+
+
+def _encode_shard(texts, batch_size):
+    started = time.perf_counter()
+    vectors = _worker_model.encode(texts, batch_size=batch_size, show_progress_bar=False, convert_to_numpy=True)
+    return np.asarray(vectors, dtype=np.float32), time.perf_counter() - started
+
+
+class ShardCheckpoint:
+    """Fertige Shards: shard-<hash>.keys.json (Text-Hashes) plus shard-<hash>.npy (Vektoren, zeilengleich).
+    checkpoint.json hält den model_key fest; Shards eines anderen Models werden verworfen."""
+
+    def __init__(self, directory=EMBED_CHECKPOINT_DIR, model_key=None):
+        self.directory = Path(directory)
+        self.model_key = model_key
+        self.info_path = self.directory / "checkpoint.json"
+
+    def _recorded_model_key(self):
+        try:
+            with open(self.info_path, "r", encoding="utf-8") as f:
+                return json.load(f).get("embedding_model")
+        except (OSError, ValueError):
+            return None
+
+    def load(self):
+        """{Text-Hash: Vektor} aller vollständig geschriebenen Shards"""
+        vectors = {}
+        if not self.directory.is_dir():
+            return vectors
+        if self._recorded_model_key() != self.model_key:
+            # Anderes Model oder andere Variante - diese Vektoren nicht mit den neuen mischen
+            self.clear()
+            return vectors
+        for keys_path in sorted(self.directory.glob("shard-*.keys.json")):
+            matrix_path = keys_path.with_name(keys_path.name.replace(".keys.json", ".npy"))
+            try:
+                with open(keys_path, "r", encoding="utf-8") as f:
+                    keys = json.load(f)
+                matrix = np.load(matrix_path)
+            except (OSError, ValueError):
+                continue
+            if matrix.ndim == 2 and matrix.shape[0] == len(keys):
+                vectors.update(zip(keys, matrix))
+        return vectors
+
+    def write(self, keys, matrix):
+        """Shard atomar ablegen; die Schlüssel zuletzt, erst dann zählt der Shard als fertig"""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        if not self.info_path.exists():
+            with open(f"{self.info_path}.tmp", "w", encoding="utf-8") as f:
+                json.dump({"embedding_model": self.model_key}, f)
+            os.replace(f"{self.info_path}.tmp", self.info_path)
+        name = "shard-" + hashlib.sha256("\n".join(keys).encode("utf-8")).hexdigest()[:16]
+
+        matrix_path = self.directory / f"{name}.npy"
+        with open(f"{matrix_path}.tmp", "wb") as f:
+            np.save(f, np.asarray(matrix, dtype=np.float32))
+        os.replace(f"{matrix_path}.tmp", matrix_path)
+
+        keys_path = self.directory / f"{name}.keys.json"
+        with open(f"{keys_path}.tmp", "w", encoding="utf-8") as f:
+            json.dump(keys, f)
+        os.replace(f"{keys_path}.tmp", keys_path)
+
+    def clear(self):
+        if self.directory.exists():
+            shutil.rmtree(self.directory)
+
+
+class EmbeddingRunner:
+    """encode(texts) für build_embedding_matrix - Ergebnis zeilengleich zu texts"""
+
+    def __init__(self, model_name=EMBEDDING_MODEL, model=None, backend=EMBEDDING_BACKEND,
+                 quantized=EMBEDDING_ONNX_QUANTIZED, checkpoint_dir=EMBED_CHECKPOINT_DIR, batch_size=EMBED_BATCH_SIZE,
+                 shard_size=EMBED_SHARD_SIZE, workers=EMBED_WORKERS, log=print):
+        self.model_name = model_name
+        self.backend = backend
+        self.quantized = quantized
+        self.model_key = embedding_model_key(backend, model_name, quantized)
+        self.model = model
+        self.checkpoint = ShardCheckpoint(checkpoint_dir, self.model_key)
+        self.batch_size = batch_size
+        self.shard_size = shard_size
+        self.workers = max(1, workers)
+        self.log = log
+
+    def _load_model(self):
+        if self.model is None:
+            self.log(f"🤗 Lade Model: {self.model_name} ({self.backend})")
+            options = {"quantized": self.quantized} if self.backend == "onnx" else {}
+            self.model = load_embedding_model(self.backend, self.model_name, **options)
+        return self.model
+
+    def _token_lengths(self, texts):
+        """Länge in Word-Pieces (Tokenizer des Models, ohne Gewichte zu laden)"""
+        tokenizer = self.model.tokenizer if self.model is not None else load_tokenizer(self.model_name)
+        counter = TokenCounter(tokenizer)
+        return [sum(counter.count_words(text.split())) for text in texts]
+
+    def _shards(self, keys, texts):
+        """Längste Texte zuerst, in Shards ähnlicher Länge"""
+        lengths = self._token_lengths(texts)
+        order = sorted(range(len(texts)), key=lambda i: lengths[i], reverse=True)
+        for start in range(0, len(order), self.shard_size):
+            rows = order[start:start + self.shard_size]
+            yield [keys[i] for i in rows], [texts[i] for i in rows]
+
+    def _run_in_process(self, shards):
+        model = self._load_model()
+        for keys, texts in shards:
+            started = time.perf_counter()
+            vectors = model.encode(texts, batch_size=self.batch_size, show_progress_bar=False, convert_to_numpy=True)
+            yield keys, np.asarray(vectors, dtype=np.float32), time.perf_counter() - started
+
+    def _run_in_pool(self, shards, workers):
+        threads = max(1, (os.cpu_count() or 1) // workers)
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(self.backend, self.model_name, self.quantized, threads)) as pool:
+            futures = {pool.submit(_encode_shard, texts, self.batch_size): keys for keys, texts in shards}
+            for future in as_completed(futures):
+                vectors, seconds = future.result()
+                yield futures[future], vectors, seconds
+
+    def encode(self, texts):
+        require_onnx_parity(self.backend, self.quantized)
+        keys = [text_sha256(text) for text in texts]
+        done = self.checkpoint.load()
+        if done:
+            self.log(f"♻️ Checkpoint: {sum(1 for key in set(keys) if key in done)} Embeddings aus abgebrochenem Lauf")
+
+        pending = {}
+        for key, text in zip(keys, texts):
+            if key not in done:
+                pending[key] = text
+
+        if pending:
+            shards = list(self._shards(list(pending), list(pending.values())))
+            workers = min(self.workers, len(shards))
+            self.log(f"📊 Kodiere {len(pending)} Chunks in {len(shards)} Shards ({workers} Prozess(e))")
+
+            started = time.perf_counter()
+            encoded = 0
+            run = self._run_in_pool(shards, workers) if workers > 1 else self._run_in_process(shards)
+            for shard_keys, vectors, seconds in run:
+                self.checkpoint.write(shard_keys, vectors)
+                done.update(zip(shard_keys, vectors))
+                encoded += len(shard_keys)
+                elapsed = time.perf_counter() - started
+                self.log(f"📈 {encoded}/{len(pending)} Chunks - Shard {len(shard_keys) / max(seconds, 1e-9):.1f} Chunks/s, "
+                         f"gesamt {encoded / max(elapsed, 1e-9):.1f} Chunks/s")
+
+            elapsed = time.perf_counter() - started
+            self.log(f"⏱️ {encoded} Chunks in {elapsed:.1f}s kodiert ({encoded / max(elapsed, 1e-9):.1f} Chunks/s)")
+
+        return np.stack([done[key] for key in keys]) if keys else np.empty((0, 0), dtype=np.float32)
+
+    def clear(self):
+        """Checkpoint verwerfen, sobald das Artefakt geschrieben ist"""
+        self.checkpoint.clear()
@@ -0,0 +1,180 @@
+# embedding_service.py - Micro-Batching und Cache für Query-Embeddings
+
+import logging
+import os
+import queue
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+_PUNCTUATION = re.compile(r"[^\w\s]")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_question(text):
+    """Cache-Schlüssel: Kleinschreibung, ohne Satzzeichen, einfache Leerzeichen"""
+    text = _PUNCTUATION.sub(" ", text.lower())
+    return _WHITESPACE.sub(" ", text).strip()
+
+
+class EmbeddingCache:
+    """Begrenzter LRU-Cache mit TTL für Query-Embeddings (kompakte float32-Arrays)"""
+
+    def __init__(self, max_entries=1024, ttl_seconds=3600.0):
+        self.max_entries = max_entries
+        self.ttl = ttl_seconds
+
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._misses += 1
+                return None
+
+            vector, stored_at = entry
+            if time.monotonic() - stored_at > self.ttl:
+                del self._entries[key]
+                self._expirations += 1
+                self._misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return vector
+
+    def put(self, key, vector):
+        vector = np.ascontiguousarray(vector, dtype=np.float32)
+        vector.setflags(write=False)  # geteilt zwischen Anfragen - nie verändern
+
+        with self._lock:
+            self._entries[key] = (vector, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+        return vector
+
+    def stats(self):
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": round(self._hits / lookups, 3) if lookups else 0.0,
+                "evictions": self._evictions,
+                "expirations": self._expirations,
+                "bytes": sum(vector.nbytes for vector, _ in self._entries.values()),
+            }
+
+
+class EmbeddingBatcher:
+    """Sammelt parallele Query-Texte kurz ein und kodiert sie in einem Batch.
+
+    Jeder Aufrufer erhält ein Future; ein Hintergrund-Thread wartet nach dem
+    ersten Text höchstens max_wait_ms auf weitere Texte oder bis max_batch_size
+    erreicht ist und löst danach alle Futures mit ihrem Vektor auf.
+    """
+
+    def __init__(self, model, max_batch_size=16, max_wait_ms=5.0):
+        self.model = model
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+
+        self._batches = 0
+        self._items = 0
+        self._max_batch_seen = 0
+        self._max_queue_depth = 0
+        self._encode_seconds = 0.0
+
+    def _ensure_started(self):
+        """Worker-Thread lazy starten (auch neu nach einem fork)"""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._queue = queue.Queue()
+            self._thread = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+            self._thread.start()
+
+    def submit(self, text):
+        """Text einreihen; liefert ein Future mit dem float32-Vektor"""
+        self._ensure_started()
+        future = Future()
+        self._queue.put((text, future))
+
+        depth = self._queue.qsize()
+        if depth > self._max_queue_depth:
+            self._max_queue_depth = depth
+        return future
+
+    def encode(self, text, timeout=30.0):
+        return self.submit(text).result(timeout=timeout)
+
+    def _collect_batch(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect_batch()
+            texts = [text for text, _ in batch]
+
+            started = time.perf_counter()
+            try:
+                vectors = self.model.encode(texts, batch_size=len(texts), convert_to_numpy=True)
+            except Exception as e:
+                logger.error(f"❌ Batch-Embedding fehlgeschlagen ({len(texts)} Texte): {e}")
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+
+            self._encode_seconds += time.perf_counter() - started
+            self._batches += 1
+            self._items += len(batch)
+            self._max_batch_seen = max(self._max_batch_seen, len(batch))
+
+            for (_, future), vector in zip(batch, vectors):
+                future.set_result(vector)
+
+    def stats(self):
+        return {
+            "batches": self._batches,
+            "items": self._items,
+            "avg_batch_size": round(self._items / self._batches, 2) if self._batches else 0.0,
+            "max_batch_size_seen": self._max_batch_seen,
+            "queue_depth": self._queue.qsize(),
+            "max_queue_depth": self._max_queue_depth,
+            "avg_encode_ms": round(self._encode_seconds / self._batches * 1000, 2) if self._batches else 0.0,
+            "config": {"max_batch_size": self.max_batch_size, "max_wait_ms": self.max_wait * 1000},
+        }
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Embedding-Artefakt: binäre Matrix (.npy) plus zeilengleiche Metadaten (.jsonl)
+
+Zeile i der Matrix gehört zu Zeile i der Metadaten-Datei (id, text, quelle,
+chunk_id, filename sowie Artikel, Seitenbereich und Offset, falls bekannt).
+Die Datei .info.json hält fest, mit welchem Model und welcher Variante
+(torch, onnx-fp32, onnx-int8) die Vektoren berechnet wurden.
+Die Matrix kann per Memory-Map gelesen und in Zeilenbereichen gestreamt
+werden; das frühere JSON-Format bleibt als Export.
+
+    python embedding_store.py export-json [ziel.json]
+    python embedding_store.py import-json [quelle.json]
+"""
+
+import argparse
+import json
+import os
+import sys
+from itertools import islice
+from pathlib import Path
+
+import numpy as np
+
+from chunk_store import CHUNK_METADATA_FIELDS
+
+EMBEDDINGS_MATRIX_FILE = Path(os.getenv("EMBEDDINGS_FILE", "data/embeddings.npy"))
+EMBEDDINGS_DTYPE = os.getenv("EMBEDDINGS_DTYPE", "float32")
+LEGACY_JSON_FILE = Path("data/embeddings_hf.json")
+
+METADATA_FIELDS = ("id", "text", "quelle", "chunk_id", "filename")
+
+
+class EmbeddingArtifact:
+    """Lesezugriff auf Matrix und Metadaten eines Embedding-Artefakts"""
+
+    def __init__(self, matrix_path=EMBEDDINGS_MATRIX_FILE):
+        self.matrix_path = Path(matrix_path)
+        self.meta_path = self.matrix_path.with_suffix(".jsonl")
+        self.info_path = self.matrix_path.with_suffix(".info.json")
+
+    def exists(self):
+        return self.matrix_path.exists() and self.meta_path.exists()
+
+    def model_key(self):
+        """Herkunft der Vektoren (embedding_backend.embedding_model_key); None bei unbekannter Herkunft"""
+        try:
+            with open(self.info_path, "r", encoding="utf-8") as f:
+                return json.load(f).get("embedding_model")
+        except (OSError, ValueError):
+            return None
+
+    def matrix(self, mmap=True):
+        """Embedding-Matrix (rows x dim) - per Memory-Map ohne Kopie in den Speicher"""
+        return np.load(self.matrix_path, mmap_mode="r" if mmap else None)
+
+    def __len__(self):
+        return self.matrix().shape[0]
+
+    def iter_records(self, start=0, stop=None):
+        """Metadaten-Zeilen im Bereich [start, stop) streamen"""
+        with open(self.meta_path, "r", encoding="utf-8") as f:
+            for line in islice(f, start, stop):
+                yield json.loads(line)
+
+    def records(self):
+        return list(self.iter_records())
+
+    def iter_batches(self, batch_size=100, start=0, stop=None):
+        """(Metadaten, Matrix-Ausschnitt) pro Zeilenbereich; die Ausschnitte sind Views auf die Memory-Map"""
+        matrix = self.matrix()
+        stop = matrix.shape[0] if stop is None else min(stop, matrix.shape[0])
+
+        records = self.iter_records(start, stop)
+        for offset in range(start, stop, batch_size):
+            end = min(offset + batch_size, stop)
+            batch = list(islice(records, end - offset))
+            if len(batch) != end - offset:
+                raise ValueError(f"Metadaten und Matrix sind nicht zeilengleich: {self.meta_path}")
+            yield batch, matrix[offset:end]
+
+
+def write_embedding_artifact(records, embeddings, matrix_path=EMBEDDINGS_MATRIX_FILE, dtype=EMBEDDINGS_DTYPE,
+                             model_key=None):
+    """Artefakt atomar schreiben; die Matrix wird zuletzt ersetzt (ihre mtime signalisiert neue Daten).
+    model_key hält die Herkunft der Vektoren fest (None = unbekannt, z.B. beim JSON-Import)"""
+    artifact = EmbeddingArtifact(matrix_path)
+    matrix = np.ascontiguousarray(embeddings, dtype=dtype)
+    records = list(records)
+    if matrix.ndim != 2 or matrix.shape[0] != len(records):
+        raise ValueError(f"{len(records)} Metadaten-Zeilen für Matrix mit Form {matrix.shape}")
+
+    artifact.matrix_path.parent.mkdir(parents=True, exist_ok=True)
+
+    meta_tmp = artifact.meta_path.with_suffix(".jsonl.tmp")
+    with open(meta_tmp, "w", encoding="utf-8") as f:
+        for record in records:
+            row = {field: record[field] for field in METADATA_FIELDS}
+            row.update({field: record[field] for field in CHUNK_METADATA_FIELDS if field in record})
+            f.write(json.dumps(row, ensure_ascii=False) + "\n")
+
+    info_tmp = artifact.info_path.with_suffix(".json.tmp")
+    with open(info_tmp, "w", encoding="utf-8") as f:
+        json.dump({"embedding_model": model_key, "rows": len(records), "dim": int(matrix.shape[1])}, f)
+
+    matrix_tmp = artifact.matrix_path.with_suffix(".npy.tmp")
+    with open(matrix_tmp, "wb") as f:
+        np.save(f, matrix)
+
+    os.replace(meta_tmp, artifact.meta_path)
+    os.replace(info_tmp, artifact.info_path)
+    os.replace(matrix_tmp, artifact.matrix_path)
+    return artifact
+
+
+def export_json(artifact, json_path=LEGACY_JSON_FILE):
+    """Artefakt im früheren Format (Liste von Objekten mit "embedding") exportieren"""
+    entries = []
+    for batch, vectors in artifact.iter_batches(batch_size=1000):
+        for record, vector in zip(batch, vectors):
+            entries.append({**record, "embedding": vector.astype(np.float32).tolist()})
+
+    with open(json_path, "w", encoding="utf-8") as f:
+        json.dump(entries, f, ensure_ascii=False, indent=2)
+    return len(entries)
+
+
+def import_json(json_path=LEGACY_JSON_FILE, matrix_path=EMBEDDINGS_MATRIX_FILE):
+    """Bestehende embeddings_hf.json ins Binärformat umwandeln"""
+    with open(json_path, "r", encoding="utf-8") as f:
+        entries = json.load(f)
+    embeddings = np.asarray([entry["embedding"] for entry in entries], dtype=np.float32)
+    write_embedding_artifact(entries, embeddings, matrix_path)
+    return len(entries)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["export-json", "import-json"])
+    parser.add_argument("json_path", nargs="?", type=Path, default=LEGACY_JSON_FILE)
+    args = parser.parse_args()
+
+    artifact = EmbeddingArtifact()
+    if args.command == "export-json":
+        if not artifact.exists():
+            print(f"❌ Kein Embedding-Artefakt gefunden: {artifact.matrix_path}")
+            return 1
+        count = export_json(artifact, args.json_path)
+        print(f"💾 {count} Embeddings exportiert nach {args.json_path}")
+    else:
+        count = import_json(args.json_path)
+        print(f"💾 {count} Embeddings gespeichert in {artifact.matrix_path} / {artifact.meta_path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,257 @@
+# generation_scheduler.py - Begrenzte Ollama-Generierung: Slots, Warteschlange, Downgrade und Lastabwurf
+
+import asyncio
+import contextlib
+import math
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+
+class GenerationOverloaded(Exception):
+    """Harte Grenze erreicht - Anfrage sofort mit 429 ablehnen"""
+
+    def __init__(self, retry_after):
+        super().__init__(f"Überlastet, erneut versuchen in {retry_after}s")
+        self.retry_after = retry_after
+
+
+class Deadline:
+    """Zeitbudget einer Anfrage ab ihrem Eintreffen (budget None = unbegrenzt)"""
+
+    def __init__(self, budget=None):
+        self.budget = budget
+        self.expires_at = None if budget is None else time.monotonic() + budget
+
+    def remaining(self):
+        """Verbleibende Sekunden (None = unbegrenzt)"""
+        if self.expires_at is None:
+            return None
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def timeout(self, limit):
+        """limit, aber höchstens das verbleibende Budget"""
+        remaining = self.remaining()
+        return limit if remaining is None else min(limit, remaining)
+
+    def expired(self):
+        return self.expires_at is not None and time.monotonic() >= self.expires_at
+
+
+class _Waiter:
+    """Eintrag der Warteschlange; wake() wird unter dem Lock des Schedulers aufgerufen"""
+
+    def __init__(self, wake):
+        self.wake = wake
+        self.granted = False
+        self.enqueued_at = time.monotonic()
+
+
+class GenerationScheduler:
+    """Verteilt eine feste Anzahl gleichzeitiger Ollama-Generierungen (Slots).
+
+    Ist kein Slot frei, wartet die Anfrage FIFO in der Warteschlange. Ab
+    downgrade_depth Wartenden oder nach queue_timeout Sekunden Wartezeit
+    bekommt sie keinen Slot und wird auf die extraktive Antwort umgeleitet.
+    Unabhängig davon begrenzt admission() die Zahl gleichzeitig bearbeiteter
+    Anfragen: ab max_pending wird sofort mit GenerationOverloaded abgelehnt.
+
+    Threads (Flask) und Coroutinen (asgi.py) teilen sich dieselben Slots.
+    """
+
+    def __init__(self, slots=2, downgrade_depth=8, max_pending=64, queue_timeout=30.0, retry_after=5):
+        self.slots = max(1, slots)
+        self.downgrade_depth = downgrade_depth
+        self.max_pending = max_pending
+        self.queue_timeout = queue_timeout
+        self.retry_after = retry_after
+
+        self._lock = threading.Lock()
+        self._active = 0
+        self._pending = 0
+        self._waiters = deque()
+
+        self._granted = 0
+        self._downgraded = 0
+        self._queue_timeouts = 0
+        self._cancelled = 0
+        self._rejected = 0
+        self._deadline_exceeded = 0
+        self._max_queue_depth = 0
+        self._wait_ms = deque(maxlen=1000)
+        self._hold_ms = deque(maxlen=200)
+
+    # --- Zulassung (ganze Anfrage) -------------------------------------------------
+
+    def admit(self):
+        """Anfrage zulassen oder GenerationOverloaded auslösen; jedes admit() braucht ein leave()"""
+        with self._lock:
+            if self.max_pending and self._pending >= self.max_pending:
+                self._rejected += 1
+                raise GenerationOverloaded(self._estimate_retry_after())
+            self._pending += 1
+
+    def leave(self):
+        with self._lock:
+            self._pending -= 1
+
+    @contextlib.contextmanager
+    def admission(self):
+        self.admit()
+        try:
+            yield
+        finally:
+            self.leave()
+
+    def _estimate_retry_after(self):
+        """Sekunden, bis die aktuelle Warteschlange voraussichtlich abgearbeitet ist"""
+        if not self._hold_ms:
+            return self.retry_after
+        backlog = (len(self._waiters) + self._active) / self.slots
+        estimate = math.ceil(backlog * sum(self._hold_ms) / len(self._hold_ms) / 1000)
+        return max(self.retry_after, estimate)
+
+    # --- Slots (nur die Generierung) ------------------------------------------------
+
+    def _try_acquire(self, wake):
+        """Unter dem Lock: (True, None) bei freiem Slot, (False, None) bei Downgrade, sonst (None, Waiter)"""
+        if self._active < self.slots and not self._waiters:
+            self._active += 1
+            self._granted += 1
+            self._wait_ms.append(0.0)
+            return True, None
+        if len(self._waiters) >= self.downgrade_depth:
+            self._downgraded += 1
+            return False, None
+        waiter = _Waiter(wake)
+        self._waiters.append(waiter)
+        self._max_queue_depth = max(self._max_queue_depth, len(self._waiters))
+        return None, waiter
+
+    def _finish_wait(self, waiter, cancelled=False):
+        """Unter dem Lock nach dem Warten: Slot übernommen oder Anfrage aus der Warteschlange nehmen
+        (cancelled: Wartender abgebrochen, z.B. Client getrennt - zählt nicht als Timeout)"""
+        if waiter.granted:
+            self._granted += 1
+            self._wait_ms.append((time.monotonic() - waiter.enqueued_at) * 1000)
+            return True
+        self._waiters.remove(waiter)
+        if cancelled:
+            self._cancelled += 1
+        else:
+            self._queue_timeouts += 1
+        return False
+
+    def _wait_timeout(self, timeout):
+        return self.queue_timeout if timeout is None else min(self.queue_timeout, timeout)
+
+    def acquire(self, timeout=None):
+        """Blockierend: True mit Slot, False für den extraktiven Fallback.
+        timeout verkürzt die Wartezeit (z.B. auf das Restbudget der Anfrage)"""
+        event = threading.Event()
+        with self._lock:
+            granted, waiter = self._try_acquire(event.set)
+            if waiter is None:
+                return granted
+
+        event.wait(self._wait_timeout(timeout))
+        with self._lock:
+            return self._finish_wait(waiter)
+
+    async def acquire_async(self, timeout=None):
+        """Wie acquire(), wartet aber als Coroutine statt in einem Thread"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        def wake():
+            loop.call_soon_threadsafe(lambda: future.done() or future.set_result(True))
+
+        with self._lock:
+            granted, waiter = self._try_acquire(wake)
+            if waiter is None:
+                return granted
+
+        try:
+            await asyncio.wait_for(asyncio.shield(future), self._wait_timeout(timeout))
+        except asyncio.TimeoutError:
+            pass
+        except BaseException:
+            # Abgebrochen: einen bereits übergebenen Slot weiterreichen
+            with self._lock:
+                if not self._finish_wait(waiter, cancelled=True):
+                    raise
+            self.release()
+            raise
+        with self._lock:
+            return self._finish_wait(waiter)
+
+    def release(self, hold_ms=None):
+        """Slot direkt an den ältesten Wartenden übergeben oder freigeben"""
+        with self._lock:
+            if hold_ms is not None:
+                self._hold_ms.append(hold_ms)
+            if self._waiters:
+                waiter = self._waiters.popleft()
+                waiter.granted = True
+                waiter.wake()
+            else:
+                self._active -= 1
+
+    def record_deadline_exceeded(self):
+        """Generierung lief über das Antwortbudget - extraktive Antwort ausgeliefert"""
+        with self._lock:
+            self._deadline_exceeded += 1
+
+    @contextlib.contextmanager
+    def slot(self, enabled=True, timeout=None):
+        """with scheduler.slot(...) as granted: - bei False extraktiv antworten"""
+        if not enabled:
+            yield False
+            return
+        if not self.acquire(timeout):
+            yield False
+            return
+        started = time.monotonic()
+        try:
+            yield True
+        finally:
+            self.release((time.monotonic() - started) * 1000)
+
+    @contextlib.asynccontextmanager
+    async def slot_async(self, enabled=True, timeout=None):
+        if not enabled:
+            yield False
+            return
+        if not await self.acquire_async(timeout):
+            yield False
+            return
+        started = time.monotonic()
+        try:
+            yield True
+        finally:
+            self.release((time.monotonic() - started) * 1000)
+
+    def stats(self):
+        with self._lock:
+            waits = np.asarray(self._wait_ms) if self._wait_ms else np.zeros(1)
+            holds = np.asarray(self._hold_ms) if self._hold_ms else np.zeros(1)
+            return {
+                "slots": self.slots,
+                "active": self._active,
+                "queue_depth": len(self._waiters),
+                "max_queue_depth": self._max_queue_depth,
+                "pending_requests": self._pending,
+                "granted": self._granted,
+                "downgraded": self._downgraded,
+                "queue_timeouts": self._queue_timeouts,
+                "cancelled": self._cancelled,
+                "rejected": self._rejected,
+                "deadline_exceeded": self._deadline_exceeded,
+                "wait_ms_p50": round(float(np.percentile(waits, 50)), 1),
+                "wait_ms_p95": round(float(np.percentile(waits, 95)), 1),
+                "wait_ms_max": round(float(waits.max()), 1),
+                "generation_ms_p50": round(float(np.percentile(holds, 50)), 1),
+                "retry_after": self._estimate_retry_after(),
+            }
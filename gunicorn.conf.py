@@ -0,0 +1,44 @@
+# gunicorn.conf.py - Produktionsbetrieb: mehrere Worker-Prozesse hinter Port 5000
+#
+#   gunicorn -c gunicorn.conf.py app:app
+#   gunicorn -c gunicorn.conf.py -k uvicorn.workers.UvicornWorker asgi:application   # asyncio-/answer
+#
+# Das Embedding-Model und der Retrieval-Index werden einmal im Master geladen
+# (preload_app) und von den Workern nach dem fork copy-on-write geteilt.
+
+import gc
+import os
+
+_cpus = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else (os.cpu_count() or 1)
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5000')}"
+workers = int(os.getenv("WEB_WORKERS", "2"))
+worker_class = "gthread"                        # Threads pro Worker für Streaming und Micro-Batching
+threads = int(os.getenv("WEB_THREADS", "8"))
+preload_app = True
+timeout = int(os.getenv("WEB_TIMEOUT", "120"))  # Ollama-Antworten können lange dauern
+graceful_timeout = 30
+keepalive = 5
+errorlog = "-"
+loglevel = os.getenv("WEB_LOG_LEVEL", "info")
+
+# Torch-Threads pro Worker: Standard verteilt die verfügbaren CPUs auf die Worker
+torch_threads = int(os.getenv("TORCH_THREADS_PER_WORKER", "0")) or max(1, _cpus // workers)
+
+
+def when_ready(server):
+    """Master, vor dem Start der Worker: gemeinsamen Zustand laden und für COW einfrieren"""
+    import app
+
+    app.preload_shared_state()
+    # Vorgeladene Objekte aus der GC-Verfolgung nehmen, sonst berührt der Collector
+    # ihre Seiten in jedem Worker und hebt das Teilen auf
+    gc.freeze()
+    server.log.info(f"👷 {workers} Worker x {threads} Threads, {torch_threads} Torch-Threads pro Worker")
+
+
+def post_fork(server, worker):
+    import app
+
+    # Warm-up des Antwortspeichers nur im ersten Worker, nicht in jedem
+    app.init_worker_process(torch_threads, start_warmup=worker.age == 1)
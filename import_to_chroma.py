@@ -3,95 +3,146 @@
 ChromaDB Import - Fast and reliable
 """
 
-import json
 import chromadb
-from pathlib import Path
+import numpy as np
+from corpus_state import corpus_fingerprint, document_key, mark_corpus_changed, read_corpus_version
+from legal_text import SENTENCE_INDEX_FILE, write_sentence_index
+from embedding_store import EmbeddingArtifact
+from chunk_store import chunk_metadata
 
-def import_to_chromadb():
-    """Import embeddings to ChromaDB with fallback strategy"""
+def collection_embedding_model(collection):
+    """Model key recorded on the collection (None for collections imported before it was recorded)"""
+    return (collection.metadata or {}).get("embedding_model") or None
+
+def sync_collection(collection, artifact, batch_size=100):
+    """Bring the collection in line with the artifact: upsert new/changed rows, delete vanished ones.
+    
+    IDs are content hashes, so an existing ID already holds the right text and
+    embedding - only its metadata (e.g. chunk number) may have moved. That only
+    holds for vectors of the same model: if the artifact's model key differs
+    from the one recorded on the collection, every row is upserted.
+    Returns (added, updated, deleted).
+    """
+    model_key = artifact.model_key()
+    full_upsert = collection_embedding_model(collection) != model_key
+    if full_upsert:
+        print(f"🔄 Collection vectors from {collection_embedding_model(collection) or 'unknown model'}, "
+              f"artifact from {model_key or 'unknown model'} - upserting all rows")
+    
+    existing = collection.get(include=["metadatas"])
+    existing_meta = dict(zip(existing["ids"], existing["metadatas"]))
+    
+    current_ids = set()
+    added = updated = 0
+    
+    for batch, vectors in artifact.iter_batches(batch_size):
+        ids, documents, embeddings, metadatas = [], [], [], []
+        
+        for entry, vector in zip(batch, vectors):
+            current_ids.add(entry["id"])
+            metadata = chunk_metadata(entry)
+            previous = existing_meta.get(entry["id"])
+            if previous == metadata and not full_upsert:
+                continue
+            if previous is None:
+                added += 1
+            else:
+                updated += 1
+            
+            ids.append(entry["id"])
+            documents.append(entry["text"])
+            embeddings.append(vector)
+            metadatas.append(metadata)
+        
+        if ids:
+            collection.upsert(
+                ids=ids,
+                documents=documents,
+                embeddings=np.asarray(embeddings, dtype=np.float32).tolist(),
+                metadatas=metadatas
+            )
+    
+    stale_ids = [chunk_id for chunk_id in existing_meta if chunk_id not in current_ids]
+    for i in range(0, len(stale_ids), batch_size):
+        collection.delete(ids=stale_ids[i:i + batch_size])
+    
+    if full_upsert:
+        # Recorded last: an interrupted sync is repeated in full on the next run.
+        # hnsw:* settings are fixed at creation and may not be passed to modify()
+        # ("" = unknown origin, Chroma metadata values cannot be None)
+        metadata = {key: value for key, value in (collection.metadata or {}).items() if not key.startswith("hnsw:")}
+        metadata["embedding_model"] = model_key or ""
+        collection.modify(metadata=metadata)
+    
+    return added, updated, len(stale_ids)
+
+def import_to_chromadb(client=None):
+    """Import embeddings to ChromaDB with fallback strategy (or into the given client)"""
     print("📚 Starting ChromaDB import...")
     
-    # Check if embeddings file exists
-    embeddings_file = Path("data/embeddings_hf.json")
-    if not embeddings_file.exists():
+    # Check if embeddings artifact exists
+    artifact = EmbeddingArtifact()
+    if not artifact.exists():
         print("❌ No embeddings file found! Run process_pdfs.py first.")
         return False
     
-    # Load embeddings
-    print("📁 Loading embeddings...")
+    # Open embeddings (matrix is memory-mapped, metadata streamed per batch)
+    print("📁 Opening embeddings...")
     try:
-        with open(embeddings_file, "r", encoding="utf-8") as f:
-            embeddings_data = json.load(f)
-        print(f"📊 Loaded {len(embeddings_data)} embeddings")
+        print(f"📊 Found {len(artifact)} embeddings")
     except Exception as e:
         print(f"❌ Error loading embeddings: {e}")
         return False
     
     # Connect to ChromaDB with fallback
-    client = None
-    
-    # Try HTTP client first (Docker)
-    try:
-        client = chromadb.HttpClient(host="localhost", port=8000)
-        client.heartbeat()
-        print("✅ Connected to ChromaDB HTTP server")
-    except Exception as e:
-        print(f"⚠️ HTTP connection failed: {e}")
-        
-        # Fallback to persistent client
+    if client is None:
+        # Try HTTP client first (Docker)
         try:
-            client = chromadb.PersistentClient(path="./chroma_data")
-            print("✅ Connected to ChromaDB persistent client")
+            client = chromadb.HttpClient(host="localhost", port=8000)
+            client.heartbeat()
+            print("✅ Connected to ChromaDB HTTP server")
         except Exception as e:
-            print(f"❌ All ChromaDB connections failed: {e}")
-            return False
-    
-    try:
-        # Delete and recreate collection
-        try:
-            client.delete_collection("gesetzestexte")
-            print("🗑️ Deleted old collection")
-        except:
-            pass  # Collection might not exist
-        
-        collection = client.create_collection("gesetzestexte")
-        print("🆕 Created new collection")
-        
-        # Import in batches
-        batch_size = 100
-        total_imported = 0
-        
-        for i in range(0, len(embeddings_data), batch_size):
-            batch = embeddings_data[i:i + batch_size]
+            print(f"⚠️ HTTP connection failed: {e}")
             
+            # Fallback to persistent client
             try:
-                collection.add(
-                    ids=[entry["id"] for entry in batch],
-                    documents=[entry["text"] for entry in batch],
-                    embeddings=[entry["embedding"] for entry in batch],
-                    metadatas=[{
-                        "filename": entry["filename"],
-                        "chunk_id": entry["chunk_id"],
-                        "quelle": entry["quelle"]
-                    } for entry in batch]
-                )
-                
-                total_imported += len(batch)
-                print(f"✅ Batch {i//batch_size + 1}: {len(batch)} documents")
-                
+                client = chromadb.PersistentClient(path="./chroma_data")
+                print("✅ Connected to ChromaDB persistent client")
             except Exception as e:
-                print(f"❌ Batch import error: {e}")
+                print(f"❌ All ChromaDB connections failed: {e}")
                 return False
+    
+    try:
+        collection = client.get_or_create_collection("gesetzestexte")
+        
+        # Only new, changed and vanished chunks touch the collection
+        added, updated, deleted = sync_collection(collection, artifact)
+        print(f"🔄 Sync: {added} added, {updated} updated, {deleted} deleted")
         
         # Verify import
         final_count = collection.count()
         print(f"📊 Import completed: {final_count} documents in database")
         
-        # Quick search test
+        embeddings_data = artifact.records()
+        changed = added or updated or deleted
+        keys = [document_key(entry["quelle"], entry["text"]) for entry in embeddings_data]
+        
+        if changed or not SENTENCE_INDEX_FILE.exists():
+            # Clean, split and filter sentences once here instead of on every request
+            indexed = write_sentence_index((entry["id"], entry["text"]) for entry in embeddings_data)
+            print(f"📝 Sentence index written for {indexed} chunks")
+        
+        model_key = collection_embedding_model(collection)
+        if changed or read_corpus_version() != corpus_fingerprint(keys, model_key):
+            # Running app instances drop their cached collection handle, count and answer caches
+            mark_corpus_changed(keys, final_count, model_key)
+        
+        # Quick search test (stored vector - no default embedding function download)
         try:
             test_result = collection.query(
-                query_texts=["Test"],
-                n_results=1
+                query_embeddings=[artifact.matrix()[0].astype(np.float32).tolist()],
+                n_results=1,
+                include=["documents"]
             )
             if test_result["documents"][0]:
                 print("🎯 Search test successful - system ready!")
@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""
+Index-Snapshot: beim Docker-Build vorberechnet, beim Start nur wiederhergestellt
+
+    python index_snapshot.py build     # PDF → Text → Chunks → Embeddings → ChromaDB, dann Snapshot
+    python index_snapshot.py restore   # Exit 0: Index aktuell, Exit 2: Neuaufbau nötig
+    python index_snapshot.py status
+
+Der Snapshot liegt ausserhalb von data/ und chroma_data/ (dort werden in
+docker-compose Volumes gemountet). Ein Fingerprint über die SHA-256 aller
+PDFs entscheidet, ob er zum aktuellen Korpus passt; zusätzlich müssen Model
+und Variante der Embeddings (EMBEDDING_BACKEND, EMBEDDING_ONNX_QUANTIZED)
+übereinstimmen.
+"""
+
+import json
+import os
+import shutil
+import sys
+import time
+from pathlib import Path
+
+from chunk_store import CHUNK_STORE_FILE
+from corpus_state import CORPUS_STATE_FILE, compute_fingerprint, corpus_fingerprint, document_key, read_corpus_version
+from embedding_backend import embedding_model_key
+from embedding_store import EmbeddingArtifact
+from ingest_state import INGEST_MANIFEST_FILE, file_sha256, load_manifest
+from legal_text import SENTENCE_INDEX_FILE
+
+SNAPSHOT_DIR = Path(os.getenv("INDEX_SNAPSHOT_DIR", "snapshot"))
+SNAPSHOT_VERSION = 1
+PDF_DIR = Path("data")
+CHROMA_DATA_DIR = Path("chroma_data")
+
+EXIT_READY = 0
+EXIT_REBUILD = 2
+
+
+def pdf_hashes(pdf_dir=PDF_DIR):
+    return {path.name: file_sha256(path) for path in sorted(pdf_dir.glob("*.pdf"))}
+
+
+def pdf_fingerprint(hashes):
+    return compute_fingerprint(f"{name}\n{digest}" for name, digest in hashes.items())
+
+
+def _snapshot_paths():
+    """Relative Pfade der Ingestion-Ergebnisse, die in den Snapshot gehören"""
+    artifact = EmbeddingArtifact()
+    return [
+        artifact.matrix_path,
+        artifact.meta_path,
+        artifact.info_path,
+        SENTENCE_INDEX_FILE,
+        INGEST_MANIFEST_FILE,
+        CORPUS_STATE_FILE,
+        CHUNK_STORE_FILE,
+        Path("data/text"),
+    ]
+
+
+def _copy(source, target):
+    """Datei oder Ordner kopieren; bestehende Ziele werden ersetzt"""
+    target.parent.mkdir(parents=True, exist_ok=True)
+    if source.is_dir():
+        if target.exists():
+            shutil.rmtree(target)
+        shutil.copytree(source, target)
+    else:
+        shutil.copy2(source, target)
+
+
+def _clear_directory(directory):
+    """Inhalt leeren, Ordner behalten (kann ein Volume-Mountpoint sein)"""
+    directory.mkdir(parents=True, exist_ok=True)
+    for child in directory.iterdir():
+        if child.is_dir():
+            shutil.rmtree(child)
+        else:
+            child.unlink()
+
+
+def read_snapshot_info(snapshot_dir=SNAPSHOT_DIR):
+    try:
+        with open(snapshot_dir / "snapshot.json", "r", encoding="utf-8") as f:
+            info = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return info if info.get("version") == SNAPSHOT_VERSION else None
+
+
+def live_index_is_current(hashes):
+    """Passen Ingestion-Stand, Embeddings, Korpus-Zustand und ChromaDB-Daten zu den PDFs?"""
+    recorded = {name: entry.get("sha256") for name, entry in load_manifest().get("pdfs", {}).items()}
+    if recorded != hashes:
+        return False
+
+    artifact = EmbeddingArtifact()
+    if not artifact.exists() or not CHROMA_DATA_DIR.is_dir() or not any(CHROMA_DATA_DIR.iterdir()):
+        return False
+    if artifact.model_key() != embedding_model_key():
+        return False
+
+    keys = [document_key(entry["quelle"], entry["text"]) for entry in artifact.iter_records()]
+    return read_corpus_version() == corpus_fingerprint(keys, artifact.model_key())
+
+
+def build(snapshot_dir=SNAPSHOT_DIR):
+    """Komplette Pipeline ausführen und Ergebnis samt ChromaDB-Dateien als Snapshot ablegen"""
+    import chromadb
+    import import_to_chroma
+    import process_pdfs
+
+    started = time.time()
+    if not process_pdfs.main():
+        return False
+
+    staging = snapshot_dir.with_name(snapshot_dir.name + ".tmp")
+    if staging.exists():
+        shutil.rmtree(staging)
+
+    client = chromadb.PersistentClient(path=str(staging / "chroma_data"))
+    if not import_to_chroma.import_to_chromadb(client):
+        return False
+    del client
+
+    files = []
+    for path in _snapshot_paths():
+        if path.exists():
+            _copy(path, staging / path)
+            files.append(str(path))
+
+    hashes = pdf_hashes()
+    info = {
+        "version": SNAPSHOT_VERSION,
+        "pdf_fingerprint": pdf_fingerprint(hashes),
+        "pdfs": hashes,
+        "corpus_fingerprint": read_corpus_version(),
+        "embedding_model": EmbeddingArtifact().model_key(),
+        "documents": len(EmbeddingArtifact()),
+        "files": files,
+        "created_at": time.time(),
+    }
+    with open(staging / "snapshot.json", "w", encoding="utf-8") as f:
+        json.dump(info, f, ensure_ascii=False, indent=2)
+
+    if snapshot_dir.exists():
+        shutil.rmtree(snapshot_dir)
+    os.replace(staging, snapshot_dir)
+
+    print(f"📦 Snapshot {info['pdf_fingerprint']} erstellt: {info['documents']} Dokumente in {time.time() - started:.1f}s")
+    return True
+
+
+def restore(snapshot_dir=SNAPSHOT_DIR):
+    """Snapshot einspielen, falls er zu den PDFs passt. Vor dem Start des ChromaDB-Servers aufrufen."""
+    hashes = pdf_hashes()
+    fingerprint = pdf_fingerprint(hashes)
+
+    if live_index_is_current(hashes):
+        print(f"✅ Index aktuell ({fingerprint}) - kein Neuaufbau nötig")
+        return EXIT_READY
+
+    info = read_snapshot_info(snapshot_dir)
+    if info is None:
+        print("⚠️ Kein Index-Snapshot vorhanden - Neuaufbau nötig")
+        return EXIT_REBUILD
+
+    model_matches = info.get("embedding_model") == embedding_model_key()
+    matches = info["pdf_fingerprint"] == fingerprint and model_matches
+    if not matches and INGEST_MANIFEST_FILE.exists():
+        # Vorhandener Stand ist näher am aktuellen Korpus - inkrementell weiterbauen
+        if model_matches:
+            print(f"🔄 PDFs geändert ({fingerprint} ≠ Snapshot {info['pdf_fingerprint']}) - Neuaufbau nötig")
+        else:
+            print(f"🔄 Embedding-Model geändert ({embedding_model_key()} ≠ Snapshot {info.get('embedding_model')}) "
+                  f"- Neuaufbau nötig")
+        return EXIT_REBUILD
+
+    started = time.time()
+    _clear_directory(CHROMA_DATA_DIR)
+    for child in (snapshot_dir / "chroma_data").iterdir():
+        _copy(child, CHROMA_DATA_DIR / child.name)
+
+    # Korpus-Zustand zuletzt, damit laufende Prozesse erst den vollständigen Stand sehen
+    files = [Path(path) for path in info["files"]]
+    for path in sorted(files, key=lambda p: p == CORPUS_STATE_FILE):
+        _copy(snapshot_dir / path, path)
+
+    if matches:
+        print(f"⚡ Snapshot {fingerprint} wiederhergestellt: {info['documents']} Dokumente in {time.time() - started:.1f}s")
+        return EXIT_READY
+
+    # Snapshot als Ausgangsbasis: nur geänderte PDFs (bzw. bei anderem Model alle Embeddings) werden neu berechnet
+    print("🔄 PDFs oder Embedding-Model weichen vom Snapshot ab - Snapshot als Basis für inkrementellen Neuaufbau eingespielt")
+    return EXIT_REBUILD
+
+
+def status(snapshot_dir=SNAPSHOT_DIR):
+    hashes = pdf_hashes()
+    info = read_snapshot_info(snapshot_dir)
+    print(json.dumps({
+        "pdf_fingerprint": pdf_fingerprint(hashes),
+        "embedding_model": embedding_model_key(),
+        "snapshot": {key: info.get(key) for key in ("pdf_fingerprint", "embedding_model", "documents", "created_at")}
+        if info else None,
+        "live_index_current": live_index_is_current(hashes),
+    }, indent=2))
+    return EXIT_READY
+
+
+def main():
+    commands = {"build": lambda: EXIT_READY if build() else 1, "restore": restore, "status": status}
+    if len(sys.argv) != 2 or sys.argv[1] not in commands:
+        print(__doc__)
+        return 1
+    return commands[sys.argv[1]]()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
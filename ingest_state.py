@@ -0,0 +1,94 @@
+# ingest_state.py - Inkrementelle Ingestion: Datei-Hashes, Inhalts-IDs und Embedding-Wiederverwendung
+
+import hashlib
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+
+from corpus_state import document_key
+
+INGEST_MANIFEST_FILE = Path(os.getenv("INGEST_MANIFEST_FILE", "data/ingest_manifest.json"))
+
+
+def file_sha256(path, block_size=1 << 20):
+    """SHA-256 einer Datei, blockweise gelesen"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def text_sha256(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def chunk_content_id(source, text):
+    """Stabile Chunk-ID aus Quelle und Inhalt - gleicher Chunk, gleiche ID über alle Läufe"""
+    return hashlib.sha256(document_key(source, text).encode("utf-8")).hexdigest()[:32]
+
+
+def load_manifest(path=INGEST_MANIFEST_FILE):
+    """Hashes des letzten Laufs (leer, wenn noch keiner stattfand)"""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_manifest(manifest, path=INGEST_MANIFEST_FILE):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+
+def record_embedding_model(model_key, path=INGEST_MANIFEST_FILE):
+    """Herkunft der geschriebenen Embeddings im Manifest festhalten"""
+    manifest = load_manifest(path)
+    manifest["embedding_model"] = model_key
+    save_manifest(manifest, path)
+
+
+def build_embedding_matrix(records, artifact, encode, model_key):
+    """Embedding-Matrix für records; nur Chunks ohne vorhandenes Embedding werden kodiert.
+
+    encode(texts) wird nur aufgerufen, wenn neue Chunks existieren, und muss
+    ein (n, dim)-Array liefern. Rückgabe: (Matrix oder None, Anzahl neu kodierter
+    Chunks); None bedeutet, dass das bestehende Artefakt bereits aktuell ist.
+    Vektoren eines Artefakts mit anderem (oder unbekanntem) model_key werden
+    nicht wiederverwendet - dann wird alles neu kodiert.
+    """
+    existing_rows = {}
+    existing_records = []
+    matrix = None
+    if artifact.exists() and artifact.model_key() == model_key:
+        try:
+            matrix = artifact.matrix()
+            existing_records = artifact.records()
+            if len(existing_records) != matrix.shape[0]:
+                raise ValueError("Metadaten und Matrix sind nicht zeilengleich")
+            existing_rows = {record["id"]: row for row, record in enumerate(existing_records)}
+        except (OSError, ValueError):
+            matrix, existing_records, existing_rows = None, [], {}
+
+    missing = [i for i, record in enumerate(records) if record["id"] not in existing_rows]
+    if not missing and records == existing_records:
+        return None, 0
+
+    new_vectors = np.asarray(encode([records[i]["text"] for i in missing]), dtype=np.float32) if missing else None
+    dim = new_vectors.shape[1] if new_vectors is not None else matrix.shape[1]
+
+    embeddings = np.empty((len(records), dim), dtype=np.float32)
+    for i, record in enumerate(records):
+        row = existing_rows.get(record["id"])
+        if row is not None:
+            embeddings[i] = matrix[row]
+    if missing:
+        embeddings[missing] = new_vectors
+    return embeddings, len(missing)
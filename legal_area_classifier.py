@@ -0,0 +1,85 @@
+# legal_area_classifier.py - Rechtsbereich-Erkennung mit vorkompilierten Keyword-Mustern
+
+import json
+import os
+import re
+from pathlib import Path
+
+LEGAL_AREAS_CONFIG = Path(os.getenv("LEGAL_AREAS_CONFIG", Path(__file__).parent / "config" / "legal_areas.json"))
+
+# Erster Regex-Operator im Keyword - alles davor ist fester Text
+_REGEX_META = re.compile(r'[.^$*+?{}\[\]\\|()]')
+# Quantoren, die das Zeichen davor optional machen
+_OPTIONAL_QUANTIFIERS = "?*{"
+
+
+def _literal_prefix(keyword):
+    """Fester Text, den jeder Treffer von keyword enthält ("" = kein Vorfilter möglich)"""
+    if "|" in keyword:
+        # Alternativen haben kein gemeinsames Präfix
+        return ""
+    match = _REGEX_META.search(keyword)
+    if match is None:
+        return keyword
+    literal = keyword[:match.start()]
+    if match.group() in _OPTIONAL_QUANTIFIERS:
+        # "kündigungs?frist": das "s" darf fehlen, nur "kündigung" ist sicher enthalten
+        literal = literal[:-1]
+    return literal
+
+
+class LegalAreaClassifier:
+    """Bewertet Fragen anhand der Keyword-Tabellen aus config/legal_areas.json.
+
+    Alle Muster werden einmal kompiliert. Vor jedem Regex-Aufruf wird das
+    feste Präfix des Musters per Substring-Test geprüft; fehlt es, kann das
+    Muster nicht treffen und der Regex wird übersprungen. Ein Zeichen vor
+    ?, * oder {..} zählt nicht zum Präfix, Muster mit | werden nie übersprungen. Die Punkte sind
+    damit identisch zu je einem re.search(rf'\\b{kw}\\b', ...) pro Keyword.
+    """
+
+    def __init__(self, areas, weights=None, min_score=7, default_area="allgemein"):
+        weights = weights or {"primary": 10, "secondary": 3}
+        self.min_score = min_score
+        self.default_area = default_area
+
+        # Bereich -> [(Literal-Präfix, kompiliertes Muster, Punkte)]
+        self._rules = []
+        for area, keywords in areas.items():
+            rules = []
+            for tier in ("primary", "secondary"):
+                for keyword in keywords.get(tier, []):
+                    rules.append((_literal_prefix(keyword), re.compile(rf'\b{keyword}\b'), weights[tier]))
+            self._rules.append((area, rules))
+
+    @classmethod
+    def from_config(cls, path=LEGAL_AREAS_CONFIG):
+        with open(path, "r", encoding="utf-8") as f:
+            config = json.load(f)
+        return cls(
+            config["areas"],
+            weights=config.get("weights"),
+            min_score=config.get("min_score", 7),
+            default_area=config.get("default_area", "allgemein"),
+        )
+
+    def scores(self, question):
+        """Punkte pro Bereich (nur Bereiche mit Treffern, in Konfigurationsreihenfolge)"""
+        question_lower = question.lower()
+
+        scores = {}
+        for area, rules in self._rules:
+            score = 0
+            for literal, pattern, points in rules:
+                if literal in question_lower and pattern.search(question_lower):
+                    score += points
+            if score > 0:
+                scores[area] = score
+        return scores
+
+    def classify(self, question):
+        """Bester Bereich ab Mindestpunktzahl, sonst default_area"""
+        scores = self.scores(question)
+        if scores and max(scores.values()) >= self.min_score:
+            return max(scores, key=scores.get)
+        return self.default_area
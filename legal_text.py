@@ -0,0 +1,137 @@
+# legal_text.py - Satz-Aufbereitung für die Content-Extraktion (Ingestion und App)
+
+import json
+import os
+import re
+import threading
+from pathlib import Path
+
+SENTENCE_INDEX_FILE = Path(os.getenv("SENTENCE_INDEX_FILE", "data/sentence_index.jsonl"))
+
+MIN_SENTENCE_LENGTH = 50
+
+# Aggressive Bereinigung (Reihenfolge wie in der ursprünglichen Extraktion)
+_CLEANUP_RULES = [
+    (re.compile(r'BBl \d{4}.*?(?=\n|$)'), ''),
+    (re.compile(r'AS \d{4}.*?(?=\n|$)'), ''),
+    (re.compile(r'---.*?---'), ' '),
+    (re.compile(r'\n+'), ' '),
+    (re.compile(r'\s+'), ' '),
+]
+
+_SENTENCE_SPLIT = re.compile(r'[.!?]+')
+_TOKEN = re.compile(r'\w+')
+
+# STRENGE Anti-Fragment Filter
+FRAGMENT_PATTERNS = [
+    r'^\d+[a-z]*\s+\d+\s+[A-Z]',      # "17d 46 Der..."
+    r'^[A-Z][a-z]+.*\d+\s+[A-Z]',     # "Artikel 123 Der..."
+    r'aus gesundheitlichen Grün-',      # Abgeschnittene Wörter
+    r'hat der Arbeitneh-',             # Abgeschnittene Wörter
+    r'Zahlungsort.*bestimmt',          # Wechselrecht-Fragmente
+    r'gezogene.*[Ww]echsel',           # Wechselrecht
+    r'Bürg.*schaft.*je a',             # Bürgschaftsrecht-Fragment
+    r'Amtsdauer.*kann der',            # Bürgschaftsrecht
+    r'von dem am.*Zahltag',            # Lohn-Fragment
+    r'§\s*\d+.*BGB',                   # Deutsche Rechtsbegriffe
+]
+_FRAGMENT = re.compile('|'.join(f'(?:{pattern})' for pattern in FRAGMENT_PATTERNS))
+
+
+class PreparedSentence:
+    """Bereinigter Satz mit vorberechneter Kleinschreibung und Token-Menge"""
+
+    __slots__ = ("text", "lower", "tokens")
+
+    def __init__(self, text, tokens=None):
+        self.text = text
+        self.lower = text.lower()
+        self.tokens = frozenset(tokens if tokens is not None else _TOKEN.findall(self.lower))
+
+
+def clean_chunk_text(doc):
+    """Quellenverweise, Trenner und Zeilenumbrüche entfernen"""
+    cleaned = doc.strip()
+    for pattern, replacement in _CLEANUP_RULES:
+        cleaned = pattern.sub(replacement, cleaned)
+    return cleaned
+
+
+def prepare_sentences(doc):
+    """Chunk in Sätze teilen und Fragmente sowie zu kurze Sätze verwerfen"""
+    prepared = []
+    for sentence in _SENTENCE_SPLIT.split(clean_chunk_text(doc)):
+        sentence = sentence.strip()
+        if len(sentence) < MIN_SENTENCE_LENGTH:
+            continue
+        if _FRAGMENT.search(sentence):
+            continue
+        prepared.append(PreparedSentence(sentence))
+    return prepared
+
+
+def write_sentence_index(entries, path=SENTENCE_INDEX_FILE):
+    """Satz-Index für (chunk_id, text)-Paare schreiben - einmal pro Ingestion"""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(".tmp")
+
+    count = 0
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        for chunk_id, text in entries:
+            sentences = [[s.text, sorted(s.tokens)] for s in prepare_sentences(text)]
+            f.write(json.dumps({"id": chunk_id, "sentences": sentences}, ensure_ascii=False) + "\n")
+            count += 1
+
+    os.replace(tmp_path, path)
+    return count
+
+
+class SentenceIndex:
+    """Lädt den Satz-Index und liefert vorbereitete Sätze pro Chunk-ID.
+
+    Die Datei wird neu geladen, sobald die Ingestion sie ersetzt hat.
+    """
+
+    def __init__(self, path=SENTENCE_INDEX_FILE):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._mtime = None
+        self._sentences = {}
+
+    def _refresh(self):
+        try:
+            mtime = self.path.stat().st_mtime_ns
+        except OSError:
+            self._mtime = None
+            self._sentences = {}
+            return
+
+        if mtime == self._mtime:
+            return
+
+        sentences = {}
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                entry = json.loads(line)
+                sentences[entry["id"]] = [PreparedSentence(text, tokens) for text, tokens in entry["sentences"]]
+
+        self._sentences = sentences
+        self._mtime = mtime
+
+    def get(self, chunk_id):
+        """Vorbereitete Sätze oder None, wenn der Chunk nicht im Index ist"""
+        return self.get_many([chunk_id])[0]
+
+    def get_many(self, chunk_ids):
+        """Wie get(), aber mit nur einer Aktualitätsprüfung für alle IDs"""
+        with self._lock:
+            self._refresh()
+            return [self._sentences.get(chunk_id) for chunk_id in chunk_ids]
+
+    def __len__(self):
+        with self._lock:
+            self._refresh()
+            return len(self._sentences)
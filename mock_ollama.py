@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Mock Ollama server for testing backend routing without real models.
+
+Serves the two endpoints the app uses - GET /api/tags and POST /api/generate
+(stream true/false) - on one or more ports. Every port behaves like its own
+Ollama instance with a limited number of parallel generations, a configurable
+generation time and failure rate. The answer names the port that produced it,
+GET /mock/stats reports requests, errors and peak concurrency per instance.
+
+    python mock_ollama.py --ports 11501,11502,11503 --delay 2 --parallel 1
+    OLLAMA_HOST=localhost:11501,localhost:11502,localhost:11503 python app.py
+
+    python mock_ollama.py --ports 11502 --fail-rate 1    # a broken backend
+    python mock_ollama.py --ports 11502 --fail-after-tokens 3   # streams break off
+"""
+
+import argparse
+import json
+import random
+import socket
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ANSWER = ("Gemäss dem einschlägigen Gesetzesartikel gilt die beschriebene Regelung. "
+          "Diese Antwort stammt vom Mock-Backend auf Port {port} und dient nur zum Testen des Routings.")
+
+
+class MockInstance:
+    """State of one simulated Ollama instance"""
+
+    def __init__(self, port, args):
+        self.port = port
+        self.args = args
+        self.slots = threading.Semaphore(args.parallel)
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+        self.active = 0
+        self.peak = 0
+
+    def generate(self):
+        """Wait for a slot and the simulated generation time; None on a simulated failure"""
+        with self.lock:
+            self.requests += 1
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        try:
+            with self.slots:
+                time.sleep(max(0.0, self.args.delay + random.uniform(-self.args.jitter, self.args.jitter)))
+            if random.random() < self.args.fail_rate:
+                with self.lock:
+                    self.errors += 1
+                return None
+            return ANSWER.format(port=self.port)
+        finally:
+            with self.lock:
+                self.active -= 1
+
+    def stats(self):
+        with self.lock:
+            return {"port": self.port, "requests": self.requests, "errors": self.errors,
+                    "active": self.active, "peak": self.peak}
+
+
+def make_handler(instance):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            if instance.args.verbose:
+                super().log_message(format, *args)
+
+        def _send_json(self, payload, status=200):
+            body = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path == "/api/tags":
+                self._send_json({"models": [{"name": instance.args.model}]})
+            elif self.path == "/mock/stats":
+                self._send_json(instance.stats())
+            else:
+                self._send_json({"error": "not found"}, 404)
+
+        def do_POST(self):
+            if self.path != "/api/generate":
+                self._send_json({"error": "not found"}, 404)
+                return
+            request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            answer = instance.generate()
+            if answer is None:
+                self._send_json({"error": "simulated failure"}, 500)
+                return
+            fail_after = instance.args.fail_after_tokens
+            if not request.get("stream", True):
+                if fail_after is not None:
+                    self._send_json({"error": "simulated failure"}, 500)
+                    return
+                self._send_json({"model": request.get("model"), "response": answer, "done": True})
+                return
+
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            for i, token in enumerate(answer.split(" ")):
+                if fail_after is not None and i >= fail_after:
+                    # Connection drops mid-stream, without the terminating chunk
+                    self.close_connection = True
+                    self.wfile.flush()
+                    self.connection.shutdown(socket.SHUT_RDWR)
+                    return
+                self._write_chunk({"response": token + " ", "done": False})
+            self._write_chunk({"response": "", "done": True})
+            self.wfile.write(b"0\r\n\r\n")
+
+        def _write_chunk(self, payload):
+            data = json.dumps(payload).encode() + b"\n"
+            self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+
+    return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--ports", default="11434", help="comma-separated ports, one instance each")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--model", default="llama3.2:3b")
+    parser.add_argument("--delay", type=float, default=1.0, help="seconds per generation")
+    parser.add_argument("--jitter", type=float, default=0.0, help="+/- seconds added to the delay")
+    parser.add_argument("--parallel", type=int, default=1, help="parallel generations per instance")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="share of generations answered with HTTP 500")
+    parser.add_argument("--fail-after-tokens", type=int, help="break every stream off after N tokens "
+                                                                  "(non-streaming requests get HTTP 500)")
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    servers = []
+    for port in (int(port) for port in args.ports.split(",")):
+        server = ThreadingHTTPServer((args.host, port), make_handler(MockInstance(port, args)))
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        print(f"🦙 mock Ollama on http://{args.host}:{port} ({args.delay}s, {args.parallel} parallel, "
+              f"fail rate {args.fail_rate})")
+
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        for server in servers:
+            server.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
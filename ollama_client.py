@@ -0,0 +1,369 @@
+# ollama_client.py - Ollama-Verfügbarkeit: Hintergrund-Monitor und Circuit Breaker
+
+import asyncio
+import json
+import logging
+import threading
+import time
+from collections import deque
+
+import numpy as np
+import requests
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitBreaker:
+    """Öffnet nach wiederholten Generierungsfehlern, schliesst wieder nach Cooldown"""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold=3, cooldown=30.0):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_started_at = None
+
+    @property
+    def state(self):
+        with self._lock:
+            self._maybe_half_open()
+            return self._state
+
+    def _maybe_half_open(self):
+        if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.cooldown:
+            self._state = self.HALF_OPEN
+            self._trial_started_at = None
+
+    def allow_request(self):
+        """Im Zustand half_open wird ein Versuchsaufruf pro Cooldown durchgelassen"""
+        with self._lock:
+            self._maybe_half_open()
+            if self._state == self.CLOSED:
+                return True
+            if self._state == self.HALF_OPEN:
+                now = time.monotonic()
+                if self._trial_started_at is None or now - self._trial_started_at >= self.cooldown:
+                    self._trial_started_at = now
+                    return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            if self._state != self.CLOSED:
+                logger.info("🟢 Ollama Circuit Breaker geschlossen")
+            self._state = self.CLOSED
+            self._failures = 0
+            self._trial_started_at = None
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._trial_started_at = None
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != self.OPEN:
+                    logger.warning(f"🔴 Ollama Circuit Breaker offen für {self.cooldown:.0f}s "
+                                   f"({self._failures} Fehler)")
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+
+    def stats(self):
+        with self._lock:
+            self._maybe_half_open()
+            return {"state": self._state, "consecutive_failures": self._failures}
+
+
+class OllamaMonitor:
+    """Prüft Ollama periodisch über /api/tags und veröffentlicht den Status"""
+
+    def __init__(self, base_url, model, interval=15.0, timeout=3.0, breaker=None):
+        self.base_url = base_url
+        self.model = model
+        self.interval = interval
+        self.timeout = timeout
+        self.breaker = breaker or CircuitBreaker()
+
+        self._session = requests.Session()
+        self._stop = threading.Event()
+        self._thread = None
+        self._reachable = False
+        self._last_check = None
+        self._last_error = None
+
+    def probe(self):
+        """Günstiger Check: Server erreichbar und Modell installiert (keine Generierung)"""
+        try:
+            response = self._session.get(f"{self.base_url}/api/tags", timeout=self.timeout)
+            response.raise_for_status()
+            models = [m.get("name", "") for m in response.json().get("models", [])]
+            reachable = any(name == self.model or name.startswith(f"{self.model}:") for name in models)
+            error = None if reachable else f"Modell {self.model} nicht installiert"
+        except Exception as e:
+            reachable = False
+            error = str(e)
+
+        if reachable != self._reachable:
+            if reachable:
+                logger.info(f"🦙 Ollama erreichbar: {self.base_url}")
+            else:
+                logger.warning(f"🦙 Ollama nicht erreichbar: {error}")
+
+        self._reachable = reachable
+        self._last_error = error
+        self._last_check = time.time()
+        return reachable
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.probe()
+            self._stop.wait(self.interval)
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="ollama-monitor", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    @property
+    def reachable(self):
+        return self._reachable
+
+    def is_available(self):
+        """Gecachter Status für /answer - löst selbst keinen Request aus"""
+        return self._reachable and self.breaker.allow_request()
+
+    def stats(self):
+        return {
+            "reachable": self._reachable,
+            "last_check": self._last_check,
+            "last_error": self._last_error,
+            "circuit": self.breaker.stats(),
+        }
+
+
+def parse_ollama_hosts(value):
+    """OLLAMA_HOST: ein Host oder kommagetrennte Liste ("a:11434,b:11434"), mit oder ohne http://"""
+    hosts = [host.strip().rstrip("/") for host in value.split(",") if host.strip()]
+    return [host if "://" in host else f"http://{host}" for host in hosts]
+
+
+class OllamaBackend:
+    """Eine Ollama-Instanz im Pool: eigener Monitor, Circuit Breaker und Statistik"""
+
+    def __init__(self, base_url, model, interval=15.0, breaker=None):
+        self.base_url = base_url
+        self.monitor = OllamaMonitor(base_url, model, interval=interval, breaker=breaker)
+
+        self.outstanding = 0
+        self.requests = 0
+        self.errors = 0
+        self._latency_ms = deque(maxlen=500)
+
+    @property
+    def breaker(self):
+        return self.monitor.breaker
+
+    def usable(self):
+        """Erreichbar und Breaker nicht offen (ohne einen Half-Open-Versuch zu verbrauchen)"""
+        return self.monitor.reachable and self.breaker.state != CircuitBreaker.OPEN
+
+    def stats(self):
+        latencies = np.asarray(self._latency_ms) if self._latency_ms else np.zeros(1)
+        return {
+            "outstanding": self.outstanding,
+            "requests": self.requests,
+            "errors": self.errors,
+            "error_rate": round(self.errors / self.requests, 3) if self.requests else 0.0,
+            "latency_ms_p50": round(float(np.percentile(latencies, 50)), 1),
+            "latency_ms_p95": round(float(np.percentile(latencies, 95)), 1),
+            **self.monitor.stats(),
+        }
+
+
+class OllamaPool:
+    """Mehrere Ollama-Instanzen: Anfragen gehen an das Backend mit den wenigsten offenen Requests.
+
+    Jedes Backend hat eigenen Monitor und Circuit Breaker. acquire() wählt
+    unter den erreichbaren Backends mit nicht offenem Breaker; finish()
+    verbucht Ergebnis und Latenz. Mit einem einzigen Backend verhält sich
+    der Pool wie der bisherige OllamaMonitor.
+    """
+
+    def __init__(self, base_urls, model, interval=15.0, breaker_threshold=3, breaker_cooldown=30.0):
+        self.backends = [
+            OllamaBackend(url, model, interval=interval,
+                          breaker=CircuitBreaker(failure_threshold=breaker_threshold, cooldown=breaker_cooldown))
+            for url in base_urls
+        ]
+        self._lock = threading.Lock()
+        self._retries = 0
+
+    def start(self):
+        for backend in self.backends:
+            backend.monitor.start()
+
+    def stop(self):
+        for backend in self.backends:
+            backend.monitor.stop()
+
+    @property
+    def reachable(self):
+        return any(backend.monitor.reachable for backend in self.backends)
+
+    def is_available(self):
+        """Gecachter Status für /answer: mindestens ein Backend nutzbar - löst selbst keinen Request aus"""
+        return any(backend.usable() for backend in self.backends)
+
+    @property
+    def state(self):
+        """Zusammengefasster Breaker-Zustand: closed, sobald ein Backend geschlossen ist"""
+        states = {backend.breaker.state for backend in self.backends}
+        for state in (CircuitBreaker.CLOSED, CircuitBreaker.HALF_OPEN):
+            if state in states:
+                return state
+        return CircuitBreaker.OPEN
+
+    def acquire(self, exclude=()):
+        """Backend mit den wenigsten offenen Requests (bei Gleichstand: bisher am wenigsten genutzt), sonst None"""
+        with self._lock:
+            candidates = sorted(
+                (backend for backend in self.backends if backend not in exclude and backend.usable()),
+                key=lambda backend: (backend.outstanding, backend.requests),
+            )
+            for backend in candidates:
+                if backend.breaker.allow_request():
+                    backend.outstanding += 1
+                    backend.requests += 1
+                    if exclude:
+                        self._retries += 1
+                    return backend
+        return None
+
+    def finish(self, backend, success, latency_ms=None):
+        """Request abschliessen: success True/False geht in den Breaker, None (abgebrochen) nicht"""
+        with self._lock:
+            backend.outstanding -= 1
+            if success is False:
+                backend.errors += 1
+            elif success and latency_ms is not None:
+                backend._latency_ms.append(latency_ms)
+        if success:
+            backend.breaker.record_success()
+        elif success is False:
+            backend.breaker.record_failure()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "reachable": self.reachable,
+                "circuit": self.state,
+                "retries": self._retries,
+                "backends": {backend.base_url: backend.stats() for backend in self.backends},
+            }
+
+
+def stream_ollama_generate(base_url, model, prompt, options, timeout=60, session=None):
+    """Tokens von /api/generate mit stream=True liefern, sobald Ollama sie erzeugt"""
+    http = session or requests
+    response = http.post(
+        f"{base_url}/api/generate",
+        json={
+            "model": model,
+            "prompt": prompt,
+            "stream": True,
+            "options": options
+        },
+        stream=True,
+        timeout=timeout
+    )
+
+    try:
+        response.raise_for_status()
+        for line in response.iter_lines():
+            if not line:
+                continue
+            chunk = json.loads(line)
+            if chunk.get("error"):
+                raise RuntimeError(chunk["error"])
+            token = chunk.get("response", "")
+            if token:
+                yield token
+            if chunk.get("done"):
+                break
+    finally:
+        response.close()
+
+
+class AsyncOllamaClient:
+    """Nicht-blockierender Ollama-Client für die asyncio-Pipeline.
+
+    Ein httpx.AsyncClient pro Event-Loop hält einen Pool von Keep-Alive-
+    Verbindungen zu allen Backends; wartende Generierungen belegen nur
+    Coroutinen, keine Threads. Mehr als max_connections gleichzeitige
+    Requests warten im Pool.
+    """
+
+    def __init__(self, model, timeout=60.0, max_connections=32):
+        self.model = model
+        self.timeout = timeout
+        self.max_connections = max_connections
+
+        self._client = None
+        self._loop = None
+        self._in_flight = 0
+        self._max_in_flight = 0
+        self._requests = 0
+
+    def _get_client(self):
+        import httpx
+
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._loop is not loop:
+            # Verbindungen gehören zum Loop, in dem sie geöffnet wurden (z.B. nach fork)
+            self._client = httpx.AsyncClient(
+                timeout=self.timeout,
+                limits=httpx.Limits(max_connections=self.max_connections,
+                                    max_keepalive_connections=self.max_connections),
+            )
+            self._loop = loop
+        return self._client
+
+    async def generate(self, base_url, prompt, options):
+        """Antworttext von /api/generate mit stream=False; Exception bei HTTP- oder Verbindungsfehler"""
+        client = self._get_client()
+        self._requests += 1
+        self._in_flight += 1
+        self._max_in_flight = max(self._max_in_flight, self._in_flight)
+        try:
+            response = await client.post(f"{base_url}/api/generate", json={
+                "model": self.model,
+                "prompt": prompt,
+                "stream": False,
+                "options": options
+            })
+            response.raise_for_status()
+            return response.json().get("response", "")
+        finally:
+            self._in_flight -= 1
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def stats(self):
+        return {
+            "requests": self._requests,
+            "in_flight": self._in_flight,  # inkl. Requests, die auf eine freie Verbindung warten
+            "max_in_flight": self._max_in_flight,
+            "max_connections": self.max_connections,
+        }
@@ -5,15 +5,42 @@ Simple but effective chunking for legal texts
 """
 
 import os
-import json
-import uuid
 import fitz  # PyMuPDF
 import re
-from pathlib import Path
-from sentence_transformers import SentenceTransformer
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from chunk_store import ChunkStore, annotate_chunks
+from embedding_backend import EMBEDDING_MODEL
+from embedding_runner import EmbeddingRunner, TokenCounter, load_tokenizer
+from embedding_store import EmbeddingArtifact, write_embedding_artifact
+from ingest_state import build_embedding_matrix, chunk_content_id, file_sha256, load_manifest, record_embedding_model, save_manifest
+
+PAGES_PER_TASK = int(os.getenv("EXTRACT_PAGES_PER_TASK", "100"))  # large codes are split into page ranges
+EXTRACT_WORKERS = int(os.getenv("EXTRACT_WORKERS", str(os.cpu_count() or 1)))
+
+CHUNKING_MODE = os.getenv("CHUNKING_MODE", "words")                   # "words" or "tokens"
+CHUNK_MAX_TOKENS = int(os.getenv("CHUNK_MAX_TOKENS", "256"))           # model max_seq_length incl. [CLS]/[SEP]
+CHUNK_TOKEN_OVERLAP = int(os.getenv("CHUNK_TOKEN_OVERLAP", "32"))
+
+def extract_page_range(pdf_path, start, stop):
+    """Worker: text parts of pages [start, stop) plus the time it took"""
+    started = time.perf_counter()
+    parts = []
+    with fitz.open(pdf_path) as doc:
+        for page_num in range(start, stop):
+            parts.append(f"\n--- Seite {page_num + 1} ---\n")
+            parts.append(doc[page_num].get_text())
+    return parts, time.perf_counter() - started
+
+def write_text_atomically(path, parts):
+    """Join page texts once and replace the target file in one step"""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write("".join(parts))
+    os.replace(tmp_path, path)
 
 def extract_text_from_pdfs():
-    """Extract text from PDFs"""
+    """Extract text from PDFs in a process pool (unchanged PDFs keep their extracted text)"""
     print("🔤 Extracting text from PDFs...")
     
     input_folder = "data"
@@ -25,28 +52,85 @@ def extract_text_from_pdfs():
         print("❌ No PDF files found!")
         return False
     
+    manifest = load_manifest()
+    pdf_state = manifest.setdefault("pdfs", {})
+    
+    # Drop text of PDFs that were removed since the last run
+    for filename in list(pdf_state):
+        if filename not in pdf_files:
+            txt_path = os.path.join(output_folder, filename.replace(".pdf", ".txt"))
+            if os.path.exists(txt_path):
+                os.remove(txt_path)
+            del pdf_state[filename]
+            print(f"🗑️ Removed: {filename}")
+    
+    # One task per page range: small PDFs are a single task, large codes are split
+    pending = {}
+    tasks = []
     for filename in pdf_files:
         pdf_path = os.path.join(input_folder, filename)
-        print(f"📄 Processing: {filename}")
+        txt_path = os.path.join(output_folder, filename.replace(".pdf", ".txt"))
+        
+        digest = file_sha256(pdf_path)
+        if pdf_state.get(filename, {}).get("sha256") == digest and os.path.exists(txt_path):
+            print(f"♻️ Unchanged: {filename}")
+            continue
         
         try:
-            doc = fitz.open(pdf_path)
-            full_text = ""
-            for page_num, page in enumerate(doc, start=1):
-                full_text += f"\n--- Seite {page_num} ---\n"
-                full_text += page.get_text()
-            doc.close()
-            
-            txt_filename = filename.replace(".pdf", ".txt")
-            txt_path = os.path.join(output_folder, txt_filename)
-            with open(txt_path, "w", encoding="utf-8") as f:
-                f.write(full_text)
-            
-            print(f"✅ {filename} → {txt_filename}")
-            
+            with fitz.open(pdf_path) as doc:
+                page_count = doc.page_count
         except Exception as e:
+            pdf_state.pop(filename, None)
             print(f"❌ Error processing {filename}: {e}")
+            continue
+        
+        ranges = [(start, min(start + PAGES_PER_TASK, page_count)) for start in range(0, page_count, PAGES_PER_TASK)]
+        pending[filename] = {"digest": digest, "txt_path": txt_path, "pages": page_count,
+                             "parts": [None] * len(ranges), "seconds": 0.0, "failed": False}
+        tasks.extend((filename, pdf_path, index, start, stop) for index, (start, stop) in enumerate(ranges))
+        print(f"📄 Processing: {filename} ({page_count} pages, {len(ranges)} tasks)")
+    
+    if tasks:
+        started = time.perf_counter()
+        workers = max(1, min(EXTRACT_WORKERS, len(tasks)))
+        
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(extract_page_range, pdf_path, start, stop): (filename, index)
+                       for filename, pdf_path, index, start, stop in tasks}
+            
+            for future in as_completed(futures):
+                filename, index = futures[future]
+                state = pending[filename]
+                try:
+                    state["parts"][index], seconds = future.result()
+                    state["seconds"] += seconds
+                except Exception as e:
+                    if not state["failed"]:
+                        print(f"❌ Error processing {filename}: {e}")
+                    state["failed"] = True
+                    continue
+                
+                if state["failed"] or any(part is None for part in state["parts"]):
+                    continue
+                
+                write_text_atomically(state["txt_path"], [text for part in state["parts"] for text in part])
+                
+                # New hash invalidates the recorded chunking of this document
+                pdf_state[filename] = {"sha256": state["digest"]}
+                pages_per_second = state["pages"] / state["seconds"] if state["seconds"] else 0.0
+                print(f"✅ {filename} → {os.path.basename(state['txt_path'])} "
+                      f"({state['pages']} pages, {pages_per_second:.0f} pages/s)")
+        
+        for filename, state in pending.items():
+            if state["failed"]:
+                pdf_state.pop(filename, None)
+        
+        elapsed = time.perf_counter() - started
+        total_pages = sum(state["pages"] for state in pending.values() if not state["failed"])
+        print(f"⏱️ Extracted {total_pages} pages in {elapsed:.1f}s with {workers} workers "
+              f"({total_pages / elapsed if elapsed else 0.0:.0f} pages/s)")
     
+    save_manifest(manifest)
     return True
 
 def clean_text_for_chunking(text):
@@ -72,174 +156,260 @@ def clean_text_for_chunking(text):
     
     return cleaned.strip()
 
-def create_smart_chunks():
-    """Create smart chunks that respect legal structure"""
-    print("✂️ Creating smart legal chunks...")
-    
-    input_folder = "data/text"
-    output_folder = "data/chunks"
-    os.makedirs(output_folder, exist_ok=True)
+ARTICLE_PATTERN = re.compile(r'(Art\.\s*\d+[a-z]*[.\s]*)', re.IGNORECASE)
+
+def iter_article_parts(text):
+    """Stream the pieces of re.split(ARTICLE_PATTERN, text): text, heading, text, ..."""
+    position = 0
+    for match in ARTICLE_PATTERN.finditer(text):
+        yield text[position:match.start()]
+        yield match.group(1)
+        position = match.end()
+    yield text[position:]
+
+def _is_good_chunk(chunk, word_count):
+    """Filter out chunks that are too short or mostly references"""
+    return (len(chunk) > 80 and
+            word_count > 15 and
+            not chunk.startswith(('---', 'Seite', 'BBl', 'AS')))
+
+def iter_smart_chunks(text, target_size=350, overlap=60):
+    """Smart splitting that respects legal structure.
     
-    target_size = 350  # words
-    overlap = 60       # words
+    Article parts are consumed as a stream with a running word count, so
+    every part is split into words once and each chunk is joined once.
+    """
+    current_parts = []   # stripped parts of the chunk being built
+    current_words = 0
     
-    def split_text_smartly(text, target_size=350, overlap=60):
-        """Smart splitting that respects legal structure"""
+    for part in iter_article_parts(clean_text_for_chunking(text)):
+        part = part.strip()
+        if not part:
+            continue
         
-        chunks = []
-        text = clean_text_for_chunking(text)
+        part_words = part.split()
         
-        # Try to split by articles first
-        article_pattern = r'(Art\.\s*\d+[a-z]*[.\s]*)'
-        parts = re.split(article_pattern, text, flags=re.IGNORECASE)
+        # Check if adding this part would exceed target size
+        if current_words + len(part_words) <= target_size:
+            current_parts.append(part)
+            current_words += len(part_words)
+            continue
         
-        current_chunk = ""
+        # Save current chunk if it's substantial
+        if current_words > 50:
+            chunk = " ".join(current_parts)
+            if _is_good_chunk(chunk, current_words):
+                yield chunk
         
-        for part in parts:
-            part = part.strip()
-            if not part:
-                continue
-            
-            # Check if adding this part would exceed target size
-            potential_chunk = current_chunk + " " + part
-            word_count = len(potential_chunk.split())
-            
-            if word_count <= target_size:
-                current_chunk = potential_chunk
-            else:
-                # Save current chunk if it's substantial
-                if len(current_chunk.split()) > 50:
-                    chunks.append(current_chunk.strip())
-                
-                # Start new chunk
-                if len(part.split()) > target_size:
-                    # Split large parts into smaller chunks
-                    words = part.split()
-                    for i in range(0, len(words), target_size - overlap):
-                        chunk_words = words[i:i + target_size]
-                        chunk_text = " ".join(chunk_words)
-                        if len(chunk_text) > 100:  # Minimum length
-                            chunks.append(chunk_text)
-                    current_chunk = ""
-                else:
-                    current_chunk = part
+        # Start new chunk
+        if len(part_words) > target_size:
+            # Split large parts into smaller chunks
+            for i in range(0, len(part_words), target_size - overlap):
+                chunk_words = part_words[i:i + target_size]
+                chunk = " ".join(chunk_words)
+                if len(chunk) > 100 and _is_good_chunk(chunk, len(chunk_words)):  # Minimum length
+                    yield chunk
+            current_parts, current_words = [], 0
+        else:
+            current_parts, current_words = [part], len(part_words)
+    
+    # Add the last chunk
+    if current_parts and current_words > 20:
+        chunk = " ".join(current_parts)
+        if _is_good_chunk(chunk, current_words):
+            yield chunk
+
+def iter_article_units(text):
+    """Article heading together with its body; text before the first heading is its own unit"""
+    parts = iter_article_parts(clean_text_for_chunking(text))
+    unit = next(parts).strip()
+    for heading in parts:
+        if unit:
+            yield unit
+        unit = f"{heading.strip()} {next(parts).strip()}".strip()
+    if unit:
+        yield unit
+
+def _token_windows(counts, budget, overlap):
+    """(start, stop) word ranges of at most budget tokens, consecutive windows share ~overlap tokens"""
+    start = 0
+    while start < len(counts):
+        stop, tokens = start, 0
+        while stop < len(counts) and (stop == start or tokens + counts[stop] <= budget):
+            tokens += counts[stop]
+            stop += 1
+        yield start, stop
+        if stop == len(counts):
+            return
         
-        # Add the last chunk
-        if current_chunk.strip() and len(current_chunk.split()) > 20:
-            chunks.append(current_chunk.strip())
+        # Step back from the end until the overlap budget is used up (always make progress)
+        next_start, shared = stop, 0
+        while next_start - 1 > start and shared + counts[next_start - 1] <= overlap:
+            next_start -= 1
+            shared += counts[next_start]
+        start = next_start
+
+def iter_token_chunks(text, counter, max_tokens=CHUNK_MAX_TOKENS, overlap=CHUNK_TOKEN_OVERLAP):
+    """Chunks that fit the model's sequence length, measured with its tokenizer.
+    
+    Whole articles are packed into a chunk while they fit. An article that is
+    longer than the budget is split into token windows with overlap; its last
+    window stays open so the following short articles can still join it.
+    Chunks never start in the middle of an article unless it had to be split.
+    """
+    budget = max_tokens - counter.special_tokens
+    current_words, current_counts = [], []
+    
+    def flush():
+        if current_words:
+            chunk = " ".join(current_words)
+            if _is_good_chunk(chunk, len(current_words)):
+                yield chunk
+    
+    for unit in iter_article_units(text):
+        words = unit.split()
+        counts = counter.count_words(words)
+        
+        if sum(current_counts) + sum(counts) <= budget:
+            current_words += words
+            current_counts += counts
+            continue
         
-        # Filter out chunks that are too short or mostly references
-        good_chunks = []
-        for chunk in chunks:
-            if (len(chunk) > 80 and 
-                len(chunk.split()) > 15 and
-                not chunk.strip().startswith(('---', 'Seite', 'BBl', 'AS'))):
-                good_chunks.append(chunk)
+        yield from flush()
         
-        return good_chunks
+        windows = list(_token_windows(counts, budget, overlap))
+        for start, stop in windows[:-1]:
+            chunk = " ".join(words[start:stop])
+            if _is_good_chunk(chunk, stop - start):
+                yield chunk
+        start, stop = windows[-1]
+        current_words, current_counts = words[start:stop], counts[start:stop]
+    
+    yield from flush()
+
+def create_smart_chunks():
+    """Create smart chunks that respect legal structure (stored in the chunk store)"""
+    print("✂️ Creating smart legal chunks...")
+    
+    input_folder = "data/text"
+    store = ChunkStore()
+    
+    target_size = 350  # words
+    overlap = 60       # words
+    
+    if CHUNKING_MODE == "tokens":
+        chunking = f"tokens:{CHUNK_MAX_TOKENS}/{CHUNK_TOKEN_OVERLAP}:{EMBEDDING_MODEL}"
+        counter = None
+        
+        def chunker(text):
+            # Tokenizer is only loaded when a document actually needs chunking
+            nonlocal counter
+            if counter is None:
+                counter = TokenCounter(load_tokenizer())
+            return iter_token_chunks(text, counter, CHUNK_MAX_TOKENS, CHUNK_TOKEN_OVERLAP)
+    else:
+        chunking = f"{target_size}/{overlap}"
+        chunker = lambda text: iter_smart_chunks(text, target_size, overlap)
     
     txt_files = [f for f in os.listdir(input_folder) if f.endswith('.txt')]
     if not txt_files:
         print("❌ No text files found!")
         return False
     
+    manifest = load_manifest()
+    pdf_state = manifest.setdefault("pdfs", {})
+    
+    # Drop chunks of documents that no longer exist
+    base_names = {filename.replace(".txt", "") for filename in txt_files}
+    for source in store.sources():
+        if source not in base_names:
+            store.delete_document(source)
+    
     total_chunks = 0
     for filename in txt_files:
         input_path = os.path.join(input_folder, filename)
+        base_name = filename.replace(".txt", "")
+        existing_count = store.count(base_name)
+        
+        # Same PDF hash and chunking parameters → stored chunks are still valid
+        state = pdf_state.get(f"{base_name}.pdf")
+        if (state and state.get("chunking") == chunking and existing_count
+                and state.get("chunk_count") == existing_count):
+            total_chunks += existing_count
+            print(f"♻️ Unchanged: {filename} ({existing_count} chunks)")
+            continue
+        
         print(f"✂️ Smart chunking: {filename}")
         
         with open(input_path, "r", encoding="utf-8") as f:
             full_text = f.read()
         
-        chunks = split_text_smartly(full_text, target_size, overlap)
+        chunks = list(chunker(full_text))
         
-        base_name = filename.replace(".txt", "")
-        for i, chunk in enumerate(chunks):
-            chunk_filename = f"{base_name}_chunk_{i+1:03d}.txt"
-            chunk_path = os.path.join(output_folder, chunk_filename)
-            with open(chunk_path, "w", encoding="utf-8") as cf:
-                cf.write(chunk)
+        # Article, page range and word offset per chunk, replaced in one transaction
+        store.replace_document(base_name, annotate_chunks(full_text, chunks))
+        
+        if state is not None:
+            state.update({"chunking": chunking, "chunk_count": len(chunks)})
         
         total_chunks += len(chunks)
         print(f"✅ {filename} → {len(chunks)} smart chunks")
     
+    save_manifest(manifest)
     print(f"✂️ Smart chunking completed: {total_chunks} quality chunks")
     return True
 
 def create_embeddings():
-    """Create embeddings with HuggingFace model"""
+    """Create embeddings with HuggingFace model (only for new or changed chunks)"""
     print("🧠 Creating embeddings...")
     
-    model_name = "sentence-transformers/all-MiniLM-L6-v2"
-    print(f"🤗 Loading model: {model_name}")
-    
-    try:
-        model = SentenceTransformer(model_name)
-        print("✅ Model loaded successfully!")
-    except Exception as e:
-        print(f"❌ Error loading model: {e}")
-        return False
-    
-    chunks_dir = Path("data/chunks")
-    chunk_files = sorted(list(chunks_dir.glob("*.txt")))
-    
-    if not chunk_files:
-        print("❌ No chunk files found!")
+    store = ChunkStore()
+    if not store.count():
+        print("❌ No chunks found!")
         return False
     
-    texts = []
-    file_info = []
+    records = []
+    seen_ids = set()
     
-    print(f"📊 Processing {len(chunk_files)} chunk files...")
+    print(f"📊 Processing {store.count()} chunks...")
     
-    for chunk_path in chunk_files:
-        with open(chunk_path, "r", encoding="utf-8") as f:
-            text = f.read().strip()
+    for chunk in store.iter_chunks():
+        text = chunk["text"].strip()
         
         if len(text) > 50:  # Only substantial chunks
-            texts.append(text)
-            
-            filename = chunk_path.name
-            parts = filename.replace(".txt", "").split("_chunk_")
-            quelle = parts[0] if len(parts) > 1 else "unknown"
-            chunk_id = parts[1] if len(parts) > 1 else "0"
+            # Content-derived ID: unchanged chunks keep their ID (and embedding) across runs
+            content_id = chunk_content_id(chunk["quelle"], text)
+            if content_id in seen_ids:
+                continue
+            seen_ids.add(content_id)
             
-            file_info.append({
-                "filename": filename,
-                "quelle": quelle,
-                "chunk_id": chunk_id
-            })
+            records.append({**chunk, "id": content_id, "text": text})
     
-    print(f"📊 Creating embeddings for {len(texts)} chunks...")
+    # Length-sorted shards with checkpoint; the model is only loaded if something is missing
+    runner = EmbeddingRunner(EMBEDDING_MODEL)
     
     try:
-        # Create embeddings efficiently
-        embeddings = model.encode(
-            texts,
-            show_progress_bar=True,
-            convert_to_numpy=True,
-            batch_size=32
-        )
+        # Reuse embeddings of unchanged chunks from the previous artifact
+        artifact = EmbeddingArtifact()
+        if artifact.exists() and artifact.model_key() != runner.model_key:
+            # Never mix vectors of different models or backends (torch / onnx-fp32 / onnx-int8)
+            print(f"🔄 Embeddings were built with {artifact.model_key() or 'unknown model'}, "
+                  f"now {runner.model_key} - re-embedding all chunks")
+        embeddings, encoded = build_embedding_matrix(records, artifact, runner.encode, runner.model_key)
         
-        # Prepare data structure
-        embeddings_data = []
-        for text, embedding, info in zip(texts, embeddings, file_info):
-            embeddings_data.append({
-                "id": str(uuid.uuid4()),
-                "text": text,
-                "quelle": info["quelle"],
-                "chunk_id": info["chunk_id"],
-                "filename": info["filename"],
-                "embedding": embedding.tolist()
-            })
+        if embeddings is None:
+            print(f"♻️ Embeddings up to date: {len(records)} items")
+            record_embedding_model(runner.model_key)
+            runner.clear()
+            return True
         
-        # Save embeddings
-        embeddings_file = "data/embeddings_hf.json"
-        with open(embeddings_file, "w", encoding="utf-8") as f:
-            json.dump(embeddings_data, f, ensure_ascii=False, indent=2)
+        # Save embeddings as binary matrix + row-aligned metadata
+        write_embedding_artifact(records, embeddings, artifact.matrix_path, model_key=runner.model_key)
+        record_embedding_model(runner.model_key)
+        runner.clear()
         
-        print(f"💾 Embeddings saved: {len(embeddings_data)} items")
-        print(f"📁 File: {embeddings_file}")
+        print(f"💾 Embeddings saved: {len(records)} items ({encoded} new, {len(records) - encoded} reused)")
+        print(f"📁 Files: {artifact.matrix_path}, {artifact.meta_path}")
         return True
         
     except Exception as e:
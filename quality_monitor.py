@@ -1,30 +1,46 @@
 # quality_monitor.py - Working Quality Monitor
 
 import json
+import os
 import re
 import time
+from collections import Counter
 from datetime import datetime
 from pathlib import Path
 
 class AnswerQualityMonitor:
-    """Simple but effective quality monitor"""
+    """Simple but effective quality monitor
     
-    def __init__(self):
+    The log is rotated to answer_quality.jsonl.1 once it exceeds max_bytes
+    (0 = never), so readers like most_frequent_questions stay bounded.
+    """
+    
+    def __init__(self, max_bytes=0):
         self.log_file = Path("logs/answer_quality.jsonl")
+        self.backup_file = self.log_file.with_name(self.log_file.name + ".1")
         self.log_file.parent.mkdir(exist_ok=True)
+        self.max_bytes = max_bytes
     
-    def log_answer_quality(self, question, answer_data, retrieval_data):
-        """Log quality data"""
+    def log_answer_quality(self, question, answer_data, retrieval_data, cached=False):
+        """Log quality data; cached answers carry no retrieval data (retrieval fields are None)"""
+        
+        if cached:
+            retrieval = {"num_results": None, "best_distance": None, "avg_distance": None}
+        else:
+            retrieval = {
+                "num_results": len(retrieval_data.get("documents", [])),
+                "best_distance": min(retrieval_data.get("distances", [99])) if retrieval_data.get("distances") else 99,
+                "avg_distance": sum(retrieval_data.get("distances", [99])) / max(1, len(retrieval_data.get("distances", []))),
+            }
         
         log_entry = {
             "timestamp": datetime.now().isoformat(),
             "question": question,
             "question_length": len(question),
+            "cached": cached,
             
             # Retrieval Quality
-            "num_results": len(retrieval_data.get("documents", [])),
-            "best_distance": min(retrieval_data.get("distances", [99])) if retrieval_data.get("distances") else 99,
-            "avg_distance": sum(retrieval_data.get("distances", [99])) / max(1, len(retrieval_data.get("distances", []))),
+            **retrieval,
             
             # Answer Quality
             "answer_length": len(answer_data.get("answer", "")),
@@ -42,9 +58,55 @@ class AnswerQualityMonitor:
         }
         
         # Append to log file
+        self._rotate_if_full()
         with open(self.log_file, "a", encoding="utf-8") as f:
             f.write(json.dumps(log_entry, ensure_ascii=False) + "\n")
     
+    def _rotate_if_full(self):
+        """Keep one previous file; several processes may race here, the loser finds no file to move"""
+        if not self.max_bytes:
+            return
+        try:
+            if self.log_file.stat().st_size >= self.max_bytes:
+                os.replace(self.log_file, self.backup_file)
+        except FileNotFoundError:
+            pass
+    
+    def _load_entries(self, include_backup=False):
+        """Read all valid log entries (oldest first)"""
+        
+        files = [self.backup_file, self.log_file] if include_backup else [self.log_file]
+        entries = []
+        for path in files:
+            if not path.exists():
+                continue
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        try:
+                            entries.append(json.loads(line))
+                        except:
+                            continue
+        return entries
+    
+    def most_frequent_questions(self, limit=20):
+        """Most frequently asked questions (case and whitespace insensitive)"""
+        
+        if not self.log_file.exists() and not self.backup_file.exists():
+            return []
+        
+        counts = Counter()
+        latest_wording = {}
+        for entry in self._load_entries(include_backup=True):
+            question = entry.get("question", "").strip()
+            if not question:
+                continue
+            key = " ".join(question.lower().split())
+            counts[key] += 1
+            latest_wording[key] = question
+        
+        return [latest_wording[key] for key, _ in counts.most_common(limit)]
+    
     def analyze_quality_trends(self):
         """Analyze quality trends"""
         
@@ -52,14 +114,7 @@ class AnswerQualityMonitor:
             print("❌ No logs found")
             return
         
-        entries = []
-        with open(self.log_file, "r", encoding="utf-8") as f:
-            for line in f:
-                if line.strip():
-                    try:
-                        entries.append(json.loads(line))
-                    except:
-                        continue
+        entries = self._load_entries()
         
         if not entries:
             print("❌ No valid log entries found")
@@ -79,8 +134,9 @@ class AnswerQualityMonitor:
             percentage = (count / len(entries)) * 100
             print(f"   {conf}: {count} ({percentage:.1f}%)")
         
-        # Average Distances
-        distances = [e.get("best_distance", 99) for e in entries if e.get("best_distance", 99) < 90]
+        # Average Distances (cached answers have no retrieval data)
+        distances = [e["best_distance"] for e in entries
+                     if e.get("best_distance") is not None and e["best_distance"] < 90]
         if distances:
             print(f"\n📏 RETRIEVAL QUALITY:")
             print(f"   Average best distance: {sum(distances)/len(distances):.3f}")
@@ -104,7 +160,9 @@ class AnswerQualityMonitor:
             print(f"\n⚠️ RECENT ISSUES ({len(recent_low_quality)} of {len(recent_entries)}):")
             for entry in recent_low_quality[:2]:
                 print(f"   Q: {entry['question'][:50]}...")
-                print(f"   Confidence: {entry.get('confidence')}, Distance: {entry.get('best_distance', 'N/A'):.3f}")
+                distance = entry.get("best_distance")
+                distance_text = "cached" if distance is None else f"{distance:.3f}"
+                print(f"   Confidence: {entry.get('confidence')}, Distance: {distance_text}")
                 print()
     
     def get_improvement_suggestions(self):
@@ -113,22 +171,16 @@ class AnswerQualityMonitor:
         if not self.log_file.exists():
             return []
         
-        entries = []
-        with open(self.log_file, "r", encoding="utf-8") as f:
-            for line in f:
-                if line.strip():
-                    try:
-                        entries.append(json.loads(line))
-                    except:
-                        continue
+        entries = self._load_entries()
         
         if len(entries) < 3:
             return ["Collect more test data for analysis"]
         
         suggestions = []
         
-        # High distance average
-        avg_distance = sum(e.get("best_distance", 99) for e in entries) / len(entries)
+        # High distance average (over answers that ran a search, cache hits have no distances)
+        searched = [e for e in entries if not e.get("cached")]
+        avg_distance = sum(e.get("best_distance", 99) for e in searched) / len(searched) if searched else 0
         if avg_distance > 1.5:
             suggestions.append(f"🔧 High average distance ({avg_distance:.2f}) - check embedding model or chunking")
         
@@ -0,0 +1,394 @@
+# retrieval.py - Austauschbare Retrieval-Backends: ChromaDB-Server oder In-Process NumPy-Index
+
+import logging
+import threading
+import time
+
+import chromadb
+import numpy as np
+import requests
+import requests.adapters
+
+from chunk_store import chunk_metadata
+from corpus_state import read_corpus_state
+from embedding_store import EmbeddingArtifact
+
+logger = logging.getLogger(__name__)
+
+
+class RetrievalBackend:
+    """Gemeinsame Schnittstelle der Retrieval-Backends.
+
+    query() liefert das Chroma-Ergebnisformat (ids, documents, metadatas,
+    distances - je eine Liste pro Query-Embedding), damit die Schwellwerte
+    in der Pipeline für jedes Backend gelten.
+    """
+
+    name = None
+
+    def document_count(self):
+        """Anzahl Dokumente, None wenn das Backend nicht verfügbar ist"""
+        raise NotImplementedError
+
+    def sources(self):
+        raise NotImplementedError
+
+    def query(self, embedding, n_results):
+        raise NotImplementedError
+
+    def embedding_model(self):
+        """Model-Schlüssel, mit dem der Index gebaut wurde (None = unbekannt oder nicht erreichbar)"""
+        return None
+
+    def invalidate(self):
+        pass
+
+    def reset(self):
+        self.invalidate()
+
+    def stats(self):
+        return {"backend": self.name}
+
+
+class ChromaConnection(RetrievalBackend):
+    """Prozessweiter ChromaDB-Client mit gecachtem Collection-Handle und Dokumentanzahl"""
+
+    name = "chroma"
+
+    def __init__(self, host, port, collection_name, pool_size=16,
+                 base_delay=0.5, max_delay=30.0):
+        self.host = host
+        self.port = port
+        self.collection_name = collection_name
+        self.pool_size = pool_size
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+        self._lock = threading.RLock()
+        self._client = None
+        self._collection = None
+        self._doc_count = None
+        self._sources = None
+        self._corpus_version = None
+        self._failures = 0
+        self._next_attempt = 0.0
+
+    def _enable_connection_pool(self, client):
+        """Keep-Alive Pool der requests-Session für parallele Flask-Threads vergrössern"""
+        server = getattr(client, "_server", client)
+        session = getattr(server, "_session", None)
+        if isinstance(session, requests.Session):
+            adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+
+    def _connect(self):
+        """ChromaDB-Client mit Docker-optimierter Fallback-Strategie"""
+        try:
+            client = chromadb.HttpClient(host=self.host, port=self.port)
+            self._enable_connection_pool(client)
+            client.heartbeat()
+            logger.info("✅ ChromaDB HTTP-Verbindung OK")
+            return client
+        except Exception as e:
+            logger.warning(f"⚠️ HTTP ChromaDB fehlgeschlagen: {e}")
+
+        try:
+            client = chromadb.PersistentClient(path="./chroma_data")
+            logger.info("✅ ChromaDB lokale Verbindung OK")
+            return client
+        except Exception as e:
+            logger.error(f"❌ Alle ChromaDB-Verbindungen fehlgeschlagen: {e}")
+            return None
+
+    def get_client(self):
+        """Bestehenden Client liefern, sonst mit exponentiellem Backoff neu verbinden"""
+        with self._lock:
+            if self._client is not None:
+                return self._client
+
+            now = time.monotonic()
+            if now < self._next_attempt:
+                return None
+
+            client = self._connect()
+            if client is None:
+                self._failures += 1
+                delay = min(self.max_delay, self.base_delay * (2 ** (self._failures - 1)))
+                self._next_attempt = now + delay
+                logger.warning(f"⏳ Nächster ChromaDB-Verbindungsversuch in {delay:.1f}s")
+                return None
+
+            self._client = client
+            self._failures = 0
+            self._next_attempt = 0.0
+            return client
+
+    def _check_corpus_version(self):
+        """Caches verwerfen, sobald die Ingestion einen neuen Korpus meldet"""
+        state = read_corpus_state()
+        version = (state.get("fingerprint"), state.get("updated_at")) if state else None
+        if version != self._corpus_version:
+            self._corpus_version = version
+            self._collection = None
+            self._doc_count = None
+            self._sources = None
+
+    def get_collection(self):
+        """Collection-Handle (None wenn keine Verbindung, Exception wenn Collection fehlt)"""
+        with self._lock:
+            self._check_corpus_version()
+            if self._collection is not None:
+                return self._collection
+
+            client = self.get_client()
+            if client is None:
+                return None
+
+            self._collection = client.get_collection(self.collection_name)
+            return self._collection
+
+    def document_count(self):
+        """Gecachte Dokumentanzahl - wird nur nach Invalidierung neu abgefragt"""
+        with self._lock:
+            collection = self.get_collection()
+            if collection is None:
+                return None
+            if self._doc_count is None:
+                self._doc_count = collection.count()
+                logger.info(f"📊 Collection: {self._doc_count} Dokumente")
+            return self._doc_count
+
+    def sources(self):
+        """Gecachte Liste aller Quellen der Collection"""
+        with self._lock:
+            collection = self.get_collection()
+            if collection is None:
+                return []
+            if self._sources is None:
+                result = collection.get(include=["metadatas"])
+                self._sources = sorted(set(meta.get("quelle", "Unbekannt") for meta in result["metadatas"]))
+            return self._sources
+
+    def embedding_model(self):
+        """Von import_to_chroma in den Collection-Metadaten festgehalten"""
+        try:
+            collection = self.get_collection()
+        except Exception as e:
+            logger.warning(f"⚠️ Collection nicht lesbar: {e}")
+            return None
+        if collection is None:
+            return None
+        return (collection.metadata or {}).get("embedding_model") or None
+
+    def query(self, embedding, n_results):
+        """Einziger Round-Trip pro Anfrage; bei Fehler einmal mit frischem Handle wiederholen"""
+        for attempt in range(2):
+            collection = self.get_collection()
+            if collection is None:
+                raise ConnectionError("ChromaDB nicht erreichbar")
+            try:
+                return collection.query(
+                    query_embeddings=[embedding.tolist()],
+                    n_results=n_results,
+                    include=["documents", "metadatas", "distances"]
+                )
+            except Exception as e:
+                if attempt == 1:
+                    raise
+                logger.warning(f"⚠️ ChromaDB-Abfrage fehlgeschlagen, verbinde neu: {e}")
+                self.reset()
+
+    def invalidate(self):
+        """Collection-Handle und Caches verwerfen (z.B. nach Re-Import)"""
+        with self._lock:
+            self._collection = None
+            self._doc_count = None
+            self._sources = None
+
+    def reset(self):
+        """Client komplett verwerfen - nächster Zugriff verbindet neu"""
+        with self._lock:
+            self._client = None
+            self.invalidate()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "backend": self.name,
+                "host": f"{self.host}:{self.port}",
+                "connected": self._client is not None,
+                "documents": self._doc_count,
+                "connect_failures": self._failures,
+            }
+
+
+class NumpyIndex(RetrievalBackend):
+    """Exakte Top-k-Suche im Prozess über eine normalisierte float32-Matrix.
+
+    Liest das Embedding-Artefakt der Ingestion direkt (kein Chroma-Server
+    nötig) und lädt neu, sobald ein neuer Korpus gemeldet wird. Ist die
+    Matrix bereits float32 und normalisiert (MiniLM-Ausgabe), wird sie per
+    Memory-Map ohne Kopie verwendet. Die Distanzen entsprechen
+    Chromas Standardraum (quadrierte L2-Distanz), für Einheitsvektoren also
+    2 - 2·cos - die Schwellwerte der Pipeline gelten unverändert.
+    """
+
+    name = "numpy"
+
+    def __init__(self, embeddings_file, mmap=True):
+        self.artifact = EmbeddingArtifact(embeddings_file)
+        self.embeddings_file = self.artifact.matrix_path
+        self.mmap = mmap
+
+        self._lock = threading.RLock()
+        self._version = None
+        self._matrix = None
+        self._ids = []
+        self._documents = []
+        self._metadatas = []
+        self._sources = None
+
+        self._memory_mapped = False
+        self._loads = 0
+        self._queries = 0
+        self._query_seconds = 0.0
+
+    def _current_version(self):
+        state = read_corpus_state()
+        try:
+            mtime = self.embeddings_file.stat().st_mtime_ns
+        except OSError:
+            mtime = None
+        corpus = (state.get("fingerprint"), state.get("updated_at")) if state else None
+        return corpus, mtime
+
+    def _load(self):
+        matrix = self.artifact.matrix(mmap=self.mmap)
+        entries = self.artifact.records()
+        if matrix.ndim != 2 or matrix.shape[0] != len(entries):
+            raise ValueError(f"Embedding-Artefakt unvollständig: {matrix.shape[0]} Vektoren, {len(entries)} Metadaten")
+
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        memory_mapped = (
+            isinstance(matrix, np.memmap) and matrix.dtype == np.float32
+            and bool(np.allclose(norms, 1.0, atol=1e-4))
+        )
+        if not memory_mapped:
+            norms[norms == 0] = 1.0
+            matrix = np.asarray(matrix, dtype=np.float32) / norms
+            matrix.setflags(write=False)
+
+        self._matrix = matrix
+        self._memory_mapped = memory_mapped
+        self._ids = [entry["id"] for entry in entries]
+        self._documents = [entry["text"] for entry in entries]
+        self._metadatas = [chunk_metadata(entry) for entry in entries]
+        self._sources = None
+        self._loads += 1
+        logger.info(f"📊 NumPy-Index: {len(entries)} Dokumente aus {self.embeddings_file}"
+                    f"{' (Memory-Map)' if memory_mapped else ''}")
+
+    def _ensure_loaded(self):
+        """Index laden bzw. nach neuem Import neu laden; False wenn keine Daten vorhanden"""
+        with self._lock:
+            version = self._current_version()
+            if version[1] is None:
+                self._matrix = None
+                self._version = None
+                return False
+
+            if version != self._version or self._matrix is None:
+                try:
+                    self._load()
+                except (OSError, ValueError) as e:
+                    # Ingestion schreibt evtl. gerade - alten Index behalten und später erneut versuchen
+                    logger.warning(f"⚠️ NumPy-Index konnte nicht geladen werden: {e}")
+                    return self._matrix is not None
+                self._version = version
+            return True
+
+    def document_count(self):
+        if not self._ensure_loaded():
+            return None
+        return len(self._ids)
+
+    def sources(self):
+        with self._lock:
+            if not self._ensure_loaded():
+                return []
+            if self._sources is None:
+                self._sources = sorted(set(meta.get("quelle", "Unbekannt") for meta in self._metadatas))
+            return self._sources
+
+    def embedding_model(self):
+        return self.artifact.model_key() if self.artifact.exists() else None
+
+    def query(self, embedding, n_results):
+        """Ein Matrix-Vektor-Produkt über alle Dokumente, danach Top-k per argpartition"""
+        with self._lock:
+            if not self._ensure_loaded():
+                raise ConnectionError(f"Embedding-Datei fehlt: {self.embeddings_file}")
+            # Bei einem Reload werden die Listen ersetzt, nicht verändert
+            matrix, ids, documents, metadatas = self._matrix, self._ids, self._documents, self._metadatas
+
+        started = time.perf_counter()
+        query = np.asarray(embedding, dtype=np.float32).ravel()
+        norm = np.linalg.norm(query)
+        if norm > 0:
+            query = query / norm
+
+        k = min(n_results, len(ids))
+        if k == 0:
+            top = np.empty(0, dtype=np.int64)
+            similarities = np.empty(0, dtype=np.float32)
+        else:
+            similarities = matrix @ query
+            top = np.argpartition(-similarities, k - 1)[:k] if k < len(ids) else np.arange(len(ids))
+            top = top[np.argsort(-similarities[top], kind="stable")]
+        distances = np.maximum(2.0 - 2.0 * similarities[top], 0.0)
+
+        with self._lock:
+            self._queries += 1
+            self._query_seconds += time.perf_counter() - started
+
+        return {
+            "ids": [[ids[i] for i in top]],
+            "documents": [[documents[i] for i in top]],
+            "metadatas": [[metadatas[i] for i in top]],
+            "distances": [distances.tolist()],
+        }
+
+    def invalidate(self):
+        """Beim nächsten Zugriff neu laden"""
+        with self._lock:
+            self._version = None
+
+    def stats(self):
+        with self._lock:
+            return {
+                "backend": self.name,
+                "embeddings_file": str(self.embeddings_file),
+                "documents": len(self._ids) if self._matrix is not None else None,
+                "dimensions": int(self._matrix.shape[1]) if self._matrix is not None and self._matrix.ndim == 2 else None,
+                "matrix_bytes": int(self._matrix.nbytes) if self._matrix is not None else 0,
+                "memory_mapped": self._memory_mapped,
+                "loads": self._loads,
+                "queries": self._queries,
+                "avg_query_ms": round(self._query_seconds * 1000 / self._queries, 3) if self._queries else 0.0,
+            }
+
+
+RETRIEVAL_BACKENDS = ("chroma", "numpy")
+
+
+def create_retrieval_backend(name, **options):
+    """Backend per Name erzeugen (RETRIEVAL_BACKEND in app.py)"""
+    if name == "chroma":
+        return ChromaConnection(
+            options["chroma_host"], options["chroma_port"], options["collection_name"],
+            pool_size=options.get("chroma_pool_size", 16)
+        )
+    if name == "numpy":
+        return NumpyIndex(options["embeddings_file"], mmap=options.get("mmap", True))
+    raise ValueError(f"Unbekanntes Retrieval-Backend '{name}' (erlaubt: {', '.join(RETRIEVAL_BACKENDS)})")
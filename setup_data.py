@@ -1,12 +1,18 @@
 import os
-import json
-import uuid
 import chromadb
 import time
 import logging
 from pathlib import Path
 from typing import List, Dict
-from sentence_transformers import SentenceTransformer
+from corpus_state import corpus_fingerprint, document_key, mark_corpus_changed, read_corpus_version
+from legal_text import SENTENCE_INDEX_FILE, write_sentence_index
+from embedding_store import EmbeddingArtifact, write_embedding_artifact
+from ingest_state import build_embedding_matrix, chunk_content_id, load_manifest, record_embedding_model, save_manifest, text_sha256
+from import_to_chroma import collection_embedding_model, sync_collection
+from chunk_store import ChunkStore, annotate_chunks
+from process_pdfs import CHUNKING_MODE, CHUNK_TOKEN_OVERLAP, iter_token_chunks
+from embedding_backend import EMBEDDING_BACKEND, load_embedding_model
+from embedding_runner import EmbeddingRunner, TokenCounter
 
 # Logging konfigurieren
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -16,22 +22,24 @@ class HuggingFaceProcessor:
     def __init__(self):
         self.data_dir = Path("data")
         self.text_dir = self.data_dir / "text"
-        self.chunks_dir = self.data_dir / "chunks"
-        self.embeddings_file = self.data_dir / "embeddings_hf.json"
+        self.chunk_store = ChunkStore()
+        self.embeddings = EmbeddingArtifact(self.data_dir / "embeddings.npy")
         
         # Ordner erstellen
-        for dir_path in [self.data_dir, self.text_dir, self.chunks_dir]:
+        for dir_path in [self.data_dir, self.text_dir]:
             dir_path.mkdir(exist_ok=True)
         
         # HuggingFace Parameter
         self.model_name = "sentence-transformers/all-MiniLM-L6-v2"
         self.chunk_size = 400
         self.overlap = 100
+        self.batch_size = 32  # Optimal für die meisten GPUs/CPUs
+        self.token_counter = None
         
         # Model laden
-        logger.info(f"🤗 Lade HuggingFace Model: {self.model_name}")
+        logger.info(f"🤗 Lade HuggingFace Model: {self.model_name} (Backend: {EMBEDDING_BACKEND})")
         try:
-            self.model = SentenceTransformer(self.model_name)
+            self.model = load_embedding_model(EMBEDDING_BACKEND, self.model_name)
             logger.info("✅ HuggingFace Model erfolgreich geladen!")
         except Exception as e:
             logger.error(f"❌ Fehler beim Laden des Models: {e}")
@@ -47,33 +55,63 @@ class HuggingFaceProcessor:
             logger.warning("❌ Keine Textdateien gefunden!")
             return
         
-        # Chunks-Ordner leeren
-        for chunk_file in self.chunks_dir.glob("*.txt"):
-            chunk_file.unlink()
+        manifest = load_manifest()
+        text_state = manifest.setdefault("texts", {})
+        
+        # Chunks entfernter Texte löschen
+        base_names = {txt_path.stem for txt_path in txt_files}
+        for source in self.chunk_store.sources():
+            if source not in base_names:
+                self.chunk_store.delete_document(source)
+        for name in list(text_state):
+            if name not in base_names:
+                del text_state[name]
         
         total_chunks = 0
+        chunking = self._chunking_key()
         
         for txt_path in txt_files:
-            logger.info(f"✂️ Chunking: {txt_path.name}")
-            
             with open(txt_path, "r", encoding="utf-8") as f:
                 text = f.read()
             
-            chunks = self._split_into_chunks(text)
-            
             base_name = txt_path.stem
-            for i, chunk in enumerate(chunks):
-                chunk_path = self.chunks_dir / f"{base_name}_chunk_{i+1:03d}.txt"
-                with open(chunk_path, "w", encoding="utf-8") as f:
-                    f.write(chunk)
+            existing_count = self.chunk_store.count(base_name)
+            
+            # Unveränderter Text (gleicher Hash) → bestehende Chunks wiederverwenden
+            digest = text_sha256(text)
+            state = text_state.get(base_name, {})
+            if (state.get("sha256") == digest and state.get("chunking") == chunking
+                    and state.get("chunk_count") == existing_count):
+                total_chunks += existing_count
+                logger.info(f"♻️ Unverändert: {txt_path.name} ({existing_count} Chunks)")
+                continue
+            
+            logger.info(f"✂️ Chunking: {txt_path.name}")
+            
+            chunks = self._split_into_chunks(text)
+            self.chunk_store.replace_document(base_name, annotate_chunks(text, chunks))
             
+            text_state[base_name] = {"sha256": digest, "chunking": chunking, "chunk_count": len(chunks)}
             total_chunks += len(chunks)
             logger.info(f"✅ {txt_path.name} → {len(chunks)} Chunks")
         
+        save_manifest(manifest)
         logger.info(f"✂️ Chunking abgeschlossen: {total_chunks} Chunks total")
     
+    def _chunking_key(self) -> str:
+        """Chunking-Parameter im Manifest - bei Änderung wird neu gechunkt"""
+        if CHUNKING_MODE == "tokens":
+            return f"tokens:{self.model.max_seq_length}/{CHUNK_TOKEN_OVERLAP}:{self.model_name}"
+        return f"{self.chunk_size}/{self.overlap}"
+    
     def _split_into_chunks(self, text: str) -> List[str]:
         """Text intelligent chunken"""
+        if CHUNKING_MODE == "tokens":
+            # Chunkgrösse in Word-Pieces des Models, damit nichts abgeschnitten wird
+            if self.token_counter is None:
+                self.token_counter = TokenCounter(self.model.tokenizer)
+            return list(iter_token_chunks(text, self.token_counter, self.model.max_seq_length, CHUNK_TOKEN_OVERLAP))
+        
         words = text.split()
         chunks = []
         
@@ -88,94 +126,66 @@ class HuggingFaceProcessor:
         return chunks
     
     def create_embeddings(self) -> None:
-        """Embeddings mit HuggingFace erstellen"""
+        """Embeddings mit HuggingFace erstellen - nur für neue oder geänderte Chunks"""
         logger.info("🧠 Starte Embedding-Erstellung mit HuggingFace...")
         
-        # Prüfen ob Embeddings bereits existieren
-        if self.embeddings_file.exists():
-            logger.info("📁 Embeddings bereits vorhanden - überspringe Erstellung")
+        if not self.chunk_store.count():
+            logger.warning("❌ Keine Chunks gefunden!")
             return
         
-        chunk_files = sorted(list(self.chunks_dir.glob("*.txt")))
-        if not chunk_files:
-            logger.warning("❌ Keine Chunk-Dateien gefunden!")
-            return
-        
-        embeddings_data = []
-        
         # Alle Texte laden
-        texts = []
-        file_info = []
+        records = []
+        seen_ids = set()
         
-        for chunk_path in chunk_files:
-            with open(chunk_path, "r", encoding="utf-8") as f:
-                text = f.read().strip()
+        for chunk in self.chunk_store.iter_chunks():
+            text = chunk["text"].strip()
             
             if len(text) > 50:  # Nur ausreichend lange Texte
-                texts.append(text)
+                # Inhalts-ID: unveränderte Chunks behalten ID und Embedding
+                content_id = chunk_content_id(chunk["quelle"], text)
+                if content_id in seen_ids:
+                    continue
+                seen_ids.add(content_id)
                 
-                # Metadaten extrahieren
-                filename = chunk_path.name
-                parts = filename.replace(".txt", "").split("_chunk_")
-                quelle = parts[0] if len(parts) > 1 else "unknown"
-                chunk_id = parts[1] if len(parts) > 1 else "0"
-                
-                file_info.append({
-                    "filename": filename,
-                    "quelle": quelle,
-                    "chunk_id": chunk_id
-                })
+                records.append({**chunk, "id": content_id, "text": text})
+        
+        logger.info(f"📊 Verarbeite {len(records)} Chunks...")
         
-        logger.info(f"📊 Verarbeite {len(texts)} Chunks...")
+        # Längensortierte Shards mit Checkpoint - ein abgebrochener Lauf setzt fort
+        runner = EmbeddingRunner(self.model_name, model=self.model, backend=EMBEDDING_BACKEND,
+                                 batch_size=self.batch_size, log=logger.info)
+        
+        if self.embeddings.exists() and self.embeddings.model_key() != runner.model_key:
+            # Vektoren verschiedener Models/Backends nie mischen (torch / onnx-fp32 / onnx-int8)
+            logger.info(f"🔄 Embeddings stammen von {self.embeddings.model_key() or 'unbekanntem Model'}, "
+                        f"jetzt {runner.model_key} - alle Chunks werden neu kodiert")
         
-        # BATCH-Verarbeitung mit HuggingFace (sehr schnell!)
         try:
-            batch_size = 32  # Optimal für die meisten GPUs/CPUs
-            all_embeddings = []
-            
-            for i in range(0, len(texts), batch_size):
-                batch_texts = texts[i:i + batch_size]
-                
-                # Embeddings für Batch erstellen
-                batch_embeddings = self.model.encode(
-                    batch_texts,
-                    show_progress_bar=True,
-                    convert_to_numpy=True
-                )
-                
-                all_embeddings.extend(batch_embeddings)
-                
-                if (i + batch_size) % 100 == 0:
-                    logger.info(f"📈 Fortschritt: {min(i + batch_size, len(texts))}/{len(texts)} Chunks")
-            
-            # Daten zusammenstellen
-            for text, embedding, info in zip(texts, all_embeddings, file_info):
-                embeddings_data.append({
-                    "id": str(uuid.uuid4()),
-                    "text": text,
-                    "quelle": info["quelle"],
-                    "chunk_id": info["chunk_id"],
-                    "filename": info["filename"],
-                    "embedding": embedding.tolist()  # NumPy zu List
-                })
-            
-            logger.info(f"🧠 Embeddings erstellt: {len(embeddings_data)} erfolgreich")
-            
+            embeddings, encoded = build_embedding_matrix(records, self.embeddings, runner.encode, runner.model_key)
         except Exception as e:
             logger.error(f"❌ Fehler bei Embedding-Erstellung: {e}")
             return
         
-        # Embeddings speichern
-        with open(self.embeddings_file, "w", encoding="utf-8") as f:
-            json.dump(embeddings_data, f, ensure_ascii=False, indent=2)
+        if embeddings is None:
+            logger.info(f"♻️ Embeddings aktuell: {len(records)} Chunks unverändert")
+            record_embedding_model(runner.model_key)
+            runner.clear()
+            return
+        
+        logger.info(f"🧠 Embeddings erstellt: {encoded} neu, {len(records) - encoded} wiederverwendet")
+        
+        # Embeddings als Binär-Matrix plus zeilengleiche Metadaten speichern
+        write_embedding_artifact(records, embeddings, self.embeddings.matrix_path, model_key=runner.model_key)
+        record_embedding_model(runner.model_key)
+        runner.clear()
         
-        logger.info(f"💾 Embeddings gespeichert in: {self.embeddings_file}")
+        logger.info(f"💾 Embeddings gespeichert in: {self.embeddings.matrix_path}")
     
     def import_to_chroma(self) -> None:
         """Embeddings in ChromaDB importieren - MIT FALLBACK"""
         logger.info("📚 Starte ChromaDB-Import...")
         
-        if not self.embeddings_file.exists():
+        if not self.embeddings.exists():
             logger.error("❌ Embeddings-Datei nicht gefunden!")
             return
         
@@ -203,51 +213,30 @@ class HuggingFaceProcessor:
                 return
         
         try:
-            # Collection löschen und neu erstellen
-            try:
-                client.delete_collection("gesetzestexte")
-                logger.info("🗑️ Alte Collection gelöscht")
-            except:
-                pass
-            
-            collection = client.create_collection("gesetzestexte")
-            logger.info("🆕 Neue Collection erstellt")
-            
-            # Embeddings laden
-            with open(self.embeddings_file, "r", encoding="utf-8") as f:
-                embeddings_data = json.load(f)
+            collection = client.get_or_create_collection("gesetzestexte")
             
-            logger.info(f"📁 {len(embeddings_data)} Embeddings geladen")
-            
-            # Batch-Import mit Fehlerbehandlung
-            batch_size = 100
-            imported_count = 0
-            
-            for i in range(0, len(embeddings_data), batch_size):
-                batch = embeddings_data[i:i + batch_size]
-                
-                try:
-                    collection.add(
-                        ids=[entry["id"] for entry in batch],
-                        documents=[entry["text"] for entry in batch],
-                        embeddings=[entry["embedding"] for entry in batch],
-                        metadatas=[{
-                            "filename": entry["filename"],
-                            "chunk_id": entry["chunk_id"],
-                            "quelle": entry["quelle"]
-                        } for entry in batch]
-                    )
-                    
-                    imported_count += len(batch)
-                    logger.info(f"✅ Batch {i//batch_size + 1}: {len(batch)} Dokumente importiert")
-                    
-                except Exception as e:
-                    logger.error(f"❌ Batch-Import Fehler: {e}")
+            # Nur neue, geänderte und entfernte Chunks verändern die Collection
+            added, updated, deleted = sync_collection(collection, self.embeddings)
+            logger.info(f"🔄 Sync: {added} neu, {updated} aktualisiert, {deleted} gelöscht")
             
             # Verifikation
             final_count = collection.count()
             logger.info(f"✅ ChromaDB-Import abgeschlossen: {final_count} Dokumente")
             
+            embeddings_data = self.embeddings.records()
+            changed = added or updated or deleted
+            keys = [document_key(entry["quelle"], entry["text"]) for entry in embeddings_data]
+            
+            if changed or not SENTENCE_INDEX_FILE.exists():
+                # Satz-Bereinigung einmalig hier statt bei jeder Anfrage
+                indexed = write_sentence_index((entry["id"], entry["text"]) for entry in embeddings_data)
+                logger.info(f"📝 Satz-Index für {indexed} Chunks geschrieben")
+            
+            model_key = collection_embedding_model(collection)
+            if changed or read_corpus_version() != corpus_fingerprint(keys, model_key):
+                # Laufende App-Prozesse verwerfen Collection- und Antwort-Caches
+                mark_corpus_changed(keys, final_count, model_key)
+            
             # BONUS: Schneller Suchtest
             try:
                 test_embedding = self.model.encode(["Test"])[0].tolist()
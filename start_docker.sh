@@ -2,9 +2,10 @@
 
 echo "🐳 Starting Docker Chatbot System..."
 
-# ChromaDB Datenordner aufräumen (WICHTIG!)
-echo "🧹 Cleaning ChromaDB data..."
-rm -rf /app/chroma_data/* 2>/dev/null || true
+# Vorberechneten Index-Snapshot einspielen (vor dem ChromaDB-Start!)
+echo "📦 Checking prebuilt index snapshot..."
+cd /app && python index_snapshot.py restore
+SNAPSHOT_STATUS=$?
 
 # ChromaDB Server im Hintergrund starten
 echo "📚 Starting ChromaDB Server..."
@@ -22,11 +23,15 @@ for i in {1..30}; do
     sleep 2
 done
 
-# IMMER Daten verarbeiten, da ChromaDB Collection fehlt (wie Original)
+# Daten inkrementell verarbeiten: unveränderte PDFs/Chunks werden wiederverwendet,
+# ChromaDB erhält nur neue, geänderte und entfernte Chunks
 echo "📄 Setting up data processing..."
 
+# Snapshot/Index passt zu den PDFs → keine Verarbeitung nötig
+if [ "$SNAPSHOT_STATUS" -eq 0 ]; then
+    echo "⚡ Index is up to date - skipping data processing"
 # Prüfen ob PDFs vorhanden sind
-if ls /app/data/*.pdf 1> /dev/null 2>&1; then
+elif ls /app/data/*.pdf 1> /dev/null 2>&1; then
     echo "📑 PDFs found. Processing..."
     
     # Versuche ursprüngliche Scripts zu verwenden, sonst Fallback
@@ -66,6 +71,16 @@ fi
 # Trap für graceful shutdown
 trap 'echo "🛑 Shutting down..."; kill $CHROMA_PID 2>/dev/null || true; exit 0' SIGTERM SIGINT
 
-# Flask App starten
-echo "🚀 Starting Flask Application..."
-exec python app.py
\ No newline at end of file
+# App starten: gunicorn mit mehreren Workern (Standard), asyncio-Variante oder Flask-Entwicklungsserver
+if [ "${SERVER_MODE:-gunicorn}" = "flask" ]; then
+    echo "🚀 Starting Flask Application (development server)..."
+    exec python app.py
+fi
+
+if [ "${SERVER_MODE:-gunicorn}" = "async" ]; then
+    echo "🚀 Starting async /answer pipeline with gunicorn + uvicorn (${WEB_WORKERS:-2} workers)..."
+    exec gunicorn -c gunicorn.conf.py -k uvicorn.workers.UvicornWorker asgi:application
+fi
+
+echo "🚀 Starting Flask Application with gunicorn (${WEB_WORKERS:-2} workers)..."
+exec gunicorn -c gunicorn.conf.py app:app
\ No newline at end of file